@@ -0,0 +1,378 @@
+import os
+import threading
+import time
+import numpy as np
+import soundfile as sf
+import soxr
+import librosa
+
+
+class AudioRingBuffer:
+    # Single producer (decoder thread) / single consumer (audio callback).
+    # Both sides only ever advance their own counter, so no lock is needed.
+    # Frames are rows of an interleaved (capacity, channels) float32 array.
+    def __init__(self, capacity, channels=1):
+        self.capacity = capacity
+        self.channels = channels
+        self.buffer = np.zeros((capacity, channels), dtype=np.float32)
+        self.read_pos = 0
+        self.write_pos = 0
+        self.flush_pos = 0
+
+    def available(self):
+        return self.write_pos - max(self.read_pos, self.flush_pos)
+
+    def space(self):
+        # Flushed frames count as free: the consumer skips them without reading
+        return self.capacity - (self.write_pos - max(self.read_pos, self.flush_pos))
+
+    def write(self, block):
+        count = min(len(block), self.space())
+        if count <= 0:
+            return 0
+        start = self.write_pos % self.capacity
+        first = min(count, self.capacity - start)
+        self.buffer[start:start + first] = block[:first]
+        if count > first:
+            self.buffer[:count - first] = block[first:count]
+        self.write_pos += count
+        return count
+
+    def read_into(self, out):
+        if self.flush_pos > self.read_pos:
+            self.read_pos = self.flush_pos
+        count = min(len(out), self.available())
+        if count <= 0:
+            return 0
+        start = self.read_pos % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        if count > first:
+            out[first:count] = self.buffer[:count - first]
+        self.read_pos += count
+        return count
+
+    def clear(self):
+        # Called by the producer: the consumer skips everything written so far
+        # the next time it reads, so read_pos keeps a single owner.
+        self.flush_pos = self.write_pos
+
+
+def downmix_matrix(in_channels, out_channels):
+    # (in, out) mixing matrix for block @ matrix; None when no mixing is needed
+    if in_channels == out_channels:
+        return None
+    if out_channels == 1:
+        return np.full((in_channels, 1), 1.0 / in_channels, dtype=np.float32)
+    matrix = np.zeros((in_channels, out_channels), dtype=np.float32)
+    if in_channels == 1:
+        matrix[0, :] = 1.0
+    elif in_channels == 6 and out_channels == 2:
+        # 5.1 (L R C LFE Ls Rs) to stereo, ITU-R BS.775 coefficients, LFE dropped
+        matrix[[0, 2, 4], 0] = [1.0, 0.7071, 0.7071]
+        matrix[[1, 2, 5], 1] = [1.0, 0.7071, 0.7071]
+        matrix /= matrix.sum(axis=0)
+    else:
+        for channel in range(min(in_channels, out_channels)):
+            matrix[channel, channel] = 1.0
+    return matrix
+
+
+def flac_has_seektable(file_path):
+    # Walks the metadata block headers after the fLaC marker looking for a
+    # non-empty SEEKTABLE (type 3)
+    try:
+        with open(file_path, 'rb') as f:
+            if f.read(4) != b'fLaC':
+                return False
+            while True:
+                header = f.read(4)
+                if len(header) < 4:
+                    return False
+                block_type = header[0] & 0x7F
+                length = int.from_bytes(header[1:4], 'big')
+                if block_type == 3 and length > 0:
+                    return True
+                if header[0] & 0x80:
+                    return False
+                f.seek(length, os.SEEK_CUR)
+    except OSError:
+        return False
+
+
+def source_format(file_path):
+    # (sample_rate, channels) of the file; rate is None when soundfile can't tell
+    try:
+        info = sf.info(file_path)
+        return info.samplerate, info.channels
+    except Exception:
+        return None, 2
+
+
+class FileSource:
+    # Decodes a file block by block with soundfile and, only when the output
+    # rate differs from the file's, resamples it on the fly, so only one block
+    # of the track is ever held in memory.
+    def __init__(self, file_path, sample_rate=None, channels=None, quality='HQ', block_size=4096):
+        self.file = sf.SoundFile(file_path)
+        self.file_path = file_path
+        self.file_rate = self.file.samplerate
+        self.sample_rate = sample_rate or self.file_rate
+        self.channels = channels or self.file.channels
+        self.mix = downmix_matrix(self.file.channels, self.channels)
+        self.block_size = block_size
+        self.total_frames = int(np.ceil(self.file.frames * self.sample_rate / self.file_rate))
+        self.resampler = None
+        if self.file_rate != self.sample_rate:
+            # quality is a soxr preset: 'QQ', 'LQ', 'MQ', 'HQ' or 'VHQ'
+            self.resampler = soxr.ResampleStream(self.file_rate, self.sample_rate, self.channels,
+                                                 dtype='float32', quality=quality)
+        # Set by open_source to keep a decoded copy for the PCM cache
+        self.cache_writer = None
+        # mpg123 finds a seek target by scanning forward from the last frame it has
+        # indexed, about 0.4 s for a 2 hour MP3. A second handle builds that index
+        # while the decoder is idle and takes over at the first seek.
+        self.seek_file = None
+        self.indexed_frame = 0
+        self.build_seek_index = self.file.format == 'MP3'
+        # Without a SEEKTABLE (libsndfile writes none) libFLAC finds a seek target
+        # by bisection: some 40 pages scattered over the file, over 100 ms from a
+        # cold disk. While idle the kernel is asked to read a window around the
+        # play position into the page cache, so seeks near it hit memory. Without
+        # posix_fadvise that would mean blocking reads on this thread, so it is skipped.
+        self.warm_fd = None
+        self.warm_size = self.warm_start = self.warm_end = 0
+        self.warm_page_cache = (hasattr(os, 'posix_fadvise') and self.file.format == 'FLAC'
+                                and not flac_has_seektable(file_path))
+
+    def read(self):
+        block = self.file.read(self.block_size, dtype='float32', always_2d=True)
+        last = len(block) < self.block_size
+        if self.mix is not None:
+            block = block @ self.mix
+        if self.resampler is not None:
+            block = self.resampler.resample_chunk(block, last=last)
+        if self.cache_writer is not None:
+            self.cache_writer.write(block)
+            if last:
+                self.cache_writer.finish()
+                self.cache_writer = None
+        return block, last
+
+    def idle(self):
+        # One step of the seek index, called while the ring is full
+        if self.warm_page_cache:
+            self.warm_step()
+        if not self.build_seek_index:
+            return
+        try:
+            if self.seek_file is None:
+                self.seek_file = sf.SoundFile(self.file_path)
+            self.indexed_frame = min(self.indexed_frame + self.file_rate * 600, self.file.frames - 1)
+            self.seek_file.seek(self.indexed_frame)
+            if self.indexed_frame >= self.file.frames - 1:
+                self.build_seek_index = False
+        except Exception as e:
+            print(f"Error indexing {self.file_path}: {e}")
+            self.build_seek_index = False
+
+    def warm_step(self, step_bytes=8 << 20, window_bytes=32 << 20):
+        # Grows the warmed byte range one step towards window_bytes on either side
+        # of the play position; a seek outside it starts a new range
+        try:
+            if self.warm_fd is None:
+                self.warm_fd = os.open(self.file_path, os.O_RDONLY)
+                self.warm_size = os.fstat(self.warm_fd).st_size
+            position = self.warm_size * self.file.tell() // max(1, self.file.frames)
+            position -= position % step_bytes
+            if not self.warm_start <= position <= self.warm_end:
+                self.warm_start = self.warm_end = position
+            if self.warm_end < min(self.warm_size, position + window_bytes):
+                offset = self.warm_end
+                self.warm_end += step_bytes
+            elif self.warm_start > max(0, position - window_bytes):
+                self.warm_start -= step_bytes
+                offset = self.warm_start
+            else:
+                return
+            # Asynchronous readahead, the decoder thread doesn't wait for it
+            os.posix_fadvise(self.warm_fd, offset, step_bytes, os.POSIX_FADV_WILLNEED)
+        except OSError as e:
+            print(f"Error reading ahead {self.file_path}: {e}")
+            self.warm_page_cache = False
+
+    def seek(self, frame):
+        # The cached copy must be contiguous, so give up on it after a seek
+        self.drop_cache_writer()
+        if self.seek_file is not None:
+            self.file.close()
+            self.file, self.seek_file = self.seek_file, None
+            self.build_seek_index = False
+        self.file.seek(min(int(frame * self.file_rate / self.sample_rate), self.file.frames))
+        if self.resampler is not None:
+            self.resampler.clear()
+
+    def drop_cache_writer(self):
+        if self.cache_writer is not None:
+            self.cache_writer.abort()
+            self.cache_writer = None
+
+    def close(self):
+        self.drop_cache_writer()
+        if self.seek_file is not None:
+            self.seek_file.close()
+        if self.warm_fd is not None:
+            os.close(self.warm_fd)
+            self.warm_fd = None
+        self.file.close()
+
+
+class ArraySource:
+    # Serves an already decoded (frames, channels) track; used for the
+    # whole-file decode mode and PCM cache hits.
+    def __init__(self, data, sample_rate, block_size=4096):
+        self.data = data
+        self.sample_rate = sample_rate
+        self.channels = data.shape[1]
+        self.block_size = block_size
+        self.total_frames = len(data)
+        self.offset = 0
+
+    def read(self):
+        block = self.data[self.offset:self.offset + self.block_size]
+        self.offset += len(block)
+        return block, self.offset >= self.total_frames
+
+    def idle(self):
+        pass
+
+    def seek(self, frame):
+        self.offset = max(0, min(int(frame), self.total_frames))
+
+    def close(self):
+        # Drop the reference so a memory-mapped cache file gets unmapped
+        self.data = None
+
+
+def open_source(file_path, sample_rate=None, channels=None, quality='HQ', streaming=True, cache=None):
+    # None for sample_rate or channels keeps the file's own rate / layout
+    if sample_rate is None or channels is None:
+        file_rate, file_channels = source_format(file_path)
+        sample_rate = sample_rate or file_rate
+        channels = channels or file_channels
+    if cache is not None and sample_rate is not None:
+        data = cache.open(file_path, sample_rate, channels, quality)
+        if data is not None:
+            return ArraySource(data, sample_rate)
+
+    if streaming:
+        try:
+            source = FileSource(file_path, sample_rate, channels, quality)
+            if cache is not None:
+                source.cache_writer = cache.writer(file_path, sample_rate, channels, quality)
+            return source
+        except Exception as e:
+            print(f"Streaming decode not available for {file_path}: {e}")
+    data, sample_rate = librosa.load(file_path, sr=sample_rate, mono=False,
+                                     res_type='soxr_' + quality.lower())
+    data = np.ascontiguousarray(np.atleast_2d(data).T, dtype=np.float32)
+    mix = downmix_matrix(data.shape[1], channels)
+    if mix is not None:
+        data = data @ mix
+    if cache is not None:
+        cache.store(file_path, sample_rate, channels, data, quality)
+    return ArraySource(data, sample_rate)
+
+
+class StreamingDecoder:
+    def __init__(self, source, ring_seconds=1.0):
+        self.source = source
+        self.sample_rate = source.sample_rate
+        self.channels = source.channels
+        self.total_frames = source.total_frames
+        self.ring = AudioRingBuffer(int(self.sample_rate * ring_seconds), self.channels)
+        self.eof = False
+        # seek() writes pending_seek and then bumps seek_requested; the decoder thread
+        # sets seek_applied once the ring holds nothing from before the seek. One
+        # writer per field, like the ring's indices, so the audio callback can post
+        # a seek without taking a lock.
+        self.pending_seek = 0
+        self.seek_requested = 0
+        self.seek_applied = 0
+        # Set by seek() so a decoder waiting on a full ring reacts right away
+        self.wake = threading.Event()
+        self.running = False
+        self.thread = None
+
+    @property
+    def finished(self):
+        return self.eof and self.ring.available() == 0
+
+    def start(self, prefill_frames=0, timeout=1.0):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        # Only wait for the first few blocks, so start-up time does not
+        # depend on the length of the track
+        deadline = time.monotonic() + timeout
+        while (self.ring.available() < prefill_frames and not self.eof
+               and time.monotonic() < deadline):
+            time.sleep(0.002)
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.source.close()
+
+    def read(self, out):
+        return self.ring.read_into(out)
+
+    def seek(self, frame):
+        self.pending_seek = max(0, min(int(frame), self.total_frames))
+        self.seek_requested += 1
+        self.wake.set()
+
+    @property
+    def seeking(self):
+        return self.seek_applied != self.seek_requested
+
+    def run(self):
+        pending = None
+        while self.running:
+            # pending_seek was written before seek_requested, so it is at least as
+            # new as serial; a seek posted in between is applied on the next pass
+            serial = self.seek_requested
+            if serial != self.seek_applied:
+                self.source.seek(self.pending_seek)
+                self.ring.clear()
+                self.eof = False
+                pending = None
+                self.seek_applied = serial
+
+            if pending is None and not self.eof:
+                try:
+                    block, last = self.source.read()
+                except Exception as e:
+                    print(f"Error decoding audio: {e}")
+                    block, last = np.zeros((0, self.channels), dtype=np.float32), True
+                pending = block
+                if last:
+                    self.eof = True
+
+            if pending is not None and len(pending) > 0:
+                written = self.ring.write(pending)
+                pending = pending[written:] if written < len(pending) else None
+                if pending is not None:
+                    self.source.idle()
+                    self.wait(0.005)
+            else:
+                pending = None
+                if self.eof:
+                    self.wait(0.01)
+
+    def wait(self, timeout):
+        self.wake.wait(timeout)
+        self.wake.clear()
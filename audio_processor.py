@@ -1,104 +1,537 @@
+import os
+import threading
+from time import perf_counter
 import numpy as np
 from scipy import signal
-import librosa
+try:
+    # The kernel behind signal.sosfilt: it filters a C-contiguous (channels, frames)
+    # buffer and its state in place, without the copies sosfilt makes around it
+    from scipy.signal._sosfilt import _sosfilt as sosfilt_inplace
+except ImportError:
+    sosfilt_inplace = None
 import sounddevice as sd
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import QThread, QCoreApplication, pyqtSignal
+from audio_decoder import StreamingDecoder, open_source, source_format
+from pcm_cache import PCMCache
+
+def sosfilt_inplace_matches():
+    # _sosfilt is private scipy API and may change between releases, so it is only
+    # used if it gives the same output and final state as signal.sosfilt
+    sos = signal.butter(4, 0.1, output='sos').astype(np.float32)
+    x = np.random.default_rng(0).standard_normal((2, 256)).astype(np.float32)
+    zi = np.zeros((2, len(sos), 2), dtype=np.float32)
+    expected, expected_zf = signal.sosfilt(sos, x, axis=1, zi=zi.transpose(1, 0, 2))
+    try:
+        sosfilt_inplace(sos, x, zi)
+    except Exception as e:
+        print(f"In-place sosfilt unavailable, using signal.sosfilt: {e}")
+        return False
+    if not (np.allclose(x, expected, rtol=1e-4, atol=1e-5)
+            and np.allclose(zi, expected_zf.transpose(1, 0, 2), rtol=1e-4, atol=1e-5)):
+        print("In-place sosfilt disagrees with signal.sosfilt, using signal.sosfilt")
+        return False
+    return True
+
+if sosfilt_inplace is not None and not sosfilt_inplace_matches():
+    sosfilt_inplace = None
+
+# soxr preset for tracks that need resampling, QQ fastest .. VHQ best
+DEFAULT_RESAMPLE_QUALITY = 'HQ'
+
+# Band centre frequencies and peaking filter Q for each EQ layout. The 10/15/31
+# band layouts are the ISO octave, 2/3 octave and 1/3 octave series.
+EQ_LAYOUTS = {
+    8: ([60, 170, 310, 600, 1000, 3000, 6000, 12000], 1.0),
+    10: ([31, 62, 125, 250, 500, 1000, 2000, 4000, 8000, 16000], 1.41),
+    15: ([25, 40, 63, 100, 160, 250, 400, 630, 1000, 1600, 2500, 4000, 6300, 10000, 16000], 2.15),
+    31: ([20, 25, 31.5, 40, 50, 63, 80, 100, 125, 160, 200, 250, 315, 400, 500, 630, 800,
+          1000, 1250, 1600, 2000, 2500, 3150, 4000, 5000, 6300, 8000, 10000, 12500, 16000, 20000], 4.32),
+}
 
 class AudioEqualizer:
-    def __init__(self):
+    def __init__(self, band_count=8):
         self.sample_rate = 44100
-        self.frequencies = [60, 170, 310, 600, 1000, 3000, 6000, 12000]
-        self.gains = [0.0] * len(self.frequencies)
-        self.filters = []
-        self.init_filters()
+        self.channels = 1
+        # Gain changes are ramped at this rate so slider moves don't click
+        self.ramp_db_per_second = 60.0
+        # The ramp moves in steps of this many frames, each with its own coefficients
+        self.ramp_step_frames = 512
+        # Held by whoever reshapes the filters; the audio thread only tries it
+        self.lock = threading.Lock()
+        # Channel-major copy of the block being filtered; grows, never shrinks
+        self.scratch = np.zeros(0, dtype=np.float32)
+        self.load_layout(band_count)
+    
+    def load_layout(self, band_count):
+        frequencies, q = EQ_LAYOUTS[band_count]
+        self.frequencies = list(frequencies)
+        self.q = q
+        # gains is what was asked for, current_gains what the filters use right
+        # now; the audio thread moves current_gains towards gains block by block
+        self.gains = np.zeros(len(frequencies))
+        self.current_gains = np.zeros(len(frequencies))
+        # (gains, sos) for every step from current_gains to gains, designed on the
+        # GUI thread; the audio thread only picks the step it has reached
+        self.ramp = None
+        self.active_ramp = None
+        self.ramp_position = 0
+        # One biquad per band, run as a single cascaded sosfilt pass over all
+        # channels at once. The filter state (zi) keeps one row per channel
+        # and is carried between callbacks so block edges are seamless.
+        self.sos = self.design_sos(self.current_gains)
+        self.zi = self.zero_state(self.channels)
+    
+    def set_band_count(self, band_count):
+        if band_count in EQ_LAYOUTS and band_count != len(self.frequencies):
+            with self.lock:
+                self.load_layout(band_count)
     
     def init_filters(self):
-        self.filters = []
-        for i, freq in enumerate(self.frequencies):
-            if i == 0:
-                b, a = signal.iirfilter(2, freq / self.sample_rate * 2, btype='lowpass', 
-                                    ftype='butter', fs=self.sample_rate)
-            elif i == len(self.frequencies) - 1:
-                b, a = signal.iirfilter(2, freq / self.sample_rate * 2, btype='highpass', 
-                                    ftype='butter', fs=self.sample_rate)
-            else:
-                bandwidth = 0.5
-                low_freq = freq / (1 + bandwidth)
-                high_freq = freq * (1 + bandwidth)
-                b, a = signal.iirfilter(2, [low_freq / self.sample_rate * 2, high_freq / self.sample_rate * 2], 
-                                    btype='bandpass', ftype='butter', fs=self.sample_rate)
-            self.filters.append((b, a))
+        with self.lock:
+            self.current_gains = self.gains.copy()
+            self.ramp = None
+            self.active_ramp = None
+            self.sos = self.design_sos(self.current_gains)
+            self.zi = self.zero_state(self.channels)
+    
+    def set_channels(self, channels):
+        if channels != self.channels:
+            self.channels = channels
+            self.zi = self.zero_state(channels)
+    
+    def zero_state(self, channels):
+        # float32 like the audio, in the (channels, sections, 2) layout of the kernel
+        return np.zeros((channels, len(self.frequencies), 2), dtype=np.float32)
+    
+    def design_sos(self, gains):
+        # RBJ audio EQ cookbook for all bands at once: shelves on the outer
+        # bands, peaking in between
+        freq = np.minimum(self.frequencies, self.sample_rate * 0.45)
+        A = 10 ** (np.asarray(gains, dtype=np.float64) / 40.0)
+        w0 = 2 * np.pi * freq / self.sample_rate
+        cos_w0 = np.cos(w0)
+        alpha = np.sin(w0) / (2 * self.q)
+        
+        sos = np.empty((len(freq), 6))
+        sos[:, 0] = 1 + alpha * A
+        sos[:, 1] = -2 * cos_w0
+        sos[:, 2] = 1 - alpha * A
+        sos[:, 3] = 1 + alpha / A
+        sos[:, 4] = -2 * cos_w0
+        sos[:, 5] = 1 - alpha / A
+        
+        # Narrow layouts would give the shelves a resonant bump, so cap their Q
+        shelf_alpha = np.sin(w0) / (2 * min(self.q, 1.0))
+        for band_index, sign in ((0, 1), (len(freq) - 1, -1)):
+            a, c = A[band_index], cos_w0[band_index]
+            sqrt_a = 2 * np.sqrt(a) * shelf_alpha[band_index]
+            sos[band_index] = [a * ((a + 1) - sign * (a - 1) * c + sqrt_a),
+                               sign * 2 * a * ((a - 1) - sign * (a + 1) * c),
+                               a * ((a + 1) - sign * (a - 1) * c - sqrt_a),
+                               (a + 1) + sign * (a - 1) * c + sqrt_a,
+                               -sign * 2 * ((a - 1) + sign * (a + 1) * c),
+                               (a + 1) + sign * (a - 1) * c - sqrt_a]
+        # Designed in float64, run in float32 so the block isn't promoted
+        return (sos / sos[:, 3:4]).astype(np.float32)
     
     def set_gain(self, band_index, gain_db):
         if 0 <= band_index < len(self.gains):
-            self.gains[band_index] = gain_db
+            # Swap in a new array so the audio thread never sees a half-written one;
+            # the filters follow on the next blocks
+            gains = self.gains.copy()
+            gains[band_index] = gain_db
+            self.gains = gains
+            self.ramp = self.design_ramp(self.current_gains, gains)
+    
+    def design_ramp(self, start, target):
+        # Runs on the GUI thread: every band moves at most step dB per step, so
+        # the slowest band sets the number of steps
+        step = self.ramp_db_per_second * self.ramp_step_frames / self.sample_rate
+        steps = max(1, int(np.ceil(np.max(np.abs(target - start)) / step)))
+        limits = step * np.arange(1, steps + 1)[:, np.newaxis]
+        gains = start + np.clip(target - start, -limits, limits)
+        sos = np.stack([self.design_sos(step_gains) for step_gains in gains])
+        return gains, sos
+    
+    def update_ramp(self, frame_count):
+        # Audio thread: no filter design here, only picking the precomputed step
+        ramp = self.ramp
+        if ramp is None:
+            return
+        if ramp is not self.active_ramp:
+            self.active_ramp = ramp
+            self.ramp_position = 0
+        gains, sos = ramp
+        index = min(self.ramp_position // self.ramp_step_frames, len(gains) - 1)
+        self.ramp_position += frame_count
+        self.current_gains = gains[index]
+        self.sos = sos[index]
     
     def apply_eq(self, audio_data):
         if len(audio_data) == 0:
             return audio_data
+        # The GUI thread is swapping the band layout: pass this one block through
+        if not self.lock.acquire(False):
+            return audio_data
             
         try:
-            if audio_data.dtype != np.float32:
-                audio_data = audio_data.astype(np.float32)
-            
-            if len(audio_data.shape) > 1:
-                audio_data = np.mean(audio_data, axis=1)
+            self.update_ramp(len(audio_data))
+            if not self.current_gains.any():
+                # Flat: skip filtering entirely. A zero state matches the identity
+                # filter, so the next ramp starts without a click.
+                self.zi.fill(0.0)
+                return audio_data
             
-            output = np.zeros_like(audio_data)
-            
-            for i, (b, a) in enumerate(self.filters):
-                filtered = signal.lfilter(b, a, audio_data)
-                gain_linear = 10 ** (self.gains[i] / 20.0)
-                filtered *= gain_linear
-                output += filtered
+            # Filtered in place; only blocks the callback doesn't hand over
+            # (other dtypes, read-only arrays) are copied first
+            if audio_data.dtype != np.float32 or not audio_data.flags.writeable:
+                audio_data = audio_data.astype(np.float32)
+            # Mono blocks are filtered through a (frames, 1) view and returned 1-D
+            block = audio_data[:, np.newaxis] if audio_data.ndim == 1 else audio_data
+            frames, channels = block.shape
+            if channels != self.channels:
+                self.set_channels(channels)
+            if len(self.scratch) < frames * channels:
+                self.scratch = np.zeros(frames * channels, dtype=np.float32)
             
-            max_val = np.max(np.abs(output))
-            if max_val > 1.0:
-                output = output / max_val
-                
-            return output
+            # (frames, channels) in; the kernel wants each channel contiguous
+            planar = self.scratch[:frames * channels].reshape(channels, frames)
+            np.copyto(planar, block.T)
+            if sosfilt_inplace is not None:
+                sosfilt_inplace(self.sos, planar, self.zi)
+            else:
+                filtered, zf = signal.sosfilt(self.sos, planar, axis=1, zi=self.zi.transpose(1, 0, 2))
+                planar[:] = filtered
+                self.zi[:] = zf.transpose(1, 0, 2)
+            np.clip(planar, -1.0, 1.0, out=planar)
+            np.copyto(block, planar.T)
+            return audio_data
         except Exception as e:
             print(f"Error in equalizer: {e}")
             return audio_data
+        finally:
+            self.lock.release()
+
+class VisualizationTap:
+    # Lock-free single producer / single consumer ring for the visualizer.
+    # The audio callback overwrites old samples and never waits; the GUI timer
+    # copies out the most recent samples whenever it polls.
+    def __init__(self, capacity=8192):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=np.float32)
+        self.write_pos = 0
+        self.read_pos = 0
+    
+    def write(self, block):
+        count = min(len(block), self.capacity)
+        start = self.write_pos % self.capacity
+        first = min(count, self.capacity - start)
+        self.buffer[start:start + first] = block[len(block) - count:len(block) - count + first]
+        if count > first:
+            self.buffer[:count - first] = block[len(block) - count + first:]
+        self.write_pos += len(block)
+    
+    def read_latest(self, out, min_new=1):
+        # Copies the newest len(out) samples once at least min_new samples arrived
+        # since the last read; returns how many arrived (0 = nothing copied)
+        end = self.write_pos
+        new = end - self.read_pos
+        if new < max(1, min_new):
+            return 0
+        count = min(len(out), self.capacity)
+        start = (end - count) % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        if count > first:
+            out[first:count] = self.buffer[:count - first]
+        self.read_pos = end
+        return new
 
 class AudioProcessor(QThread):
-    audio_data = pyqtSignal(np.ndarray)
+    # Published by run(), which only wakes when the callback or a control method
+    # sets self.events, plus a position tick while audio is playing
+    position_changed = pyqtSignal(int)
+    track_changed = pyqtSignal(str)
+    track_finished = pyqtSignal(str)
+    playback_state_changed = pyqtSignal(bool)
+    # load_file's decoder is ready for install_loaded_file
+    track_loaded = pyqtSignal(str)
+    # perf_counter() time of the first callback that played an installed track
+    audio_started = pyqtSignal(float)
     
-    def __init__(self):
+    def __init__(self, cache_dir='pcm_cache'):
         super().__init__()
         self.is_running = False
+        self.events = threading.Event()
+        self.position_interval = 0.1
+        self.finished_file = None
+        self.published_track_changes = 0
+        self.published_running = False
+        self.shutting_down = False
+        if QCoreApplication.instance() is not None:
+            QCoreApplication.instance().aboutToQuit.connect(self.shutdown)
         self.current_file = None
         self.sample_rate = 44100
+        self.channels = 2
+        self.max_output_channels = self.query_output_channels()
+        # Tracks play at their own rate when the device allows it; otherwise they
+        # are resampled block by block with this soxr preset
+        self.resample_quality = DEFAULT_RESAMPLE_QUALITY
+        self.supported_rates = {}
         self.chunk_size = 1024
-        self.audio_data_buffer = None
+        self.streaming = True
+        self.pcm_cache = PCMCache(cache_dir)
+        self.decoder = None
+        self.total_frames = 0
+        # position is only written by the audio callback while the stream runs;
+        # seeks are posted as (serial, frame) and picked up by the next callback
         self.position = 0
+        self.seek_request = None
+        self.seek_serial = 0
+        self.seek_handled = 0
+        # The old audio fades out under the new over this long to avoid a click
+        self.seek_fade_seconds = 0.005
         self.equalizer = AudioEqualizer()
         self.output_stream = None
         self.volume_gain = 0.7
+        self.visualization_tap = VisualizationTap()
+        self.xrun_count = 0
+        # Scratch space for the callback, so steady-state playback allocates nothing
+        self.read_buffer = np.zeros((self.chunk_size * 4, self.channels), dtype=np.float32)
+        self.mono_buffer = np.zeros(self.chunk_size * 4, dtype=np.float32)
+        self.init_seek_fade()
+        # Gapless playback: the next track is decoded ahead and spliced in by the callback
+        self.gapless = True
+        self.next_decoder = None
+        self.next_file = None
+        self.next_token = 0
+        self.queue_lock = threading.Lock()
+        self.retired_decoders = []
+        self.track_changes = 0
+        # load_file opens tracks on a worker thread; the newest token wins
+        self.load_lock = threading.Lock()
+        self.load_token = 0
+        self.loaded_track = None
+        self.tracks_loaded = 0
+        self.published_tracks_loaded = 0
+        self.first_audio_pending = False
+        self.first_audio_time = None
+    
+    def query_output_channels(self):
+        try:
+            return max(1, int(sd.query_devices(kind='output')['max_output_channels']))
+        except Exception as e:
+            print(f"Error querying output device: {e}")
+            return 2
+    
+    def output_rate(self, file_rate, channels):
+        # The file's own rate if the device takes it, else the device default
+        if file_rate is None:
+            return self.sample_rate
+        key = (file_rate, channels)
+        if key not in self.supported_rates:
+            try:
+                sd.check_output_settings(samplerate=file_rate, channels=channels, dtype='float32')
+                self.supported_rates[key] = True
+            except Exception:
+                self.supported_rates[key] = False
+        if self.supported_rates[key]:
+            return file_rate
+        try:
+            return int(sd.query_devices(kind='output')['default_samplerate'])
+        except Exception:
+            return 44100
+    
+    def set_resample_quality(self, quality):
+        # Used from the next track on
+        self.resample_quality = quality
         
     def set_audio_file(self, file_path):
+        self.install_decoder(file_path, self.open_decoder(file_path))
+    
+    def load_file(self, file_path):
+        # set_audio_file without blocking: the file is opened and pre-decoded on a
+        # worker, then run() emits track_loaded and the GUI calls install_loaded_file
+        self.queue_next(None)
+        self.close_decoder()
+        self.release_retired_decoders()
+        # Nothing is loaded until the new track is installed; if it fails to open,
+        # the previous track must not still look current
+        self.current_file = None
+        with self.load_lock:
+            self.load_token += 1
+            token = self.load_token
+            stale, self.loaded_track = self.loaded_track, None
+        if stale is not None and stale[1] is not None:
+            stale[1].stop()
+        threading.Thread(target=self.open_file, args=(file_path, token), daemon=True).start()
+        if not self.isRunning():
+            self.start()
+    
+    def open_file(self, file_path, token):
+        decoder = self.open_decoder(file_path)
+        with self.load_lock:
+            if token == self.load_token:
+                self.loaded_track = (file_path, decoder)
+                self.tracks_loaded += 1
+                self.events.set()
+                return
+        if decoder is not None:
+            decoder.stop()
+    
+    def install_loaded_file(self, file_path):
+        # False when the load failed or a newer load_file replaced it
+        with self.load_lock:
+            loaded, self.loaded_track = self.loaded_track, None
+        if loaded is None:
+            return False
+        if loaded[0] != file_path:
+            if loaded[1] is not None:
+                loaded[1].stop()
+            return False
+        return self.install_decoder(file_path, loaded[1])
+    
+    def open_decoder(self, file_path):
+        if not os.path.exists(file_path):
+            print(f"File not found: {file_path}")
+            return None
         try:
-            self.audio_data_buffer, self.sample_rate = librosa.load(
-                file_path, sr=self.sample_rate, mono=True
-            )
-            self.equalizer.sample_rate = self.sample_rate
-            self.equalizer.init_filters()
-            self.current_file = file_path
-            self.position = 0
-            self.init_audio_output()
+            # Play the file's own rate and layout, adapted only where the device can't
+            file_rate, file_channels = source_format(file_path)
+            channels = min(file_channels, self.max_output_channels)
+            sample_rate = self.output_rate(file_rate, channels)
+            source = open_source(file_path, sample_rate, channels, self.resample_quality,
+                                 streaming=self.streaming, cache=self.pcm_cache)
+            decoder = StreamingDecoder(source)
+            decoder.start(prefill_frames=self.chunk_size * 4)
+            return decoder
         except Exception as e:
             print(f"Error loading audio file: {e}")
-            self.audio_data_buffer = None
+            return None
+    
+    def install_decoder(self, file_path, decoder):
+        self.queue_next(None)
+        self.close_decoder()
+        self.release_retired_decoders()
+        if decoder is None:
+            self.current_file = None
+            return False
+        self.sample_rate = decoder.sample_rate
+        self.channels = decoder.channels
+        self.total_frames = decoder.total_frames
+        self.read_buffer = np.zeros((self.chunk_size * 4, self.channels), dtype=np.float32)
+        self.init_seek_fade()
+        self.equalizer.sample_rate = self.sample_rate
+        self.equalizer.set_channels(self.channels)
+        self.equalizer.init_filters()
+        self.current_file = file_path
+        self.position = 0
+        self.seek_request = None
+        self.finished_file = None
+        self.first_audio_pending = True
+        self.decoder = decoder
+        self.init_audio_output()
+        return True
+    
+    def init_seek_fade(self):
+        self.fade_frames = max(1, int(self.sample_rate * self.seek_fade_seconds))
+        self.fade_in = np.linspace(0.0, 1.0, self.fade_frames, dtype=np.float32)[:, np.newaxis]
+        self.fade_out = self.fade_in[::-1].copy()
+        self.fade_tail = np.zeros((self.fade_frames, self.channels), dtype=np.float32)
+        self.tail_count = 0
+        self.tail_pos = 0
+        self.fade_pos = self.fade_frames
+    
+    def close_decoder(self):
+        if self.decoder is not None:
+            self.decoder.stop()
+            self.decoder = None
+        self.total_frames = 0
+    
+    def is_loaded(self):
+        return self.decoder is not None
+    
+    def queue_next(self, file_path):
+        with self.queue_lock:
+            self.next_token += 1
+            token = self.next_token
+            old_decoder = self.next_decoder
+            self.next_decoder = None
+            self.next_file = None
+        if old_decoder is not None:
+            old_decoder.stop()
+        
+        if file_path and self.gapless:
+            threading.Thread(target=self.prepare_next, args=(file_path, token), daemon=True).start()
+    
+    def prepare_next(self, file_path, token):
+        # A missing file would go through the PCM cache and the librosa fallback,
+        # each failing with its own error; leave the queue empty instead
+        if not os.path.exists(file_path):
+            print(f"Next track not found, not queued: {file_path}")
+            return
+        try:
+            # Resampled and mixed to the open stream's format so it can be spliced
+            # without reopening the device
+            source = open_source(file_path, self.sample_rate, self.channels, self.resample_quality,
+                                 streaming=self.streaming, cache=self.pcm_cache)
+            if source.sample_rate != self.sample_rate or source.channels != self.channels:
+                source.close()
+                return
+            decoder = StreamingDecoder(source)
+            decoder.start(prefill_frames=self.chunk_size * 4)
+        except Exception as e:
+            print(f"Error pre-decoding next track: {e}")
+            return
+        
+        with self.queue_lock:
+            if token == self.next_token:
+                self.next_decoder = decoder
+                self.next_file = file_path
+                return
+        decoder.stop()
+    
+    def has_queued_next(self):
+        return self.next_decoder is not None
+    
+    def splice_next(self):
+        # Runs on the audio thread: never wait for the GUI thread, just try again
+        # on the next block if queue_next happens to hold the lock.
+        if self.next_decoder is None or not self.queue_lock.acquire(False):
+            return None
+        try:
+            decoder = self.next_decoder
+            if decoder is None:
+                return None
+            self.retired_decoders.append(self.decoder)
+            self.decoder = decoder
+            self.current_file = self.next_file
+            self.total_frames = decoder.total_frames
+            self.next_decoder = None
+            self.next_file = None
+            self.track_changes += 1
+            self.events.set()
+            return decoder
+        finally:
+            self.queue_lock.release()
+    
+    def release_retired_decoders(self):
+        while self.retired_decoders:
+            self.retired_decoders.pop().stop()
     
     def init_audio_output(self):
         try:
             if self.output_stream is not None:
+                if (self.output_stream.samplerate == self.sample_rate
+                        and self.output_stream.channels == self.channels):
+                    # Same format as the last track: keep the open stream
+                    return
                 self.output_stream.stop()
                 self.output_stream.close()
             
             self.output_stream = sd.OutputStream(
                 samplerate=self.sample_rate,
-                channels=1,
+                channels=self.channels,
                 dtype='float32',
                 blocksize=self.chunk_size,
                 callback=self.audio_callback
@@ -107,65 +540,193 @@ class AudioProcessor(QThread):
             print(f"Error initializing audio output: {e}")
     
     def audio_callback(self, outdata, frames, time, status):
-        if self.audio_data_buffer is not None and self.is_running:
-            if self.position < len(self.audio_data_buffer):
-                end_pos = min(self.position + frames, len(self.audio_data_buffer))
-                chunk = self.audio_data_buffer[self.position:end_pos]
-                
-                if len(chunk) > 0:
-                    processed_chunk = self.equalizer.apply_eq(chunk)
-                    processed_chunk *= getattr(self, 'volume_gain', 1.0)
-                    
-                    if len(processed_chunk) < frames:
-                        padded_chunk = np.zeros(frames)
-                        padded_chunk[:len(processed_chunk)] = processed_chunk
-                        processed_chunk = padded_chunk
-                    
-                    outdata[:] = processed_chunk.reshape(-1, 1)
-                    self.audio_data.emit(processed_chunk)
-                    self.position += len(chunk)
-                else:
-                    outdata.fill(0)
-            else:
-                outdata.fill(0)
-                if self.is_running:
-                    self.is_running = False
+        if status.output_underflow:
+            self.xrun_count += 1
+        
+        decoder = self.decoder
+        if decoder is None or not self.is_running:
+            outdata.fill(0)
+            return
+        
+        if frames > len(self.read_buffer):
+            self.read_buffer = np.zeros((frames, self.channels), dtype=np.float32)
+            self.mono_buffer = np.zeros(frames, dtype=np.float32)
+        chunk = self.read_buffer[:frames]
+        request = self.seek_request
+        if request is not None and request[0] != self.seek_handled:
+            self.start_seek(decoder, request)
+        
+        if self.fade_pos < self.fade_frames and (decoder.seeking or (decoder.ring.available() == 0 and not decoder.eof)):
+            # Seek not decoded yet: finish fading out the old audio, then silence
+            self.play_fade_tail(chunk)
+            count = track_start = frames
         else:
+            count = decoder.read(chunk)
+            track_start = 0
+            if self.fade_pos < self.fade_frames and count > 0:
+                self.crossfade(chunk[:count])
+        
+        if count < frames and decoder.finished:
+            next_decoder = self.splice_next()
+            if next_decoder is not None:
+                # Continue the same block with the first samples of the next track
+                self.position = 0
+                track_start = count
+                count += next_decoder.read(chunk[count:])
+            elif count == 0:
+                # End of the last queued track: one event, the pump reports it
+                outdata.fill(0)
+                self.is_running = False
+                self.finished_file = self.current_file
+                self.events.set()
+                return
+        
+        if count == 0:
+            # Decoder fell behind the device
+            self.xrun_count += 1
             outdata.fill(0)
+            return
+        
+        processed_chunk = self.equalizer.apply_eq(chunk[:count])
+        np.multiply(processed_chunk, self.volume_gain, out=processed_chunk)
+        outdata[:count] = processed_chunk
+        if count < frames:
+            outdata[count:].fill(0)
+        
+        # The visualizer only needs a mono mix
+        mono = self.mono_buffer[:count]
+        np.mean(processed_chunk, axis=1, out=mono)
+        self.visualization_tap.write(mono)
+        self.position += count - track_start
+        if self.first_audio_pending:
+            self.first_audio_pending = False
+            self.first_audio_time = perf_counter()
+            self.events.set()
+    
+    def start_seek(self, decoder, request):
+        # Runs on the audio thread. A few ms of the audio that would have played
+        # next are kept so they can fade out under the start of the new position.
+        self.seek_handled = request[0]
+        self.tail_count = 0 if decoder.seeking else decoder.read(self.fade_tail)
+        self.tail_pos = 0
+        self.fade_pos = 0
+        decoder.seek(request[1])
+        self.position = min(request[1], decoder.total_frames)
+    
+    def play_fade_tail(self, chunk):
+        chunk.fill(0)
+        count = min(len(chunk), self.tail_count - self.tail_pos)
+        if count > 0:
+            np.multiply(self.fade_tail[self.tail_pos:self.tail_pos + count],
+                        self.fade_out[self.tail_pos:self.tail_pos + count], out=chunk[:count])
+            self.tail_pos += count
+    
+    def crossfade(self, block):
+        # Fades the first frames after a seek in and mixes in what is left of the old tail
+        count = min(len(block), self.fade_frames - self.fade_pos)
+        block[:count] *= self.fade_in[self.fade_pos:self.fade_pos + count]
+        tail = min(count, self.tail_count - self.tail_pos)
+        if tail > 0:
+            block[:tail] += (self.fade_tail[self.tail_pos:self.tail_pos + tail]
+                             * self.fade_out[self.tail_pos:self.tail_pos + tail])
+            self.tail_pos += tail
+        self.fade_pos += count
+    
+    def read_visualization(self, out, min_new=1):
+        return self.visualization_tap.read_latest(out, min_new)
     
     def set_volume(self, gain):
         self.volume_gain = max(0.0, min(1.0, gain))
     
     def set_position(self, position_ms):
-        if self.audio_data_buffer is not None:
-            self.position = int((position_ms / 1000.0) * self.sample_rate)
+        decoder = self.decoder
+        if decoder is None:
+            return
+        frame = max(0, min(int((position_ms / 1000.0) * self.sample_rate), self.total_frames))
+        if self.is_running and self.output_stream is not None and self.output_stream.active:
+            # A single tuple assignment, so the callback sees the whole command or none of it
+            self.seek_serial += 1
+            self.seek_request = (self.seek_serial, frame)
+        else:
+            # No callback is running, so nothing else touches position
+            self.seek_request = None
+            decoder.seek(frame)
+            self.position = frame
+            self.events.set()
+    
+    def current_frame(self):
+        # Position including a seek the callback has not picked up yet
+        request = self.seek_request
+        if request is not None and request[0] != self.seek_handled:
+            return request[1]
+        return self.position
     
     def set_eq_gain(self, band_index, gain_db):
         self.equalizer.set_gain(band_index, gain_db)
     
+    def set_eq_band_count(self, band_count):
+        self.equalizer.set_band_count(band_count)
+    
     def start_playback(self):
         self.is_running = True
+        self.finished_file = None
         if self.output_stream is not None:
             self.output_stream.start()
-        self.start()
+        if not self.isRunning():
+            self.start()
+        self.events.set()
     
     def stop_playback(self):
         self.is_running = False
         if self.output_stream is not None:
             self.output_stream.stop()
-        self.quit()
-        self.wait()
+        self.events.set()
     
     def pause_playback(self):
         self.is_running = False
         if self.output_stream is not None:
             self.output_stream.stop()
+        self.events.set()
     
     def resume_playback(self):
         self.is_running = True
         if self.output_stream is not None:
             self.output_stream.start()
+        self.events.set()
+    
+    def shutdown(self):
+        self.shutting_down = True
+        self.stop_playback()
+        self.wait()
+    
+    def frames_to_ms(self, frames):
+        return int(frames * 1000 / self.sample_rate)
     
     def run(self):
-        while self.is_running:
-            self.msleep(50)
\ No newline at end of file
+        # Sleeps until something happens; only ticks for position while playing
+        while not self.shutting_down:
+            self.events.wait(self.position_interval if self.is_running else None)
+            self.events.clear()
+            
+            if self.tracks_loaded != self.published_tracks_loaded:
+                self.published_tracks_loaded = self.tracks_loaded
+                loaded = self.loaded_track
+                if loaded is not None:
+                    self.track_loaded.emit(loaded[0])
+            first_audio_time = self.first_audio_time
+            if first_audio_time is not None:
+                self.first_audio_time = None
+                self.audio_started.emit(first_audio_time)
+            if self.track_changes != self.published_track_changes:
+                self.published_track_changes = self.track_changes
+                self.track_changed.emit(self.current_file or '')
+            if self.decoder is not None:
+                self.position_changed.emit(self.frames_to_ms(self.current_frame()))
+            finished_file = self.finished_file
+            if finished_file is not None:
+                self.finished_file = None
+                self.track_finished.emit(finished_file)
+            running = self.is_running
+            if running != self.published_running:
+                self.published_running = running
+                self.playback_state_changed.emit(running)
\ No newline at end of file
@@ -0,0 +1,528 @@
+import os
+import sys
+import time
+import re
+import tempfile
+import tracemalloc
+import numpy as np
+import soundfile as sf
+import librosa
+from scipy import signal
+from audio_decoder import StreamingDecoder, open_source
+from audio_processor import AudioEqualizer, AudioProcessor
+from database_manager import DatabaseManager, UPSERT_SONG_SQL
+from visualizer import SpectrumAnalyzer
+from lyrics import LyricsCursor, LyricsCache, parse_lrc
+from library_importer import LyricsIndexer
+from peak_cache import PeakCache
+from mutagen import File
+
+
+def legacy_filters(sample_rate, frequencies):
+    filters = []
+    for i, freq in enumerate(frequencies):
+        if i == 0:
+            b, a = signal.iirfilter(2, freq / sample_rate * 2, btype='lowpass',
+                                    ftype='butter', fs=sample_rate)
+        elif i == len(frequencies) - 1:
+            b, a = signal.iirfilter(2, freq / sample_rate * 2, btype='highpass',
+                                    ftype='butter', fs=sample_rate)
+        else:
+            bandwidth = 0.5
+            low_freq = freq / (1 + bandwidth)
+            high_freq = freq * (1 + bandwidth)
+            b, a = signal.iirfilter(2, [low_freq / sample_rate * 2, high_freq / sample_rate * 2],
+                                    btype='bandpass', ftype='butter', fs=sample_rate)
+        filters.append((b, a))
+    return filters
+
+
+def legacy_apply_eq(filters, gains, audio_data):
+    # The 8 x lfilter parallel bank AudioEqualizer used before the sosfilt cascade
+    output = np.zeros_like(audio_data)
+    for i, (b, a) in enumerate(filters):
+        filtered = signal.lfilter(b, a, audio_data)
+        filtered *= 10 ** (gains[i] / 20.0)
+        output += filtered
+    max_val = np.max(np.abs(output))
+    if max_val > 1.0:
+        output = output / max_val
+    return output
+
+
+def time_per_call(func, blocks):
+    start = time.perf_counter()
+    for block in blocks:
+        func(block)
+    return (time.perf_counter() - start) / len(blocks)
+
+
+def bench_eq(block_count=2000, chunk_size=1024):
+    rng = np.random.default_rng(0)
+    blocks = (rng.standard_normal((block_count, chunk_size)) * 0.1).astype(np.float32)
+    gains = [4, 2, -2, -1, 1, 3, 4, 3]
+
+    equalizer = AudioEqualizer()
+    for i, gain in enumerate(gains):
+        equalizer.set_gain(i, gain)
+    filters = legacy_filters(equalizer.sample_rate, equalizer.frequencies)
+
+    legacy = time_per_call(lambda block: legacy_apply_eq(filters, gains, block), blocks)
+    current = time_per_call(equalizer.apply_eq, blocks)
+    # Same signal on both channels of an interleaved stereo block
+    stereo_blocks = np.repeat(blocks[:, :, np.newaxis], 2, axis=2)
+    stereo = time_per_call(equalizer.apply_eq, stereo_blocks)
+    wide = AudioEqualizer(31)
+    for i in range(31):
+        wide.set_gain(i, gains[i % len(gains)])
+    wide_stereo = time_per_call(wide.apply_eq, stereo_blocks)
+    flat = time_per_call(AudioEqualizer().apply_eq, stereo_blocks)
+    budget = chunk_size / equalizer.sample_rate
+
+    print(f"EQ per callback ({chunk_size} frames, {len(gains)} bands, budget {budget * 1000:.2f} ms)")
+    print(f"  legacy lfilter bank : {legacy * 1e6:8.1f} us")
+    print(f"  sosfilt cascade     : {current * 1e6:8.1f} us  ({legacy / current:.1f}x)")
+    print(f"  sosfilt stereo      : {stereo * 1e6:8.1f} us  ({stereo / current:.2f}x mono)")
+    print(f"  31 bands stereo     : {wide_stereo * 1e6:8.1f} us")
+    print(f"  flat (bypassed)     : {flat * 1e6:8.1f} us")
+    print(f"  peak heap, stereo   : {bytes_per_call(equalizer.apply_eq, stereo_blocks[:200])} bytes over 200 calls"
+          f" (one block is {stereo_blocks[0].nbytes} bytes)")
+
+
+def bytes_per_call(func, blocks):
+    # Peak Python heap growth while calling func on each block (numpy buffers included)
+    func(blocks[0])
+    tracemalloc.start()
+    for block in blocks:
+        func(block)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def legacy_visualizer_frame(audio_chunk, bars, peak_hold, peak_decay, height=100, smoothing=0.8):
+    # AudioVisualizer.process_audio_data before the vectorized analyzer
+    fft_data = np.abs(np.fft.fft(audio_chunk))
+    fft_data = fft_data[:len(fft_data) // 2]
+    bar_count = len(bars)
+    chunk_size = max(1, len(fft_data) // bar_count)
+    new_bars = []
+    for i in range(bar_count):
+        start_idx = i * chunk_size
+        end_idx = min(start_idx + chunk_size, len(fft_data))
+        if start_idx < len(fft_data):
+            magnitude = np.mean(fft_data[start_idx:end_idx])
+            new_bars.append(min(int(magnitude * 1000), height - 10))
+        else:
+            new_bars.append(0)
+    for i in range(bar_count):
+        bars[i] = int(bars[i] * smoothing + new_bars[i] * (1 - smoothing))
+        if new_bars[i] > peak_hold[i]:
+            peak_hold[i] = new_bars[i]
+            peak_decay[i] = 0
+        else:
+            peak_decay[i] += 1
+            if peak_decay[i] > 10:
+                peak_hold[i] = max(0, peak_hold[i] - 2)
+
+
+def bench_visualizer(frame_count=2000, fft_size=1024):
+    rng = np.random.default_rng(0)
+    blocks = (rng.standard_normal((frame_count, fft_size)) * 0.1).astype(np.float32)
+    print(f"Visualizer analysis per frame ({fft_size}-point FFT)")
+    for bar_count in (32, 64, 128, 256):
+        bars, peak_hold, peak_decay = [0] * bar_count, [0] * bar_count, [0] * bar_count
+        legacy = time_per_call(lambda block: legacy_visualizer_frame(block, bars, peak_hold, peak_decay), blocks)
+        analyzer = SpectrumAnalyzer(bar_count, fft_size)
+        current = time_per_call(analyzer.process, blocks)
+        print(f"  {bar_count:3d} bars: legacy {legacy * 1e6:7.1f} us, vectorized {current * 1e6:7.1f} us")
+
+
+def first_audio_time(file_path, sample_rate, quality, prefill_frames=4096):
+    # open + decode until the first callback's worth of audio is buffered
+    start = time.perf_counter()
+    decoder = StreamingDecoder(open_source(file_path, sample_rate, quality=quality))
+    decoder.start(prefill_frames=prefill_frames)
+    elapsed = time.perf_counter() - start
+    decoder.stop()
+    return elapsed
+
+
+def full_decode_time(file_path, sample_rate, quality):
+    # CPU cost of decoding (and resampling) the whole track block by block
+    start = time.perf_counter()
+    source = open_source(file_path, sample_rate, quality=quality)
+    last = False
+    while not last:
+        block, last = source.read()
+    source.close()
+    return time.perf_counter() - start
+
+
+def bench_load(seconds=60, repeat=3):
+    formats = [('WAV', 'wav'), ('FLAC', 'flac'), ('OGG', 'ogg')]
+    if 'MP3' in sf.available_formats():
+        formats.append(('MP3', 'mp3'))
+    targets = [('native', None, 'HQ'), ('44.1k QQ', 44100, 'QQ'), ('44.1k HQ', 44100, 'HQ'),
+               ('44.1k VHQ', 44100, 'VHQ')]
+    print(f"Loading a {seconds} s stereo track (ms, best of {repeat}); legacy = whole-file librosa.load")
+    print(f"  {'file':<10}{'legacy':>8}  " + ''.join(f"{label + ' first/full':>22}" for label, _, _ in targets))
+    with tempfile.TemporaryDirectory() as tmp:
+        for file_format, extension in formats:
+            for rate in (44100, 48000, 96000):
+                t = np.arange(rate * seconds) / rate
+                data = np.stack([np.sin(2 * np.pi * 440 * t), np.sin(2 * np.pi * 554 * t)], axis=1) * 0.3
+                path = os.path.join(tmp, f"{rate}.{extension}")
+                try:
+                    # Written a second at a time: libsndfile's vorbis encoder can crash on one huge write
+                    with sf.SoundFile(path, 'w', rate, 2, format=file_format) as f:
+                        for offset in range(0, len(data), rate):
+                            f.write(data[offset:offset + rate].astype(np.float32))
+                except Exception:
+                    print(f"  {extension} {rate // 1000}k: format does not support this rate")
+                    continue
+
+                def best(func, *args):
+                    return min(func(*args) for _ in range(repeat)) * 1000
+
+                def legacy_load():
+                    start = time.perf_counter()
+                    librosa.load(path, sr=44100, mono=True)
+                    return time.perf_counter() - start
+
+                line = f"  {extension + ' ' + str(rate // 1000) + 'k':<10}{best(legacy_load):8.1f}  "
+                for label, target_rate, quality in targets:
+                    first = best(first_audio_time, path, target_rate, quality)
+                    full = best(full_decode_time, path, target_rate, quality)
+                    line += f"{f'{first:.1f} / {full:.1f}':>22}"
+                print(line)
+
+
+def bench_seek(seconds=7200, rate=16000, seek_count=20):
+    formats = [('WAV', 'wav'), ('FLAC', 'flac'), ('OGG', 'ogg')]
+    if 'MP3' in sf.available_formats():
+        formats.append(('MP3', 'mp3'))
+    rng = np.random.default_rng(0)
+    second = (0.3 * np.sin(2 * np.pi * 440 * np.arange(rate) / rate)).astype(np.float32)
+    print(f"Seek in a {seconds // 3600} hour track: request until new audio is buffered (ms)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for file_format, extension in formats:
+            path = os.path.join(tmp, f"long.{extension}")
+            with sf.SoundFile(path, 'w', rate, 1, format=file_format) as f:
+                for _ in range(seconds):
+                    f.write(second)
+            for label, sample_rate in (('native', None), ('resampled', 44100)):
+                decoder = StreamingDecoder(open_source(path, sample_rate))
+                decoder.start(prefill_frames=4096)
+                # Playback has been running for a moment before anyone seeks
+                time.sleep(1.0)
+                times = []
+                for frame in rng.integers(0, decoder.total_frames, seek_count):
+                    start = time.perf_counter()
+                    decoder.seek(frame)
+                    while decoder.seeking or (decoder.ring.available() < 1024 and not decoder.eof):
+                        time.sleep(0.0002)
+                    times.append(time.perf_counter() - start)
+                decoder.stop()
+                times = np.array(times) * 1000
+                print(f"  {extension:<5}{label:<10} mean {times.mean():6.2f}  max {times.max():6.2f}")
+            if file_format == 'FLAC' and hasattr(os, 'posix_fadvise'):
+                # Worst case the read-ahead guards against: the file dropped from
+                # the page cache before every seek (only slow on a slow disk)
+                decoder = StreamingDecoder(open_source(path))
+                decoder.source.warm_page_cache = False
+                decoder.start(prefill_frames=4096)
+                time.sleep(1.0)
+                times = []
+                for frame in rng.integers(0, decoder.total_frames, seek_count):
+                    fd = os.open(path, os.O_RDONLY)
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+                    os.close(fd)
+                    start = time.perf_counter()
+                    decoder.seek(frame)
+                    while decoder.seeking or (decoder.ring.available() < 1024 and not decoder.eof):
+                        time.sleep(0.0002)
+                    times.append(time.perf_counter() - start)
+                decoder.stop()
+                times = np.array(times) * 1000
+                print(f"  {extension:<5}{'cold':<10} mean {times.mean():6.2f}  max {times.max():6.2f}")
+
+
+def legacy_lyric_at(lyrics_data, position_ms):
+    # LyricsWidget.update_lyrics_display before the cursor
+    current_lyric = " "
+    for i, (timestamp, text) in enumerate(lyrics_data):
+        if position_ms < timestamp:
+            if i > 0:
+                current_lyric = lyrics_data[i - 1][1]
+            break
+        current_lyric = text
+    return current_lyric
+
+
+def legacy_parse_lrc(file_path):
+    # LyricsWidget.parse_lrc_file before parse_lrc
+    lyrics = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = re.match(r'\[(\d{2}):(\d{2})\.(\d{2})\](.*)', line.strip())
+            if match:
+                minutes, seconds, hundredths, text = match.groups()
+                timestamp = (int(minutes) * 60 + int(seconds)) * 1000 + int(hundredths) * 10
+                lyrics.append((timestamp, text.strip()))
+    return sorted(lyrics, key=lambda x: x[0])
+
+
+def lrc_text(line_count, enhanced):
+    lines = ['[ar:Artist]', '[ti:Title]', '[offset:+100]']
+    for i in range(line_count):
+        ms = i * 4000
+        stamp = f'[{ms // 60000:02d}:{ms // 1000 % 60:02d}.{ms % 1000 // 10:02d}]'
+        if enhanced:
+            words = ''.join(f'<{(ms + w * 500) // 60000:02d}:{(ms + w * 500) // 1000 % 60:02d}.'
+                            f'{(ms + w * 500) % 1000 // 10:02d}>word{w} ' for w in range(6))
+            lines.append(stamp + words.strip())
+        else:
+            lines.append(f'{stamp}Line {i} of the song')
+    return '\n'.join(lines) + '\n'
+
+
+def bench_lyrics(line_count=500, ticks=20000, tick_ms=100, loads=200):
+    lyrics = [(i * 4000, f"Line {i}") for i in range(line_count)]
+    positions = np.arange(ticks) * tick_ms % (line_count * 4000)
+    legacy = time_per_call(lambda position: legacy_lyric_at(lyrics, position), positions)
+    cursor = LyricsCursor(lyrics)
+    current = time_per_call(cursor.update, positions)
+    seeks = np.random.default_rng(0).integers(0, line_count * 4000, ticks)
+    seek = time_per_call(cursor.update, seeks)
+    print(f"Lyrics lookup per position tick ({line_count} lines)")
+    print(f"  legacy linear scan  : {legacy * 1e6:8.2f} us")
+    print(f"  cursor, playing     : {current * 1e6:8.2f} us")
+    print(f"  cursor, random seeks: {seek * 1e6:8.2f} us")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_path = os.path.join(tmp, 'plain.lrc')
+        enhanced_path = os.path.join(tmp, 'enhanced.lrc')
+        with open(plain_path, 'w', encoding='utf-8') as f:
+            f.write(lrc_text(line_count, False))
+        with open(enhanced_path, 'w', encoding='utf-8') as f:
+            f.write(lrc_text(line_count, True))
+        with open(enhanced_path, 'r', encoding='utf-8') as f:
+            enhanced_text = f.read()
+        legacy = time_per_call(legacy_parse_lrc, [plain_path] * loads)
+        plain = time_per_call(lambda path: parse_lrc(open(path, encoding='utf-8').read()), [plain_path] * loads)
+        enhanced = time_per_call(parse_lrc, [enhanced_text] * loads)
+
+        db = DatabaseManager(os.path.join(tmp, 'library.db'))
+        LyricsCache(db).load(enhanced_path)
+        from_db = time_per_call(lambda path: LyricsCache(db).load(path), [enhanced_path] * loads)
+        cache = LyricsCache(db)
+        memory = time_per_call(cache.load, [enhanced_path] * loads)
+        db.conn.close()
+    print(f"Lyrics file load ({line_count} lines)")
+    print(f"  legacy parser          : {legacy * 1e3:8.3f} ms")
+    print(f"  parse_lrc, plain       : {plain * 1e3:8.3f} ms")
+    print(f"  parse_lrc, word timing : {enhanced * 1e3:8.3f} ms")
+    print(f"  cache hit, database    : {from_db * 1e3:8.3f} ms")
+    print(f"  cache hit, memory      : {memory * 1e3:8.3f} ms")
+
+
+def synthetic_songs(count, start=0):
+    rng = np.random.default_rng(start)
+    artists = [f"Artist {i}" for i in range(count // 50 + 1)]
+    for i in range(start, start + count):
+        artist = artists[rng.integers(len(artists))]
+        yield (f"Song {i}", artist, f"{artist} Album {i % 7}", int(rng.integers(90, 400)),
+               f"/music/{artist}/{i:06d}.mp3", "Pop", 2000 + i % 25, None,
+               1700000000000000000 + i, 4000000 + i, f"{i:040x}")
+
+
+def bench_db(song_count=100000, batch_size=500, legacy_count=2000, playlist_size=5000):
+    with tempfile.TemporaryDirectory() as tmp:
+        # Old behaviour: default rollback journal, one commit per song
+        legacy = DatabaseManager(os.path.join(tmp, 'legacy.db'))
+        legacy.conn.execute('PRAGMA journal_mode = DELETE')
+        legacy.conn.execute('PRAGMA synchronous = FULL')
+        start = time.perf_counter()
+        for song in synthetic_songs(legacy_count):
+            legacy.conn.execute(UPSERT_SONG_SQL, song)
+            legacy.conn.commit()
+        legacy_rate = legacy_count / (time.perf_counter() - start)
+        legacy.conn.close()
+
+        db = DatabaseManager(os.path.join(tmp, 'library.db'))
+        songs = list(synthetic_songs(song_count))
+        start = time.perf_counter()
+        for i in range(0, song_count, batch_size):
+            db.add_songs(songs[i:i + batch_size])
+        import_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows = db.get_all_songs()
+        all_songs_time = time.perf_counter() - start
+
+        playlist_id = db.create_playlist("Benchmark")
+        start = time.perf_counter()
+        with db.transaction():
+            for position, song_id in enumerate(range(1, playlist_size + 1)):
+                db.add_song_to_playlist(playlist_id, song_id, position)
+        playlist_insert_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(20):
+            db.get_songs_in_playlist(playlist_id)
+        playlist_time = (time.perf_counter() - start) / 20
+
+        start = time.perf_counter()
+        for song_id in range(1, 1001):
+            db.update_play_count(song_id)
+        play_count_time = (time.perf_counter() - start) / 1000
+        plan = db.conn.execute(
+            'EXPLAIN QUERY PLAN SELECT * FROM songs ORDER BY artist, album, title').fetchall()
+        db.conn.close()
+
+    print(f"SQLite library ({song_count} songs, batches of {batch_size})")
+    print(f"  legacy insert+commit  : {legacy_rate:10.0f} songs/s  ({legacy_count} songs)")
+    print(f"  add_songs (WAL)       : {song_count / import_time:10.0f} songs/s  ({import_time:.2f} s)")
+    print(f"  get_all_songs         : {all_songs_time * 1000:10.1f} ms  ({len(rows)} rows)")
+    print(f"  playlist insert       : {playlist_insert_time * 1000:10.1f} ms  ({playlist_size} songs, one transaction)")
+    print(f"  get_songs_in_playlist : {playlist_time * 1000:10.1f} ms")
+    print(f"  update_play_count     : {play_count_time * 1e6:10.1f} us per call")
+    print(f"  library order plan    : {plan[-1][-1]}")
+
+
+def bench_search(song_count=100000, batch_size=500, repeat=50, limit=2000):
+    queries = ["artist 12", "song 4", "album", "pop", "s", "zzz nothing"]
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'library.db'))
+        songs = list(synthetic_songs(song_count))
+        for i in range(0, song_count, batch_size):
+            db.add_songs(songs[i:i + batch_size])
+
+        print(f"Full-text search ({song_count} songs, {repeat} runs per query)")
+        print(f"  {'':14}  {'as you type':>11}  {'all matches':>11}")
+        for query in queries:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                db.search_song_ids(query, limit)
+            limited = (time.perf_counter() - start) / repeat
+            start = time.perf_counter()
+            for _ in range(repeat):
+                ids = db.search_song_ids(query)
+            elapsed = (time.perf_counter() - start) / repeat
+            print(f"  {query!r:14}: {limited * 1000:8.2f} ms  {elapsed * 1000:8.2f} ms  ({len(ids)} matches)")
+        db.conn.close()
+
+
+def bench_lyrics_index(song_count=100000, batch_size=500, lyrics_count=5000, probes=200):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'library.db'))
+        songs = list(synthetic_songs(song_count))
+        for i in range(0, song_count, batch_size):
+            db.add_songs(songs[i:i + batch_size])
+        lyrics_dir = os.path.join(tmp, 'lyrics')
+        os.makedirs(lyrics_dir)
+        step = song_count // lyrics_count
+        for i, song in enumerate(songs[::step][:lyrics_count]):
+            title, artist = song[0], song[1]
+            if i % 4 == 1:
+                title += ' (Official Video)'
+            elif i % 4 == 2:
+                artist = artist.upper()
+            elif i % 4 == 3:
+                # a typo, left to the fuzzy match
+                title = title.replace('Song', 'Sogn')
+            with open(os.path.join(lyrics_dir, f'{artist} - {title}.lrc'), 'w', encoding='utf-8') as f:
+                f.write('[00:01.00]line\n')
+
+        # Old behaviour: play_song probed for a sibling .lrc on the GUI thread (and
+        # committed assign_lyrics when it found one)
+        start = time.perf_counter()
+        for song in songs[:probes]:
+            os.path.exists(os.path.splitext(song[4])[0] + '.lrc')
+        probe = (time.perf_counter() - start) / probes
+
+        db.add_lyrics_folder(lyrics_dir)
+        indexer = LyricsIndexer(db.get_lyrics_folders(), db_path=db.db_path)
+        start = time.perf_counter()
+        indexer.run()
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        indexer.run()
+        again = time.perf_counter() - start
+        assigned = db.conn.execute('SELECT count(*) FROM songs WHERE lyrics_path IS NOT NULL').fetchone()[0]
+        db.conn.close()
+    print(f"Lyrics association ({song_count} songs, {lyrics_count} lyrics files)")
+    print(f"  play-time .lrc probe     : {probe * 1e3:8.3f} ms per track start")
+    print(f"  background index, first  : {first:8.3f} s  ({assigned} songs assigned)")
+    print(f"  background index, again  : {again:8.3f} s")
+
+
+def bench_track_start(seconds=180, repeat=5):
+    formats = [('WAV', 'wav'), ('FLAC', 'flac'), ('OGG', 'ogg')]
+    if 'MP3' in sf.available_formats():
+        formats.append(('MP3', 'mp3'))
+    processor = AudioProcessor()
+    processor.pcm_cache = None
+    print(f"Starting a {seconds} s track (ms, median of {repeat})")
+    print(f"  {'file':<6}{'before: GUI blocked':>20}{'now: GUI blocked':>18}{'audio ready':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        peak_cache = PeakCache(os.path.join(tmp, 'peaks'))
+        rate = 44100
+        second = (0.3 * np.sin(2 * np.pi * 440 * np.arange(rate) / rate)).astype(np.float32)
+        second = np.stack([second, second], axis=1)
+        for file_format, extension in formats:
+            path = os.path.join(tmp, f"track.{extension}")
+            with sf.SoundFile(path, 'w', rate, 2, format=file_format) as f:
+                for _ in range(seconds):
+                    f.write(second)
+            before, blocked, ready = [], [], []
+            for _ in range(repeat):
+                # Old play_song: open and prefill, tags and peaks, all on the GUI thread
+                start = time.perf_counter()
+                processor.set_audio_file(path)
+                File(path)
+                peak_cache.open(path)
+                before.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                processor.load_file(path)
+                gui_time = time.perf_counter() - start
+                while processor.loaded_track is None:
+                    time.sleep(0.0005)
+                ready.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                processor.install_loaded_file(path)
+                blocked.append(gui_time + time.perf_counter() - start)
+            print(f"  {extension:<6}{np.median(before) * 1000:20.2f}{np.median(blocked) * 1000:18.2f}"
+                  f"{np.median(ready) * 1000:13.2f}")
+    processor.close_decoder()
+    processor.shutting_down = True
+    processor.events.set()
+    processor.wait()
+
+
+BENCHMARKS = {
+    'eq': bench_eq,
+    'db': bench_db,
+    'search': bench_search,
+    'visualizer': bench_visualizer,
+    'load': bench_load,
+    'seek': bench_seek,
+    'lyrics': bench_lyrics,
+    'lyrics_index': bench_lyrics_index,
+    'track_start': bench_track_start,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name} (choose from {', '.join(BENCHMARKS)})")
+            continue
+        BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+    main()
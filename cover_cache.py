@@ -0,0 +1,156 @@
+import os
+import json
+import base64
+import hashlib
+from collections import OrderedDict
+from mutagen import File, MutagenError
+from mutagen.flac import Picture
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QTimer, QCoreApplication, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+
+def extract_cover(file_path):
+    audio_file = File(file_path)
+    if audio_file is None:
+        return None
+    # FLAC picture blocks, front cover first
+    pictures = sorted(getattr(audio_file, 'pictures', None) or [], key=lambda picture: picture.type != 3)
+    if pictures:
+        return pictures[0].data
+    tags = audio_file.tags
+    if not tags:
+        return None
+    # MP4 covr atoms
+    if 'covr' in tags and tags['covr']:
+        return bytes(tags['covr'][0])
+    # Ogg Vorbis/Opus keep FLAC picture blocks base64-encoded in a comment
+    if 'metadata_block_picture' in tags:
+        for value in tags['metadata_block_picture']:
+            try:
+                return Picture(base64.b64decode(value)).data
+            except (ValueError, MutagenError):
+                pass
+    # ID3 APIC frames
+    for tag in tags.values():
+        if hasattr(tag, 'data') and getattr(tag, 'mime', '').startswith('image/'):
+            return tag.data
+    return None
+
+class CoverLoadSignals(QObject):
+    loaded = pyqtSignal(str, int, QImage, object)
+
+class CoverLoadTask(QRunnable):
+    def __init__(self, signals, cache_dir, file_path, size, known):
+        super().__init__()
+        self.signals = signals
+        self.cache_dir = cache_dir
+        self.file_path = file_path
+        self.size = size
+        self.known = known
+
+    def run(self):
+        image = QImage()
+        meta = None
+        try:
+            stat = os.stat(self.file_path)
+            data = None
+            if self.known and self.known[0] == stat.st_mtime_ns and self.known[1] == stat.st_size:
+                digest = self.known[2]
+            else:
+                data = extract_cover(self.file_path)
+                digest = hashlib.sha1(data).hexdigest() if data else ''
+            meta = [stat.st_mtime_ns, stat.st_size, digest]
+
+            if digest:
+                # Thumbnails are named by the image hash, so an album's tracks share one file
+                thumb_path = os.path.join(self.cache_dir, f"{digest}_{self.size}.png")
+                if os.path.exists(thumb_path):
+                    image.load(thumb_path)
+                if image.isNull():
+                    if data is None:
+                        data = extract_cover(self.file_path)
+                    source = QImage.fromData(data) if data else QImage()
+                    if not source.isNull():
+                        image = source.scaled(self.size, self.size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                        image.save(thumb_path, 'PNG')
+        except Exception as e:
+            print(f"Error loading cover: {e}")
+        self.signals.loaded.emit(self.file_path, self.size, image, meta)
+
+class CoverCache(QObject):
+    cover_ready = pyqtSignal(str, int)
+
+    def __init__(self, cache_dir='covers', max_pixmaps=512, parent=None):
+        super().__init__(parent)
+        self.cache_dir = cache_dir
+        self.max_pixmaps = max_pixmaps
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.index = self.load_index()
+        self.pixmaps = OrderedDict()
+        self.pending = set()
+        self.placeholders = {}
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(2, (os.cpu_count() or 2) - 1))
+        self.signals = CoverLoadSignals()
+        self.signals.loaded.connect(self.on_loaded)
+
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(2000)
+        self.save_timer.timeout.connect(self.save_index)
+        if QCoreApplication.instance() is not None:
+            QCoreApplication.instance().aboutToQuit.connect(self.flush_index)
+
+    def load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_index(self):
+        try:
+            with open(self.index_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+        except OSError as e:
+            print(f"Error saving cover index: {e}")
+
+    def flush_index(self):
+        if self.save_timer.isActive():
+            self.save_timer.stop()
+            self.save_index()
+
+    def placeholder(self, size):
+        if size not in self.placeholders:
+            pixmap = QPixmap("asset/song_cover.png")
+            if not pixmap.isNull():
+                pixmap = pixmap.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            self.placeholders[size] = pixmap
+        return self.placeholders[size]
+
+    def get(self, file_path, size):
+        # Returns the thumbnail if it is in memory, otherwise queues it and returns None
+        key = (file_path, size)
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(key)
+            return pixmap
+        if key not in self.pending:
+            self.pending.add(key)
+            task = CoverLoadTask(self.signals, self.cache_dir, file_path, size, self.index.get(file_path))
+            self.pool.start(task)
+        return None
+
+    def on_loaded(self, file_path, size, image, meta):
+        key = (file_path, size)
+        self.pending.discard(key)
+        if meta is not None and self.index.get(file_path) != meta:
+            self.index[file_path] = meta
+            self.save_timer.start()
+
+        pixmap = QPixmap.fromImage(image) if not image.isNull() else self.placeholder(size)
+        self.pixmaps[key] = pixmap
+        while len(self.pixmaps) > self.max_pixmaps:
+            self.pixmaps.popitem(last=False)
+        self.cover_ready.emit(file_path, size)
@@ -1,15 +1,194 @@
+import re
 import sqlite3
+import hashlib
+from contextlib import contextmanager
 from mutagen import File
 import os
+import numpy as np
 from PyQt5.QtCore import QDateTime, Qt
 
+# Columns returned by get_all_songs / get_songs_in_playlist, in tuple order
+SONG_COLUMNS = ['id', 'title', 'artist', 'album', 'duration', 'file_path',
+                'genre', 'year', 'play_count', 'rating', 'lyrics_path']
+SONG_SELECT = ', '.join(SONG_COLUMNS)
+
+# Columns the song list can be sorted on; text columns sort case-insensitively
+SORT_COLUMNS = {'title': 'TEXT', 'artist': 'TEXT', 'album': 'TEXT', 'genre': 'TEXT', 'year': 'INTEGER',
+                'play_count': 'INTEGER', 'rating': 'INTEGER', 'duration': 'INTEGER'}
+
+def order_by_clause(sort_keys, prefix=''):
+    # sort_keys: [(column, descending), ...], most significant first
+    terms = []
+    for column, descending in sort_keys:
+        if column not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort on column {column!r}")
+        collate = ' COLLATE NOCASE' if SORT_COLUMNS[column] == 'TEXT' else ''
+        terms.append(f"{prefix}{column}{collate}{' DESC' if descending else ''}")
+    return ', '.join(terms)
+
+UPSERT_SONG_SQL = '''
+    INSERT INTO songs 
+    (title, artist, album, duration, file_path, genre, year, lyrics_path, file_mtime, file_size, file_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(file_path) DO UPDATE SET
+        title = excluded.title, artist = excluded.artist, album = excluded.album,
+        duration = excluded.duration, genre = excluded.genre, year = excluded.year,
+        lyrics_path = COALESCE(excluded.lyrics_path, songs.lyrics_path),
+        file_mtime = excluded.file_mtime, file_size = excluded.file_size, file_hash = excluded.file_hash
+'''
+
+def lyrics_text(lyrics_path):
+    # Plain text of an .lrc file for the search index: timestamps and [ar:]/[ti:] tags removed
+    if not lyrics_path:
+        return ''
+    try:
+        with open(lyrics_path, 'r', encoding='utf-8', errors='ignore') as f:
+            lines = (re.sub(r'\[[^\]]*\]|<[^>]*>', '', line).strip() for line in f)
+            return '\n'.join(line for line in lines if line)
+    except OSError as e:
+        print(f"Error reading lyrics for search index: {e}")
+        return ''
+
+def search_query(text):
+    # Every word the user typed must match the start of a word somewhere in the row
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' for word in words)
+
+def quick_hash(file_path, sample_size=65536):
+    # Size plus the first and last 64 KB: enough to tell edits and renames apart
+    # without reading whole files during a rescan
+    size = os.path.getsize(file_path)
+    digest = hashlib.sha1(str(size).encode('ascii'))
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(sample_size))
+        if size > sample_size * 2:
+            f.seek(-sample_size, os.SEEK_END)
+            digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+def file_fingerprint(file_path):
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size, quick_hash(file_path)
+
+def first_tag(tags, key, id3_key):
+    # First value of a format-independent tag key, or of the ID3 frame when the
+    # file only has raw ID3 tags
+    if not tags:
+        return None
+    values = tags.get(key) or tags.get(id3_key)
+    if not values:
+        return None
+    return str(values[0]) or None
+
+def read_song_tags(file_path):
+    # Module level so it can run in a process pool during bulk imports.
+    # Returns None when the file is gone or mutagen fails on it, so a bad read
+    # never overwrites the tags already stored for that path.
+    try:
+        mtime, size, content_hash = file_fingerprint(file_path)
+    except OSError as e:
+        print(f"Error reading {file_path}: {e}")
+        return None
+
+    title = os.path.basename(file_path)
+    artist = "Unknown Artist"
+    album = "Unknown Album"
+    duration = 0
+    genre = None
+    year = None
+
+    try:
+        # easy=True gives MP3 and MP4 files the same title/artist/... keys that
+        # FLAC and Vorbis comments use; WAV keeps raw ID3 frames
+        audio_file = File(file_path, easy=True)
+    except Exception as e:
+        print(f"Error reading tags from {file_path}: {e}")
+        return None
+
+    if audio_file is not None:
+        tags = audio_file.tags
+        title = first_tag(tags, 'title', 'TIT2') or title
+        artist = first_tag(tags, 'artist', 'TPE1') or artist
+        album = first_tag(tags, 'album', 'TALB') or album
+        duration = int(audio_file.info.length) if audio_file.info else 0
+        genre = first_tag(tags, 'genre', 'TCON')
+
+        date = first_tag(tags, 'date', 'TDRC')
+        if date:
+            try:
+                year = int(date.split('-')[0])
+            except ValueError as e:
+                print(f"Error parsing year from {date!r}: {e}")
+                year = None
+
+    return (title, artist, album, duration, file_path, genre, year, None, mtime, size, content_hash)
+
 class DatabaseManager:
-    def __init__(self):
-        self.conn = sqlite3.connect('music_library.db')
+    def __init__(self, db_path='music_library.db'):
+        self.db_path = db_path
+        # The importer/scanner threads open their own connection; wait for their
+        # write transactions instead of failing with "database is locked"
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.batch_depth = 0
+        self.configure_connection()
         self.create_tables()
     
+    def configure_connection(self):
+        cursor = self.conn.cursor()
+        # WAL lets the GUI keep reading while a background import writes, and
+        # synchronous=NORMAL only syncs at checkpoints instead of every commit
+        cursor.execute('PRAGMA journal_mode = WAL')
+        cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.execute('PRAGMA temp_store = MEMORY')
+        cursor.execute('PRAGMA cache_size = -16000')
+        cursor.execute('PRAGMA mmap_size = 268435456')
+    
+    @contextmanager
+    def transaction(self):
+        # Groups several calls into one commit. Nested blocks join the outer one,
+        # and the single-statement methods below skip their own commit inside it.
+        self.batch_depth += 1
+        try:
+            yield self.conn.cursor()
+        except Exception:
+            self.batch_depth -= 1
+            if self.batch_depth == 0:
+                self.conn.rollback()
+            raise
+        self.batch_depth -= 1
+        if self.batch_depth == 0:
+            self.conn.commit()
+    
+    def commit(self):
+        if self.batch_depth == 0:
+            self.conn.commit()
+    
     def create_tables(self):
+        # Schema changes are numbered migrations; PRAGMA user_version records
+        # how many of them this database file has already run
         cursor = self.conn.cursor()
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        for number, migration in enumerate(self.migrations(), start=1):
+            if number <= version:
+                continue
+            try:
+                # sqlite3 does not open a transaction for DDL on its own
+                cursor.execute('BEGIN')
+                migration(cursor)
+                cursor.execute(f'PRAGMA user_version = {number}')
+                self.conn.commit()
+                print(f"Database migrated to version {number}")
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                print(f"Database migration {number} failed: {e}")
+                break
+    
+    def migrations(self):
+        return [self.migrate_base_tables, self.migrate_fingerprints, self.migrate_indexes,
+                self.migrate_search_index, self.migrate_lyrics_cache, self.migrate_lyrics_folders,
+                self.migrate_packed_lyrics_cache]
+    
+    def migrate_base_tables(self, cursor):
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS songs (
                 id INTEGER PRIMARY KEY,
@@ -43,77 +222,225 @@ class DatabaseManager:
                 FOREIGN KEY (song_id) REFERENCES songs (id)
             )
         ''')
-        self.conn.commit()
+    
+    def migrate_fingerprints(self, cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS library_folders (
+                path TEXT PRIMARY KEY
+            )
+        ''')
+        
+        # Libraries created before user_version was tracked may already have these
+        existing = {row[1] for row in cursor.execute('PRAGMA table_info(songs)')}
+        for column, column_type in (('file_mtime', 'INTEGER'), ('file_size', 'INTEGER'), ('file_hash', 'TEXT')):
+            if column not in existing:
+                cursor.execute(f'ALTER TABLE songs ADD COLUMN {column} {column_type}')
+    
+    def migrate_indexes(self, cursor):
+        # Matches the ORDER BY of get_all_songs, so the library loads without a sort step
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_songs_artist_album_title ON songs (artist, album, title)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_playlist_songs_playlist ON playlist_songs (playlist_id, position)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_playlist_songs_song ON playlist_songs (song_id)')
+        cursor.execute('ANALYZE')
+    
+    def migrate_search_index(self, cursor):
+        # rowid of songs_fts is the song id. Tag columns follow songs through the
+        # triggers below; the lyrics column is written by assign_lyrics.
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts USING fts5(
+                title, artist, album, genre, lyrics,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '1 2 3'
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS songs_fts_insert AFTER INSERT ON songs BEGIN
+                INSERT INTO songs_fts (rowid, title, artist, album, genre, lyrics)
+                VALUES (new.id, new.title, new.artist, new.album, new.genre, '');
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS songs_fts_update AFTER UPDATE OF title, artist, album, genre ON songs BEGIN
+                UPDATE songs_fts SET title = new.title, artist = new.artist, album = new.album, genre = new.genre
+                WHERE rowid = new.id;
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS songs_fts_delete AFTER DELETE ON songs BEGIN
+                DELETE FROM songs_fts WHERE rowid = old.id;
+            END
+        ''')
+        
+        cursor.execute('''
+            INSERT INTO songs_fts (rowid, title, artist, album, genre, lyrics)
+            SELECT id, title, artist, album, genre, '' FROM songs
+        ''')
+        rows = cursor.execute('SELECT id, lyrics_path FROM songs WHERE lyrics_path IS NOT NULL').fetchall()
+        cursor.executemany('UPDATE songs_fts SET lyrics = ? WHERE rowid = ?',
+                           [(lyrics_text(lyrics_path), song_id) for song_id, lyrics_path in rows])
+    
+    def migrate_lyrics_cache(self, cursor):
+        # Parsed .lrc files as JSON, valid while the file keeps the same mtime
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS lyrics_cache (
+                lyrics_path TEXT PRIMARY KEY,
+                mtime INTEGER NOT NULL,
+                data TEXT NOT NULL
+            )
+        ''')
+    
+    def migrate_lyrics_folders(self, cursor):
+        # Folders of .lrc files kept apart from the music, searched by LyricsIndexer
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS lyrics_folders (
+                path TEXT PRIMARY KEY
+            )
+        ''')
+    
+    def migrate_packed_lyrics_cache(self, cursor):
+        # The cache now holds lyrics.pack_lyrics bytes instead of JSON; the old
+        # rows are dropped and re-parsed the next time each file is played
+        cursor.execute('DROP TABLE IF EXISTS lyrics_cache')
+        cursor.execute('''
+            CREATE TABLE lyrics_cache (
+                lyrics_path TEXT PRIMARY KEY,
+                mtime INTEGER NOT NULL,
+                data BLOB NOT NULL
+            )
+        ''')
     
     def add_song(self, file_path):
         cursor = self.conn.cursor()
         try:
             print(f"Processing file: {file_path}")
-            audio_file = File(file_path)
-            title = os.path.basename(file_path)
-            artist = "Unknown Artist"
-            album = "Unknown Album"
-            duration = 0
-            genre = None
-            year = None
-        
-            if audio_file:
-                title = str(audio_file.get('TIT2', [title])[0]) if audio_file.get('TIT2') else title
-                artist = str(audio_file.get('TPE1', [artist])[0]) if audio_file.get('TPE1') else artist
-                album = str(audio_file.get('TALB', [album])[0]) if audio_file.get('TALB') else album
-                duration = int(audio_file.info.length) if audio_file.info else 0
-                genre = str(audio_file.get('TCON', [None])[0]) if audio_file.get('TCON') else None
-            
-                if audio_file.get('TDRC'):
-                    tdrc = audio_file.get('TDRC')[0]
-                    print(f"TDRC value: {tdrc}, type: {type(tdrc)}")
-                    try:
-                        year_str = str(tdrc)
-                        year = int(year_str.split('-')[0]) if year_str else None
-                    except (ValueError, TypeError) as e:
-                        print(f"Error parsing year from TDRC: {e}")
-                        year = None
-        
-            song_data = (title, artist, album, duration, file_path, genre, year, None)
+            song_data = read_song_tags(file_path)
+            if song_data is None:
+                return None
             print(f"Song data to insert: {song_data}")
-            cursor.execute('''
-                INSERT OR REPLACE INTO songs 
-                (title, artist, album, duration, file_path, genre, year, lyrics_path)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', song_data)
-            self.conn.commit()
-            return cursor.lastrowid
+            # Upsert keeps the row id, so playlist_songs references stay valid
+            cursor.execute(UPSERT_SONG_SQL, song_data)
+            self.commit()
+            cursor.execute('SELECT id FROM songs WHERE file_path = ?', (file_path,))
+            return cursor.fetchone()[0]
         except sqlite3.Error as e:
             print(f"Database error: {e}")
             return None
     
+    def add_songs(self, songs_data):
+        # Bulk variant of add_song: one transaction for the whole batch.
+        # Files whose tags couldn't be read (None) are skipped.
+        songs_data = [song_data for song_data in songs_data if song_data is not None]
+        try:
+            with self.transaction():
+                self.conn.executemany(UPSERT_SONG_SQL, songs_data)
+            return len(songs_data)
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return 0
+    
     def assign_lyrics(self, song_id, lyrics_path):
         cursor = self.conn.cursor()
         try:
             cursor.execute('''
                 UPDATE songs SET lyrics_path = ? WHERE id = ?
             ''', (lyrics_path, song_id))
-            self.conn.commit()
+            cursor.execute('UPDATE songs_fts SET lyrics = ? WHERE rowid = ?', (lyrics_text(lyrics_path), song_id))
+            self.commit()
             print(f"Assigned lyrics {lyrics_path} to song ID {song_id}")
         except sqlite3.Error as e:
             print(f"Database error: {e}")
     
-    def get_all_songs(self):
+    def get_parsed_lyrics(self, lyrics_path, mtime):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM songs ORDER BY artist, album, title')
+        try:
+            cursor.execute('SELECT data FROM lyrics_cache WHERE lyrics_path = ? AND mtime = ?', (lyrics_path, mtime))
+            row = cursor.fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return None
+    
+    def store_parsed_lyrics(self, lyrics_path, mtime, data):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute('INSERT OR REPLACE INTO lyrics_cache (lyrics_path, mtime, data) VALUES (?, ?, ?)',
+                           (lyrics_path, mtime, data))
+            self.commit()
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+    
+    def get_lyrics_path(self, song_id):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute('SELECT lyrics_path FROM songs WHERE id = ?', (song_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return None
+    
+    def get_lyrics_candidates(self):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT id, title, artist, file_path, lyrics_path FROM songs')
+        return cursor.fetchall()
+    
+    def update_lyrics_paths(self, rows):
+        # rows: (lyrics_path, song_id); None clears a lyrics file that is gone
+        try:
+            with self.transaction():
+                self.conn.executemany('UPDATE songs SET lyrics_path = ? WHERE id = ?', rows)
+                self.conn.executemany('UPDATE songs_fts SET lyrics = ? WHERE rowid = ?',
+                                      [(lyrics_text(lyrics_path), song_id) for lyrics_path, song_id in rows])
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+    
+    def get_all_songs(self, sort_keys=None):
+        cursor = self.conn.cursor()
+        order = 'artist, album, title'
+        if sort_keys:
+            # Ties keep the default library order, like a stable sort of the list would
+            order = order_by_clause(sort_keys) + ', artist, album, title, id'
+        cursor.execute(f'SELECT {SONG_SELECT} FROM songs ORDER BY {order}')
         return cursor.fetchall()
     
+    def search_song_ids(self, text, limit=None):
+        # Returns an array of the ids of songs matching every word typed, or None
+        # for an empty search. The ids come back as one string: fetching 100k
+        # single-column rows costs more than the FTS lookup itself. With a limit
+        # FTS stops after that many matches, so a one-letter prefix stays cheap;
+        # a result of exactly limit ids means there may be more.
+        query = search_query(text)
+        if not query:
+            return None
+        cursor = self.conn.cursor()
+        try:
+            if limit is None:
+                cursor.execute('SELECT group_concat(rowid) FROM songs_fts WHERE songs_fts MATCH ?', (query,))
+            else:
+                cursor.execute('SELECT group_concat(rowid) FROM '
+                               '(SELECT rowid FROM songs_fts WHERE songs_fts MATCH ? LIMIT ?)', (query, limit))
+            ids = cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Search error: {e}")
+            ids = None
+        if not ids:
+            return np.zeros(0, dtype=np.int64)
+        return np.fromstring(ids, dtype=np.int64, sep=',')
+    
     def update_play_count(self, song_id):
         cursor = self.conn.cursor()
         cursor.execute('UPDATE songs SET play_count = play_count + 1 WHERE id = ?', (song_id,))
-        self.conn.commit()
+        self.commit()
     
     def create_playlist(self, name):
         cursor = self.conn.cursor()
         try:
             cursor.execute('INSERT INTO playlists (name, created_date) VALUES (?, ?)',
                          (name, QDateTime.currentDateTime().toString(Qt.ISODate)))
-            self.conn.commit()
+            self.commit()
             return cursor.lastrowid
         except sqlite3.Error as e:
             print(f"Database error: {e}")
@@ -129,17 +456,27 @@ class DatabaseManager:
         try:
             cursor.execute('INSERT INTO playlist_songs (playlist_id, song_id, position) VALUES (?, ?, ?)',
                          (playlist_id, song_id, position))
-            self.conn.commit()
+            self.commit()
         except sqlite3.Error as e:
             print(f"Database error: {e}")
     
-    def get_songs_in_playlist(self, playlist_id):
+    def next_playlist_position(self, playlist_id):
         cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT s.* FROM songs s
+        cursor.execute('SELECT MAX(position) FROM playlist_songs WHERE playlist_id = ?', (playlist_id,))
+        result = cursor.fetchone()[0]
+        return 0 if result is None else result + 1
+    
+    def get_songs_in_playlist(self, playlist_id, sort_keys=None):
+        cursor = self.conn.cursor()
+        order = 'ps.position'
+        if sort_keys:
+            # Same tie-breakers as get_all_songs and SongListModel.sort_songs
+            order = order_by_clause(sort_keys, prefix='s.') + ', s.artist, s.album, s.title, s.id, ps.position'
+        cursor.execute(f'''
+            SELECT {', '.join('s.' + column for column in SONG_COLUMNS)} FROM songs s
             JOIN playlist_songs ps ON s.id = ps.song_id
             WHERE ps.playlist_id = ?
-            ORDER BY ps.position
+            ORDER BY {order}
         ''', (playlist_id,))
         return cursor.fetchall()
     
@@ -148,7 +485,7 @@ class DatabaseManager:
         try:
             cursor.execute('DELETE FROM playlist_songs WHERE song_id = ?', (song_id,))
             cursor.execute('DELETE FROM songs WHERE id = ?', (song_id,))
-            self.conn.commit()
+            self.commit()
             print(f"Song ID {song_id} removed from database")
         except sqlite3.Error as e:
             print(f"Database error: {e}")
@@ -158,7 +495,7 @@ class DatabaseManager:
         try:
             cursor.execute('DELETE FROM playlist_songs WHERE playlist_id = ? AND song_id = ?', 
                          (playlist_id, song_id))
-            self.conn.commit()
+            self.commit()
             print(f"Song ID {song_id} removed from playlist ID {playlist_id}")
         except sqlite3.Error as e:
             print(f"Database error: {e}")
@@ -168,9 +505,66 @@ class DatabaseManager:
         try:
             cursor.execute('DELETE FROM playlist_songs WHERE playlist_id = ?', (playlist_id,))
             cursor.execute('DELETE FROM playlists WHERE id = ?', (playlist_id,))
-            self.conn.commit()
+            self.commit()
             print(f"Playlist ID {playlist_id} deleted")
             return True
         except sqlite3.Error as e:
             print(f"Database error: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    def get_file_fingerprints(self):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT id, file_path, file_mtime, file_size, file_hash FROM songs')
+        return {row[1]: (row[0], row[2], row[3], row[4]) for row in cursor.fetchall()}
+    
+    def update_fingerprints(self, rows):
+        # rows: (file_mtime, file_size, song_id) for files touched but not changed
+        try:
+            with self.transaction():
+                self.conn.executemany('UPDATE songs SET file_mtime = ?, file_size = ? WHERE id = ?', rows)
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+    
+    def move_songs(self, rows):
+        # rows: (file_path, file_mtime, file_size, song_id) for renamed/moved files
+        try:
+            with self.transaction():
+                self.conn.executemany(
+                    'UPDATE songs SET file_path = ?, file_mtime = ?, file_size = ? WHERE id = ?', rows)
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+    
+    def remove_songs(self, song_ids):
+        try:
+            with self.transaction():
+                params = [(song_id,) for song_id in song_ids]
+                self.conn.executemany('DELETE FROM playlist_songs WHERE song_id = ?', params)
+                self.conn.executemany('DELETE FROM songs WHERE id = ?', params)
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+    
+    def add_library_folder(self, path):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute('INSERT OR IGNORE INTO library_folders (path) VALUES (?)', (path,))
+            self.commit()
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+    
+    def get_library_folders(self):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT path FROM library_folders ORDER BY path')
+        return [row[0] for row in cursor.fetchall()]
+    
+    def add_lyrics_folder(self, path):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute('INSERT OR IGNORE INTO lyrics_folders (path) VALUES (?)', (path,))
+            self.commit()
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+    
+    def get_lyrics_folders(self):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT path FROM lyrics_folders ORDER BY path')
+        return [row[0] for row in cursor.fetchall()]
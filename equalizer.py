@@ -1,33 +1,73 @@
+import numpy as np
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QSlider, QPushButton
 from PyQt5.QtCore import Qt, pyqtSignal
+from audio_processor import EQ_LAYOUTS
+
+# Preset gains at the 8-band frequencies; other layouts interpolate them
+PRESETS = {
+    'Flat': [0, 0, 0, 0, 0, 0, 0, 0],
+    'Rock': [4, 2, -2, -1, 1, 3, 4, 3],
+    'Pop': [-1, 2, 4, 4, 1, -1, -1, -1],
+    'Jazz': [3, 2, 1, 2, -1, -1, 0, 1],
+    'Classical': [4, 3, 2, 0, -1, -1, 0, 3],
+    'Bass Boost': [6, 4, 2, 0, 0, 0, 0, 0],
+    'Treble Boost': [0, 0, 0, 0, 2, 4, 6, 8]
+}
+
+def map_gains(gains, from_frequencies, to_frequencies):
+    # Moves a gain curve to other bands, linear in log frequency
+    if list(from_frequencies) == list(to_frequencies):
+        return [int(round(gain)) for gain in gains]
+    values = np.interp(np.log(to_frequencies), np.log(from_frequencies), gains)
+    return [int(round(value)) for value in values]
+
+def frequency_label(freq, unit='Hz'):
+    if freq >= 1000:
+        return f'{freq / 1000:g}k{unit}'
+    return f'{freq:g}{unit}'
 
 class Equalizer(QWidget):
     eq_changed = pyqtSignal(int, float)
     
-    def __init__(self):
+    def __init__(self, band_count=8):
         super().__init__()
+        self.frequencies = EQ_LAYOUTS[band_count][0]
         self.init_ui()
-        
+    
     def init_ui(self):
         layout = QVBoxLayout()
         
         preset_layout = QHBoxLayout()
         preset_layout.addWidget(QLabel("Preset:"))
         self.preset_combo = QComboBox()
-        self.preset_combo.addItems(['Flat', 'Rock', 'Pop', 'Jazz', 'Classical', 'Bass Boost', 'Treble Boost'])
+        self.preset_combo.addItems(list(PRESETS))
         self.preset_combo.currentTextChanged.connect(self.apply_preset)
         preset_layout.addWidget(self.preset_combo)
         layout.addLayout(preset_layout)
         
-        freq_layout = QHBoxLayout()
+        self.bands_widget = self.create_bands([0] * len(self.frequencies))
+        layout.addWidget(self.bands_widget)
+        
+        reset_btn = QPushButton("Reset")
+        reset_btn.clicked.connect(self.reset_eq)
+        layout.addWidget(reset_btn)
+        
+        self.setLayout(layout)
+    
+    def create_bands(self, values):
+        bands_widget = QWidget()
+        freq_layout = QHBoxLayout(bands_widget)
+        freq_layout.setContentsMargins(0, 0, 0, 0)
+        # 31 sliders need to sit closer together than 8
+        narrow = len(self.frequencies) > 10
+        freq_layout.setSpacing(2 if narrow else 6)
         self.sliders = []
         self.value_labels = []
-        frequencies = ['60Hz', '170Hz', '310Hz', '600Hz', '1kHz', '3kHz', '6kHz', '12kHz']
         
-        for i, freq in enumerate(frequencies):
+        for i, freq in enumerate(self.frequencies):
             slider_layout = QVBoxLayout()
             
-            value_label = QLabel('0 dB')
+            value_label = QLabel(f'{values[i]} dB')
             value_label.setAlignment(Qt.AlignCenter)
             value_label.setStyleSheet("font-size: 10px;")  # Remove color, rely on parent
             slider_layout.addWidget(value_label)
@@ -35,45 +75,42 @@ class Equalizer(QWidget):
             
             slider = QSlider(Qt.Vertical)
             slider.setRange(-12, 12)
-            slider.setValue(0)
+            slider.setValue(values[i])
             slider.valueChanged.connect(
                 lambda v, idx=i, lbl=value_label: self.slider_changed(idx, v, lbl)
             )
             slider_layout.addWidget(slider)
             
-            freq_label = QLabel(freq)
+            freq_label = QLabel(frequency_label(freq, '' if narrow else 'Hz'))
             freq_label.setAlignment(Qt.AlignCenter)
             freq_label.setStyleSheet("font-size: 10px;")  # Remove color, rely on parent
             slider_layout.addWidget(freq_label)
             
             freq_layout.addLayout(slider_layout)
             self.sliders.append(slider)
-        
-        layout.addLayout(freq_layout)
-        
-        reset_btn = QPushButton("Reset")
-        reset_btn.clicked.connect(self.reset_eq)
-        layout.addWidget(reset_btn)
-        
-        self.setLayout(layout)
+        return bands_widget
+    
+    def set_band_count(self, band_count):
+        # Rebuilds the sliders for another layout, carrying the current curve over
+        frequencies = EQ_LAYOUTS[band_count][0]
+        if list(frequencies) == list(self.frequencies):
+            return
+        values = map_gains([slider.value() for slider in self.sliders], self.frequencies, frequencies)
+        self.frequencies = frequencies
+        old_widget = self.bands_widget
+        self.bands_widget = self.create_bands(values)
+        self.layout().replaceWidget(old_widget, self.bands_widget)
+        old_widget.deleteLater()
+        for i, value in enumerate(values):
+            self.eq_changed.emit(i, float(value))
     
     def slider_changed(self, band_index, value, label):
         label.setText(f'{value} dB')
         self.eq_changed.emit(band_index, float(value))
     
     def apply_preset(self, preset_name):
-        presets = {
-            'Flat': [0, 0, 0, 0, 0, 0, 0, 0],
-            'Rock': [4, 2, -2, -1, 1, 3, 4, 3],
-            'Pop': [-1, 2, 4, 4, 1, -1, -1, -1],
-            'Jazz': [3, 2, 1, 2, -1, -1, 0, 1],
-            'Classical': [4, 3, 2, 0, -1, -1, 0, 3],
-            'Bass Boost': [6, 4, 2, 0, 0, 0, 0, 0],
-            'Treble Boost': [0, 0, 0, 0, 2, 4, 6, 8]
-        }
-        
-        if preset_name in presets:
-            values = presets[preset_name]
+        if preset_name in PRESETS:
+            values = map_gains(PRESETS[preset_name], EQ_LAYOUTS[8][0], self.frequencies)
             for i, value in enumerate(values):
                 if i < len(self.sliders):
                     self.sliders[i].setValue(value)
@@ -84,4 +121,4 @@ class Equalizer(QWidget):
         for i, slider in enumerate(self.sliders):
             slider.setValue(0)
             self.value_labels[i].setText('0 dB')
-            self.eq_changed.emit(i, 0.0)
\ No newline at end of file
+            self.eq_changed.emit(i, 0.0)
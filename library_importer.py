@@ -0,0 +1,356 @@
+import os
+import re
+import unicodedata
+import multiprocessing
+from difflib import get_close_matches
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from PyQt5.QtCore import QThread, QCoreApplication, pyqtSignal
+from database_manager import DatabaseManager, read_song_tags, quick_hash
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.flac', '.ogg', '.m4a')
+
+def path_key(path):
+    return os.path.normcase(os.path.normpath(path))
+
+# Bracketed parts of titles and file names: (feat. X), (Official Video), [SPOTDOWNLOADER.COM]
+NAME_NOISE = re.compile(r'\[[^\]]*\]|\([^)]*\)|\{[^}]*\}')
+FEATURING = re.compile(r'\s(?:feat|ft|featuring)\.?\s.*$')
+NAME_WORD = re.compile(r'[^\W_]+')
+NAME_NUMBER = re.compile(r'\d+')
+
+def normalize_name(text):
+    # Lowercase words without accents, brackets or punctuation, for comparing
+    # tags with lyrics file names
+    text = text or ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = text.casefold()
+    text = FEATURING.sub('', NAME_NOISE.sub(' ', text).replace('&', ' and '))
+    return ' '.join(NAME_WORD.findall(text))
+
+def split_lyrics_name(file_path):
+    # "Artist - Title.lrc" gives (artist, title); a plain "Title.lrc" has no artist
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    artist, separator, title = stem.partition(' - ')
+    if not separator or artist.strip().isdigit():
+        return '', stem if not separator else title
+    return artist, title
+
+class LyricsIndex:
+    # .lrc files by normalized artist and title. A song matches, in order: an .lrc
+    # next to it with the same name, the same artist and title, the closest artist
+    # and title (difflib ratio >= cutoff), or a title that only one file has.
+    # Close titles must contain the same numbers: "Part 1" is not "Part 2".
+    def __init__(self, lyrics_paths, cutoff=0.9):
+        self.cutoff = cutoff
+        self.by_stem = {}
+        self.by_artist = {}
+        self.by_title = {}
+        # artist -> numbers in the title -> titles, the candidates for a close match
+        self.fuzzy_titles = {}
+        for path in lyrics_paths:
+            self.by_stem[path_key(os.path.splitext(path)[0])] = path
+            artist, title = split_lyrics_name(path)
+            artist, title = normalize_name(artist), normalize_name(title)
+            if title:
+                titles = self.by_artist.setdefault(artist, {})
+                if title not in titles:
+                    titles[title] = path
+                    numbers = tuple(NAME_NUMBER.findall(title))
+                    self.fuzzy_titles.setdefault(artist, {}).setdefault(numbers, []).append(title)
+                self.by_title.setdefault(title, []).append(path)
+        self.fuzzy_artists = {}
+        for artist in self.by_artist:
+            if artist:
+                self.fuzzy_artists.setdefault(tuple(NAME_NUMBER.findall(artist)), []).append(artist)
+        self.closest_artists = {}
+
+    def closest_artist(self, artist):
+        # Many songs share an artist, so each name is only looked up once
+        if artist in self.by_artist:
+            return artist
+        if artist not in self.closest_artists:
+            self.closest_artists[artist] = self.closest(artist, self.fuzzy_artists)
+        return self.closest_artists[artist]
+
+    def closest(self, name, candidates_by_numbers):
+        candidates = candidates_by_numbers.get(tuple(NAME_NUMBER.findall(name)))
+        if not candidates:
+            return None
+        matches = get_close_matches(name, candidates, 1, self.cutoff)
+        return matches[0] if matches else None
+
+    def match(self, artist, title, file_path):
+        stem = os.path.splitext(file_path)[0]
+        path = self.by_stem.get(path_key(stem))
+        if path is not None:
+            return path
+        # Untagged songs have the file name as title and "Unknown Artist"
+        if not title:
+            title = os.path.basename(stem)
+        elif title.lower().endswith(AUDIO_EXTENSIONS):
+            title = os.path.splitext(title)[0]
+        title = normalize_name(title)
+        artist = normalize_name(artist) if artist and artist != "Unknown Artist" else ''
+        if not title:
+            return None
+
+        if artist:
+            artist = self.closest_artist(artist)
+            titles = self.by_artist.get(artist)
+            if titles:
+                path = titles.get(title)
+                if path is None:
+                    close = self.closest(title, self.fuzzy_titles[artist])
+                    path = titles[close] if close else None
+                if path is not None:
+                    return path
+            # A file without an artist in its name can still be this song's
+            return self.by_artist.get('', {}).get(title)
+        paths = self.by_title.get(title)
+        return paths[0] if paths and len(paths) == 1 else None
+
+class LibraryImporter(QThread):
+    progress = pyqtSignal(int, int)
+    import_finished = pyqtSignal(int, bool)
+
+    def __init__(self, file_paths, db_path='music_library.db', batch_size=500, use_processes=True):
+        super().__init__()
+        self.file_paths = list(file_paths)
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.use_processes = use_processes
+        self.cancelled = False
+        if QCoreApplication.instance() is not None:
+            QCoreApplication.instance().aboutToQuit.connect(self.stop)
+
+    def cancel(self):
+        self.cancelled = True
+
+    def stop(self):
+        # Quitting mid-import: finish the batch in hand, then close the pool and database
+        self.cancel()
+        if self.isRunning():
+            self.wait()
+
+    def create_pool(self):
+        workers = os.cpu_count() or 1
+        if self.use_processes:
+            try:
+                # Forking from a process running Qt threads can deadlock the child
+                return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            except (OSError, NotImplementedError) as e:
+                print(f"Process pool unavailable, using threads: {e}")
+        return ThreadPoolExecutor(max_workers=workers)
+
+    def import_paths(self, db_manager, file_paths):
+        total = len(file_paths)
+        imported = 0
+        done = 0
+        batch = []
+        if not file_paths:
+            return 0
+        pool = self.create_pool()
+        try:
+            chunksize = max(1, min(64, total // ((os.cpu_count() or 1) * 4)))
+            for song_data in pool.map(read_song_tags, file_paths, chunksize=chunksize):
+                if self.cancelled:
+                    break
+                done += 1
+                if song_data is not None:
+                    batch.append(song_data)
+                if len(batch) >= self.batch_size:
+                    imported += db_manager.add_songs(batch)
+                    batch = []
+                if done % 50 == 0:
+                    self.progress.emit(done, total)
+            if batch and not self.cancelled:
+                imported += db_manager.add_songs(batch)
+        except Exception as e:
+            print(f"Error importing songs: {e}")
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        self.progress.emit(done, total)
+        return imported
+
+    def run(self):
+        # sqlite connections are per thread, so the importer opens its own
+        db_manager = DatabaseManager(self.db_path)
+        try:
+            imported = self.import_paths(db_manager, self.file_paths)
+        finally:
+            db_manager.conn.close()
+        print(f"Imported {imported} of {len(self.file_paths)} songs{' (cancelled)' if self.cancelled else ''}")
+        self.import_finished.emit(imported, self.cancelled)
+
+class LibraryScanner(LibraryImporter):
+    # Rescans library folders, re-parsing only files whose mtime/size changed.
+    # Existing rows are updated in place so song ids (and playlists) survive.
+    # Like an import, a scan is cancelled and waited for when the app quits.
+    scan_finished = pyqtSignal(dict)
+
+    def __init__(self, folders, db_path='music_library.db', **kwargs):
+        super().__init__([], db_path=db_path, **kwargs)
+        self.folders = list(folders)
+        self.watch_dirs = []
+
+    def walk_folders(self, folders):
+        on_disk = {}
+        for folder in folders:
+            for root, dirs, files in os.walk(folder):
+                if self.cancelled:
+                    return on_disk
+                self.watch_dirs.append(root)
+                for name in files:
+                    if name.lower().endswith(AUDIO_EXTENSIONS):
+                        path = os.path.join(root, name)
+                        try:
+                            on_disk[path_key(path)] = (path, os.stat(path))
+                        except OSError:
+                            pass
+        return on_disk
+
+    def run(self):
+        db_manager = DatabaseManager(self.db_path)
+        summary = {'unchanged': 0, 'touched': 0, 'moved': 0, 'parsed': 0, 'removed': 0}
+        try:
+            # Folders that are not there (unplugged drive) are skipped, not emptied
+            folders = [folder for folder in self.folders if os.path.isdir(folder)]
+            folder_keys = [os.path.join(path_key(folder), '') for folder in folders]
+            on_disk = self.walk_folders(folders)
+            if self.cancelled:
+                return
+
+            known = {}
+            stored_paths = {}
+            for stored_path, row in db_manager.get_file_fingerprints().items():
+                known[path_key(stored_path)] = row
+                stored_paths[path_key(stored_path)] = stored_path
+
+            changed = []
+            touched = []
+            for key, (path, stat) in on_disk.items():
+                if self.cancelled:
+                    return
+                row = known.get(key)
+                if row is not None and row[1] == stat.st_mtime_ns and row[2] == stat.st_size:
+                    summary['unchanged'] += 1
+                elif row is not None and row[3] and row[3] == quick_hash(path):
+                    touched.append((stat.st_mtime_ns, stat.st_size, row[0]))
+                else:
+                    changed.append(key)
+
+            missing = [key for key in known
+                       if key not in on_disk and any(key.startswith(prefix) for prefix in folder_keys)]
+
+            # A new path with the same content hash as a vanished one is a move
+            moved = []
+            missing_by_hash = {known[key][3]: key for key in missing if known[key][3]}
+            if missing_by_hash:
+                for key in list(changed):
+                    if key in known:
+                        continue
+                    path, stat = on_disk[key]
+                    old_key = missing_by_hash.pop(quick_hash(path), None)
+                    if old_key is not None:
+                        moved.append((path, stat.st_mtime_ns, stat.st_size, known[old_key][0]))
+                        changed.remove(key)
+                        missing.remove(old_key)
+
+            if self.cancelled:
+                return
+            db_manager.update_fingerprints(touched)
+            db_manager.move_songs(moved)
+            db_manager.remove_songs([known[key][0] for key in missing])
+            summary['touched'] = len(touched)
+            summary['moved'] = len(moved)
+            summary['removed'] = len(missing)
+            # Changed files keep their stored path string so the upsert hits the same row
+            self.file_paths = [stored_paths.get(key, on_disk[key][0]) for key in changed]
+            summary['parsed'] = self.import_paths(db_manager, self.file_paths)
+        except Exception as e:
+            print(f"Error scanning library: {e}")
+        finally:
+            db_manager.conn.close()
+            print(f"Library rescan: {summary}")
+            self.scan_finished.emit(summary)
+
+class LyricsIndexer(QThread):
+    # Matches every song against the .lrc files in the lyrics and library folders,
+    # plus the folders of songs outside them, and stores the result in one
+    # transaction, so starting a track never has to look for a lyrics file.
+    index_finished = pyqtSignal(int, int)
+
+    def __init__(self, folders, db_path='music_library.db'):
+        super().__init__()
+        self.folders = list(folders)
+        self.db_path = db_path
+        self.cancelled = False
+        if QCoreApplication.instance() is not None:
+            QCoreApplication.instance().aboutToQuit.connect(self.stop)
+
+    def cancel(self):
+        self.cancelled = True
+
+    def stop(self):
+        self.cancel()
+        if self.isRunning():
+            self.wait()
+
+    def find_lyrics_files(self, songs):
+        found = {}
+        folders = [folder for folder in self.folders if os.path.isdir(folder)]
+        for folder in folders:
+            for root, dirs, files in os.walk(folder):
+                if self.cancelled:
+                    return found
+                for name in files:
+                    if name.lower().endswith('.lrc'):
+                        path = os.path.join(root, name)
+                        found[path_key(path)] = path
+        # Songs imported on their own still pick up an .lrc lying next to them
+        folder_keys = [os.path.join(path_key(folder), '') for folder in folders]
+        song_dirs = {os.path.dirname(row[3]) for row in songs}
+        for song_dir in song_dirs:
+            if self.cancelled:
+                return found
+            if any(os.path.join(path_key(song_dir), '').startswith(prefix) for prefix in folder_keys):
+                continue
+            try:
+                with os.scandir(song_dir) as entries:
+                    for entry in entries:
+                        if entry.name.lower().endswith('.lrc') and entry.is_file():
+                            found[path_key(entry.path)] = entry.path
+            except OSError:
+                pass
+        return found
+
+    def run(self):
+        db_manager = DatabaseManager(self.db_path)
+        updates = []
+        found = {}
+        try:
+            songs = db_manager.get_lyrics_candidates()
+            found = self.find_lyrics_files(songs)
+            if self.cancelled:
+                return
+            index = LyricsIndex(found.values())
+            for song_id, title, artist, file_path, lyrics_path in songs:
+                if self.cancelled:
+                    updates = []
+                    return
+                # Files picked by hand are kept as long as they exist
+                if lyrics_path and (path_key(lyrics_path) in found or os.path.exists(lyrics_path)):
+                    continue
+                match = index.match(artist, title, file_path)
+                if match != (lyrics_path or None):
+                    updates.append((match, song_id))
+            db_manager.update_lyrics_paths(updates)
+        except Exception as e:
+            print(f"Error indexing lyrics: {e}")
+        finally:
+            db_manager.conn.close()
+            assigned = sum(1 for lyrics_path, song_id in updates if lyrics_path)
+            print(f"Lyrics index: {len(found)} files, {assigned} songs assigned{' (cancelled)' if self.cancelled else ''}")
+            self.index_finished.emit(assigned, len(found))
@@ -1,11 +1,216 @@
+import os
 import re
+import html
+from bisect import bisect_right
+from collections import OrderedDict
+from operator import itemgetter
+import numpy as np
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel
 from PyQt5.QtCore import Qt
 
+# A timed line: its first [mm:ss], [mm:ss.x], [mm:ss.xx] or [mm:ss.xxx] tag and the
+# rest of the line. Some editors write ':' before the fraction.
+TIMED_LINE = re.compile(r'^[ \t\ufeff]*\[(\d+:\d{1,2}(?:[.:]\d{1,3})?)\](.*)', re.MULTILINE)
+TIME_TAG = re.compile(r'\[(\d+:\d{1,2}(?:[.:]\d{1,3})?)\]')
+# Enhanced LRC (A2) word timing inside the text: <mm:ss.xx>word
+WORD_TAG = re.compile(r'<(\d+:\d{1,2}(?:[.:]\d{1,3})?)>')
+STAMP = re.compile(r'(\d+):(\d{1,2})(?:[.:](\d{1,3}))?')
+OFFSET_TAG = re.compile(r'^[ \t\ufeff]*\[offset:[ \t]*([+-]?\d+)[ \t]*\]', re.MULTILINE | re.IGNORECASE)
+
+class StampValues(dict):
+    # 'mm:ss.xx' -> ms, or None for text that is not a time stamp. A song uses a
+    # few hundred distinct stamps, so each is converted once instead of per tag.
+    def __missing__(self, stamp):
+        match = STAMP.fullmatch(stamp)
+        # The fraction is decimal: .5 is 500 ms, .05 is 50 ms
+        value = None if match is None else (int(match[1]) * 60000 + int(match[2]) * 1000
+                                            + (int(match[3].ljust(3, '0')) if match[3] else 0))
+        if len(self) >= 100000:
+            self.clear()
+        self[stamp] = value
+        return value
+
+STAMP_MS = StampValues()
+
+def split_words(body, stamp, offset):
+    # Returns (words, text) for a line with word tags. Cutting at '<' is much
+    # cheaper than a regex per tag; a '<' that doesn't open a tag ("I <3 you")
+    # sends the line through WORD_TAG instead.
+    pieces = body.split('<')
+    words = []
+    text = [pieces[0]]
+    for piece in pieces[1:]:
+        tag, close, word = piece.partition('>')
+        ms = STAMP_MS[tag] if close else None
+        if ms is None:
+            break
+        # A trailing tag with no text only marks where the last word ends
+        if word:
+            words.append((ms - offset, word))
+        text.append(word)
+    else:
+        return finish_words(words, pieces[0], stamp, offset), ''.join(text)
+    
+    # split() gives [text, stamp, word, stamp, word, ...]
+    parts = WORD_TAG.split(body)
+    if len(parts) == 1:
+        return (), body
+    words = [(STAMP_MS[tag] - offset, word) for tag, word in zip(parts[1::2], parts[2::2]) if word]
+    return finish_words(words, parts[0], stamp, offset), ''.join(parts[0::2])
+
+def finish_words(words, prefix, stamp, offset):
+    if offset > 0 and words and min(words)[0] < 0:
+        words = [(max(0, ms), word) for ms, word in words]
+    # Text before the first tag is sung from the start of the line
+    if prefix.strip():
+        words.insert(0, (stamp, prefix))
+    return tuple(words)
+
+def parse_lrc(text):
+    # Returns (lines, words). lines is a sorted list of (ms, text); words[i] is a
+    # tuple of (ms, word) for line i when it has word timing, otherwise empty.
+    # A line with several time tags is repeated at each of them.
+    match = OFFSET_TAG.search(text)
+    # A positive offset shows the lyrics earlier
+    offset = int(match.group(1)) if match else 0
+    entries = []
+    for tag, body in TIMED_LINE.findall(text):
+        stamp = STAMP_MS[tag] - offset
+        if stamp < 0:
+            stamp = 0
+        if '[' not in body and '<' not in body:
+            # Most lines: one time tag and plain text
+            entries.append((stamp, ' '.join(body.split()), ()))
+            continue
+        
+        stamps = None
+        if body[:1] == '[':
+            stamps = [stamp]
+            tag = TIME_TAG.match(body)
+            while tag:
+                stamps.append(max(0, STAMP_MS[tag.group(1)] - offset))
+                body = body[tag.end():]
+                tag = TIME_TAG.match(body)
+        
+        words = ()
+        if '<' in body:
+            words, body = split_words(body, stamp, offset)
+        body = ' '.join(body.split())
+        
+        if stamps is None:
+            entries.append((stamp, body, words))
+            continue
+        for repeat in stamps:
+            # Word times are absolute, so a repeated line shifts them along with it
+            shift = repeat - stamp
+            entries.append((repeat, body, tuple((ms + shift, word) for ms, word in words) if shift else words))
+    
+    entries.sort(key=itemgetter(0))
+    return [entry[:2] for entry in entries], [entry[2] for entry in entries]
+
+def pack_lyrics(parsed):
+    # Binary form for the database: line count and word count, then line times,
+    # words per line and word times as int64, then every line text and word as
+    # one newline-joined utf-8 string (neither contains a newline). Decoding is
+    # a frombuffer and a single split, several times cheaper than parsing again.
+    lines, words = parsed
+    counts = [len(line_words) for line_words in words]
+    word_pairs = [pair for line_words in words for pair in line_words]
+    values = np.array([len(lines), len(word_pairs)] + [ms for ms, text in lines] + counts
+                      + [ms for ms, word in word_pairs], dtype=np.int64)
+    strings = '\n'.join([text for ms, text in lines] + [word for ms, word in word_pairs])
+    return values.tobytes() + strings.encode('utf-8')
+
+def unpack_lyrics(data):
+    line_count, word_count = np.frombuffer(data, dtype=np.int64, count=2).tolist()
+    value_count = 2 + 2 * line_count + word_count
+    values = np.frombuffer(data, dtype=np.int64, count=value_count).tolist()
+    strings = data[8 * value_count:].decode('utf-8').split('\n')
+    lines = list(zip(values[2:2 + line_count], strings[:line_count]))
+    word_pairs = list(zip(values[2 + 2 * line_count:], strings[line_count:]))
+    words = []
+    start = 0
+    for count in values[2 + line_count:2 + 2 * line_count]:
+        words.append(tuple(word_pairs[start:start + count]) if count else ())
+        start += count
+    return lines, words
+
+def read_lrc(file_path):
+    # utf-8-sig drops the byte order mark some editors put in front of the first tag
+    with open(file_path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        return parse_lrc(f.read())
+
+class LyricsCache:
+    # Parsed lyrics keyed by path and mtime: the last few files in memory, every
+    # file seen in the database, so playing a song again never re-parses its .lrc
+    def __init__(self, db_manager=None, max_entries=64):
+        self.db_manager = db_manager
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+    
+    def load(self, file_path):
+        mtime = os.stat(file_path).st_mtime_ns
+        key = (file_path, mtime)
+        parsed = self.entries.get(key)
+        if parsed is not None:
+            self.entries.move_to_end(key)
+            return parsed
+        
+        data = self.db_manager.get_parsed_lyrics(file_path, mtime) if self.db_manager else None
+        if data is not None:
+            parsed = unpack_lyrics(data)
+        else:
+            parsed = read_lrc(file_path)
+            if self.db_manager:
+                self.db_manager.store_parsed_lyrics(file_path, mtime, pack_lyrics(parsed))
+        self.entries[key] = parsed
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return parsed
+
+class LyricsCursor:
+    # Index of the line to show for a playback position. Between two position
+    # ticks playback only moves a little, so the cursor normally stays put or
+    # steps to the next line; anything else (a seek) is found with bisect.
+    def __init__(self, lyrics=()):
+        self.set_lyrics(lyrics)
+    
+    def set_lyrics(self, lyrics):
+        self.timestamps = [timestamp for timestamp, text in lyrics]
+        self.index = -1
+    
+    def update(self, position_ms):
+        # Returns True when the current line changed; -1 means before the first line
+        timestamps = self.timestamps
+        index = self.index
+        after = index + 1
+        if (index < 0 or timestamps[index] <= position_ms) and (
+                after >= len(timestamps) or position_ms < timestamps[after]):
+            return False
+        if (after < len(timestamps) and timestamps[after] <= position_ms
+                and (after + 1 >= len(timestamps) or position_ms < timestamps[after + 1])):
+            self.index = after
+        else:
+            self.index = bisect_right(timestamps, position_ms) - 1
+        return self.index != index
+
 class LyricsWidget(QWidget):
-    def __init__(self):
+    # Shows the previous, current and next line. The labels have a fixed size,
+    # and their text is only set when the cursor moves to another line, so
+    # position ticks don't cause any relayout.
+    context_lines = 1
+    line_height = 22
+    sung_color = '#6496ff'
+    
+    def __init__(self, cache=None):
         super().__init__()
+        self.cache = cache or LyricsCache()
         self.lyrics_data = []
+        self.word_timings = []
+        # Start times of the current line's words, empty when it has none
+        self.word_times = []
+        self.word_index = 0
+        self.cursor = LyricsCursor()
         self.current_position = 0
         self.init_ui()
     
@@ -13,65 +218,108 @@ class LyricsWidget(QWidget):
         layout = QVBoxLayout()
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(0)
+        self.setFixedWidth(400)
         
-        # Simple lyrics label
-        self.lyrics_label = QLabel("No lyrics loaded")
-        self.lyrics_label.setAlignment(Qt.AlignCenter)
-        self.lyrics_label.setStyleSheet("""
-            QLabel {
-                font-size: 12px;
-                padding: 5px;
-            }
-        """)
-        layout.addWidget(self.lyrics_label)
+        self.line_labels = []
+        for offset in range(-self.context_lines, self.context_lines + 1):
+            label = QLabel("")
+            label.setAlignment(Qt.AlignCenter)
+            label.setFixedHeight(self.line_height)
+            label.setTextFormat(Qt.PlainText)
+            if offset == 0:
+                label.setStyleSheet("""
+                    QLabel {
+                        font-size: 12px;
+                        font-weight: bold;
+                        padding: 0px 5px;
+                    }
+                """)
+            else:
+                label.setStyleSheet("""
+                    QLabel {
+                        font-size: 11px;
+                        color: gray;
+                        padding: 0px 5px;
+                    }
+                """)
+            layout.addWidget(label)
+            self.line_labels.append(label)
+        # The middle label is the current line
+        self.lyrics_label = self.line_labels[self.context_lines]
+        self.show_message("No lyrics loaded")
         
         self.setLayout(layout)
     
     def load_lyrics_file(self, file_path):
         try:
-            self.lyrics_data = self.parse_lrc_file(file_path)
-            self.update_lyrics_display(0)
+            self.set_lyrics(self.parse_lrc_file(file_path))
             print(f"Loaded lyrics from: {file_path}")
             return True
         except Exception as e:
             print(f"Error loading lyrics: {e}")
-            self.lyrics_label.setText("Error loading lyrics")
             self.lyrics_data = []
+            self.word_timings = []
+            self.word_times = []
+            self.cursor.set_lyrics(self.lyrics_data)
+            self.show_message("Error loading lyrics")
             return False
     
+    def set_lyrics(self, parsed):
+        # parsed is (lines, words) from parse_lrc, as LyricsCache returns it
+        self.lyrics_data, self.word_timings = parsed
+        self.cursor.set_lyrics(self.lyrics_data)
+        self.show_lines()
+        self.update_lyrics_display(self.current_position)
+    
     def parse_lrc_file(self, file_path):
-        lyrics = []
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    # Match timestamp format [mm:ss.xx]
-                    match = re.match(r'\[(\d{2}):(\d{2})\.(\d{2})\](.*)', line.strip())
-                    if match:
-                        minutes, seconds, hundredths, text = match.groups()
-                        # Convert to milliseconds
-                        timestamp = (int(minutes) * 60 + int(seconds)) * 1000 + int(hundredths) * 10
-                        lyrics.append((timestamp, text.strip()))
-            return sorted(lyrics, key=lambda x: x[0])
-        except Exception as e:
-            print(f"Error parsing .lrc file: {e}")
-            return []
+        # Errors reach load_lyrics_file, so a missing file isn't reported as loaded
+        return self.cache.load(file_path)
     
     def update_lyrics_display(self, position_ms):
+        self.current_position = position_ms
         if not self.lyrics_data:
-            self.lyrics_label.setText("No lyrics loaded")
             return
-        
-        current_lyric = " "
-        for i, (timestamp, text) in enumerate(self.lyrics_data):
-            if position_ms < timestamp:
-                if i > 0:
-                    current_lyric = self.lyrics_data[i-1][1]
-                break
-            current_lyric = text
-        
-        self.lyrics_label.setText(current_lyric)
-        self.current_position = position_ms
+        if self.cursor.update(position_ms):
+            self.show_lines()
+        if self.word_times:
+            word_index = bisect_right(self.word_times, position_ms)
+            if word_index != self.word_index:
+                self.word_index = word_index
+                self.show_words()
+    
+    def show_lines(self):
+        # Called on line changes only
+        self.word_times = []
+        self.word_index = 0
+        for offset, label in enumerate(self.line_labels, -self.context_lines):
+            index = self.cursor.index + offset
+            text = self.lyrics_data[index][1] if 0 <= index < len(self.lyrics_data) else ""
+            metrics = label.fontMetrics()
+            elided = metrics.elidedText(text, Qt.ElideRight, self.width() - 10)
+            label.setTextFormat(Qt.PlainText)
+            label.setText(elided)
+            # Karaoke only when the whole line fits, rich text can't be elided
+            if offset == 0 and index >= 0 and self.word_timings[index] and elided == text:
+                self.word_times = [ms for ms, word in self.word_timings[index]]
+    
+    def show_words(self):
+        # Colours the words of the current line that have already been sung
+        words = [word for ms, word in self.word_timings[self.cursor.index]]
+        sung = html.escape(''.join(words[:self.word_index]))
+        rest = html.escape(''.join(words[self.word_index:]))
+        self.lyrics_label.setTextFormat(Qt.RichText)
+        self.lyrics_label.setText(f'<span style="color: {self.sung_color}">{sung}</span>{rest}')
+    
+    def show_message(self, message):
+        for label in self.line_labels:
+            label.setTextFormat(Qt.PlainText)
+            label.setText("")
+        self.lyrics_label.setText(message)
     
     def clear_lyrics(self):
+        self.current_position = 0
         self.lyrics_data = []
-        self.lyrics_label.setText("No lyrics loaded")
\ No newline at end of file
+        self.word_timings = []
+        self.word_times = []
+        self.cursor.set_lyrics(self.lyrics_data)
+        self.show_message("No lyrics loaded")
\ No newline at end of file
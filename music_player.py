@@ -1,19 +1,23 @@
 import sys
 import os
+import time
 import random
 import json
 import csv
 from datetime import datetime
-from PyQt5.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSlider, QPushButton, QGroupBox, QFileDialog, QMessageBox, QAction, QMenu, QApplication
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QPixmap, QIcon
-from mutagen import File
+from PyQt5.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QSlider, QPushButton, QGroupBox, QFileDialog, QMessageBox, QAction, QActionGroup, QMenu, QApplication
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QIcon
 from database_manager import DatabaseManager
-from audio_processor import AudioProcessor
+from audio_processor import AudioProcessor, DEFAULT_RESAMPLE_QUALITY
 from visualizer import AudioVisualizer
 from equalizer import Equalizer
 from playlist import PlaylistWidget
-from lyrics import LyricsWidget
+from cover_cache import CoverCache
+from peak_cache import PeakCache, PeakGenerator
+from track_loader import TrackLoader
+from waveform_slider import WaveformSlider
+from lyrics import LyricsWidget, LyricsCache
 
 class MusicPlayer(QMainWindow):
     def __init__(self):
@@ -22,8 +26,26 @@ class MusicPlayer(QMainWindow):
         self.current_song_id = None
         self.current_song_index = -1
         self.current_theme = "dark"
-        self.shuffle_indices = []  # Daftar indeks untuk shuffle
+        self.cover_path = None
+        # Shuffle keeps song ids, not rows: a search or sort moves rows around
+        self.shuffle_order = []  # Daftar lagu yang belum diputar
         self.shuffle_played = []
+        # Caches live next to the library database, not in the working directory
+        self.data_dir = os.path.dirname(os.path.abspath(self.db_manager.db_path))
+        self.cover_cache = CoverCache(os.path.join(self.data_dir, 'covers'), parent=self)
+        self.cover_cache.cover_ready.connect(self.on_cover_ready)
+        self.peak_cache = PeakCache(os.path.join(self.data_dir, 'peaks'))
+        self.peak_generator = PeakGenerator(self.peak_cache, self)
+        self.peak_generator.peaks_ready.connect(self.on_peaks_ready)
+        self.waveform_path = None
+        self.generated_peaks_path = None
+        # Lyrics and peaks of the song being shown, read on the loader thread
+        self.track_loader = TrackLoader(self.peak_cache, self.db_manager.db_path)
+        self.track_loader.lyrics_loaded.connect(self.on_lyrics_loaded)
+        self.track_loader.peaks_loaded.connect(self.on_peaks_loaded)
+        self.track_token = 0
+        self.loading_file = None
+        self.play_requested_at = None
         self.init_ui()
         self.init_player()
     
@@ -42,9 +64,13 @@ class MusicPlayer(QMainWindow):
         left_panel.setFixedWidth(350)
         left_layout = QVBoxLayout(left_panel)
         
-        self.lyrics_widget = LyricsWidget()
-        self.playlist_widget = PlaylistWidget(self.db_manager, self.lyrics_widget)
+        self.lyrics_widget = LyricsWidget(LyricsCache(self.db_manager))
+        self.playlist_widget = PlaylistWidget(self.db_manager, self.lyrics_widget, self.cover_cache)
         self.playlist_widget.song_selected.connect(self.play_song)
+        self.playlist_widget.library_status.connect(self.statusBar().showMessage)
+        self.playlist_widget.songs_reordered.connect(self.on_songs_reordered)
+        self.playlist_widget.songs_filtered.connect(self.on_songs_filtered)
+        self.playlist_widget.songs_imported.connect(self.peak_generator.request)
         left_layout.addWidget(self.playlist_widget)
         
         main_layout.addWidget(left_panel)
@@ -83,7 +109,7 @@ class MusicPlayer(QMainWindow):
         self.time_label = QLabel("00:00")
         progress_layout.addWidget(self.time_label)
         
-        self.progress_slider = QSlider(Qt.Horizontal)
+        self.progress_slider = WaveformSlider(Qt.Horizontal)
         self.progress_slider.sliderMoved.connect(self.seek_position)
         progress_layout.addWidget(self.progress_slider)
         
@@ -212,15 +238,19 @@ class MusicPlayer(QMainWindow):
         self.apply_dark_theme()
     
     def init_player(self):
-        self.audio_processor = AudioProcessor()
+        self.audio_processor = AudioProcessor(os.path.join(self.data_dir, 'pcm_cache'))
         self.visualizer.set_audio_processor(self.audio_processor)
         self.equalizer.eq_changed.connect(self.audio_processor.set_eq_gain)
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_progress)
-        self.timer.start(100)
+        # The audio engine reports position and track changes itself, only while playing
+        self.audio_processor.position_changed.connect(self.update_progress)
+        self.audio_processor.track_changed.connect(self.on_gapless_transition)
+        self.audio_processor.track_finished.connect(self.on_track_finished)
+        self.audio_processor.track_loaded.connect(self.on_track_loaded)
+        self.audio_processor.audio_started.connect(self.on_audio_started)
         self.is_playing = False
         self.current_position = 0
         self.total_duration = 0
+        self.queued_song_index = None
 
     def apply_theme(self):
         if self.current_theme == "dark":
@@ -238,9 +268,9 @@ class MusicPlayer(QMainWindow):
         QSlider::groove:horizontal { height: 8px; background: #444444; border-radius: 4px; }
         QSlider::handle:horizontal { background: #0078d4; width: 16px; height: 16px; border-radius: 8px; margin: -4px 0; }
         QSlider::sub-page:horizontal { background: #0078d4; border-radius: 4px; }
-        QListWidget { background-color: #353535; border: 1px solid #555555; }
-        QListWidget::item { padding: 5px; border-bottom: 1px solid #444444; }
-        QListWidget::item:selected { background-color: #0078d4; }
+        QListView { background-color: #353535; border: 1px solid #555555; }
+        QListView::item { padding: 5px; border-bottom: 1px solid #444444; }
+        QListView::item:selected { background-color: #0078d4; }
         QGroupBox { font-weight: bold; border: 1px solid #555555; border-radius: 5px; margin-top: 10px; padding-top: 10px; }
         QGroupBox::title { subcontrol-origin: margin; padding: 0 3px; }
         QLabel#cover_label { border: 1px solid #555555; background-color: #353535; }
@@ -339,6 +369,7 @@ class MusicPlayer(QMainWindow):
         }
         """
         self.visualizer.set_theme(True)
+        self.progress_slider.set_theme(True)
         self.setStyleSheet(dark_style)
 
     def apply_light_theme(self):
@@ -351,9 +382,9 @@ class MusicPlayer(QMainWindow):
         QSlider::groove:horizontal { height: 8px; background: #cccccc; border-radius: 4px; }
         QSlider::handle:horizontal { background: #0078d4; width: 16px; height: 16px; border-radius: 8px; margin: -4px 0; }
         QSlider::sub-page:horizontal { background: #0078d4; border-radius: 4px; }
-        QListWidget { background-color: #ffffff; border: 1px solid #cccccc; }
-        QListWidget::item { padding: 5px; border-bottom: 1px solid #e0e0e0; }
-        QListWidget::item:selected { background-color: #0078d4; color: #ffffff; }
+        QListView { background-color: #ffffff; border: 1px solid #cccccc; }
+        QListView::item { padding: 5px; border-bottom: 1px solid #e0e0e0; }
+        QListView::item:selected { background-color: #0078d4; color: #ffffff; }
         QGroupBox { font-weight: bold; border: 1px solid #cccccc; border-radius: 5px; margin-top: 10px; padding-top: 10px; }
         QGroupBox::title { subcontrol-origin: margin; padding: 0 3px; }
         QLabel#cover_label { border: 1px solid #cccccc; background-color: #ffffff; }
@@ -452,6 +483,7 @@ class MusicPlayer(QMainWindow):
         }
         """
         self.visualizer.set_theme(False)
+        self.progress_slider.set_theme(False)
         self.setStyleSheet(light_style)
 
     def toggle_theme(self):
@@ -466,6 +498,8 @@ class MusicPlayer(QMainWindow):
     def update_repeat_state(self):
         state = self.repeat_btn.isChecked()
         print(f"Repeat {'enabled' if state else 'disabled'}")
+        if self.current_song_index >= 0:
+            self.queue_next_song()
     
     def toggle_playback(self):
         if self.is_playing:
@@ -494,118 +528,253 @@ class MusicPlayer(QMainWindow):
             print("Playback resumed")
     
     def play_song(self, file_path, index=-1):
-        if not os.path.exists(file_path):
-            print(f"File not found: {file_path}")
-            return
-        
+        # Returns right away: the library row fills in the song info, the audio is
+        # opened on a worker and started by on_track_loaded, and lyrics, waveform
+        # and cover arrive from their loaders
+        self.play_requested_at = time.perf_counter()
         print(f"Playing song: {file_path}, provided index: {index}")
         self.current_song_index = index if index >= 0 else 0
         print(f"Set current_song_index to: {self.current_song_index}")
         
         self.audio_processor.stop_playback()
         self.visualizer.reset_visualization()
-        self.lyrics_widget.clear_lyrics()
-        self.audio_processor.set_audio_file(file_path)
-        
-        try:
-            audio_file = File(file_path)
-            title = os.path.basename(file_path)
-            artist = "Unknown Artist"
-            
-            if audio_file:
-                title = str(audio_file.get('TIT2', [title])[0]) if audio_file.get('TIT2') else title
-                artist = str(audio_file.get('TPE1', [artist])[0]) if audio_file.get('TPE1') else artist
-                self.total_duration = int(audio_file.info.length * 1000) if audio_file.info else 0
-                self.progress_slider.setRange(0, self.total_duration)
-                self.duration_label.setText(self.format_time(self.total_duration))
-                
-                cover_data = None
-                for tag in audio_file.tags.values():
-                    if hasattr(tag, 'data') and tag.mime.startswith('image/'):
-                        cover_data = tag.data
-                        break
-                
-                if cover_data:
-                    pixmap = QPixmap()
-                    pixmap.loadFromData(cover_data)
-                    if not pixmap.isNull():
-                        scaled_pixmap = pixmap.scaled(
-                            self.cover_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                        self.cover_label.setPixmap(scaled_pixmap)
-                    else:
-                        self.load_default_cover()
-                else:
-                    self.load_default_cover()
-            
-            self.song_title.setText(title)
-            self.song_artist.setText(artist)
-            
-            item = self.playlist_widget.playlist_list.item(self.current_song_index)
-            if item:
-                song_id = item.data(Qt.UserRole + 1)
-                self.current_song_id = song_id
-                cursor = self.db_manager.conn.cursor()
-                cursor.execute('SELECT lyrics_path FROM songs WHERE id = ?', (song_id,))
-                result = cursor.fetchone()
-                if result and result[0] and os.path.exists(result[0]):
-                    self.lyrics_widget.load_lyrics_file(result[0])
-                    print(f"Loaded lyrics from database: {result[0]}")
-                else:
-                    lyrics_file = os.path.splitext(file_path)[0] + '.lrc'
-                    if os.path.exists(lyrics_file):
-                        self.lyrics_widget.load_lyrics_file(lyrics_file)
-                        self.db_manager.assign_lyrics(song_id, lyrics_file)
-                        print(f"Automatically loaded and assigned lyrics: {lyrics_file}")
-            
-        except Exception as e:
-            print(f"Error reading metadata: {e}")
-            self.song_title.setText(os.path.basename(file_path))
-            self.song_artist.setText("Unknown Artist")
-            self.load_default_cover()
-            self.total_duration = 0
-            self.lyrics_widget.clear_lyrics()
-        
-        self.audio_processor.start_playback()
+        self.loading_file = file_path
+        self.audio_processor.load_file(file_path)
+        self.show_song_info(file_path)
         self.is_playing = True
-        self.play_btn.setStyleSheet("""
-            QPushButton {
+        self.set_play_button(True)
+    
+    def on_track_loaded(self, file_path):
+        if file_path != self.loading_file:
+            return
+        self.loading_file = None
+        if not self.audio_processor.install_loaded_file(file_path):
+            print(f"Could not play: {file_path}")
+            self.statusBar().showMessage(f"Could not play: {os.path.basename(file_path)}")
+            self.is_playing = False
+            self.set_play_button(False)
+            return
+        self.visualizer.update_sample_rate()
+        # The decoder knows the exact length; the library only has whole seconds
+        self.set_duration(self.audio_processor.frames_to_ms(self.audio_processor.total_frames))
+        # Paused while loading: stay paused, resume starts the loaded track
+        if self.is_playing:
+            self.audio_processor.start_playback()
+        self.queue_next_song()
+    
+    def on_audio_started(self, started_at):
+        if self.play_requested_at is None:
+            return
+        latency = (started_at - self.play_requested_at) * 1000
+        self.play_requested_at = None
+        print(f"Click to first audio: {latency:.1f} ms")
+        self.statusBar().showMessage(
+            f"Playing: {os.path.basename(self.audio_processor.current_file or '')} ({latency:.0f} ms to first audio)")
+    
+    def set_play_button(self, playing):
+        # Restyling a widget costs a few ms, skip it when the icon is already right
+        if self.play_btn.property("state") == ("pause" if playing else "play"):
+            return
+        self.play_btn.setStyleSheet(f"""
+            QPushButton {{
                 border: none;
                 background: transparent;
-                image: url(asset/icons/pause.png);
-            }
+                image: url(asset/icons/{'pause' if playing else 'play'}.png);
+            }}
         """)
-        self.play_btn.setProperty("state", "pause")
+        self.play_btn.setProperty("state", "pause" if playing else "play")
+    
+    def set_duration(self, duration):
+        self.total_duration = duration
+        self.progress_slider.setRange(0, self.total_duration)
+        self.duration_label.setText(self.format_time(self.total_duration))
+    
+    def show_song_info(self, file_path):
+        # Title, artist and length come from the song's library row, nothing here
+        # reads the file itself
+        self.lyrics_widget.clear_lyrics()
+        row = self.current_song_index
+        title = os.path.basename(file_path)
+        artist = "Unknown Artist"
+        duration = 0
+        song_id = None
+        if self.playlist_widget.file_path_at(row) == file_path:
+            song_id = self.playlist_widget.song_id_at(row)
+            title = self.playlist_widget.song_value_at(row, 'title') or title
+            artist = self.playlist_widget.song_value_at(row, 'artist') or artist
+            duration = (self.playlist_widget.song_value_at(row, 'duration') or 0) * 1000
+        if self.audio_processor.current_file == file_path and self.audio_processor.total_frames:
+            duration = self.audio_processor.frames_to_ms(self.audio_processor.total_frames)
+        self.current_song_id = song_id
+        self.set_duration(duration)
+        self.song_title.setText(title)
+        self.song_artist.setText(artist)
+        self.show_cover(file_path)
+        self.show_waveform(file_path)
+        # lyrics_path is read by the loader: the indexer may have set it after the list loaded
+        self.track_loader.request(self.track_token, file_path, song_id)
+        
         self.statusBar().showMessage(f"Playing: {os.path.basename(file_path)}")
         self.current_song_info.setText(f"♪ {title} - {artist}")
     
-    def load_default_cover(self):
-        default_path = "asset/song_cover.png"
-        if os.path.exists(default_path):
-            default_pixmap = QPixmap(default_path)
-            scaled_pixmap = default_pixmap.scaled(
-                self.cover_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.cover_label.setPixmap(scaled_pixmap)
-        else:
-            print(f"Default cover not found: {default_path}")
-            self.cover_label.clear()
+    def queue_next_song(self):
+        # Let the audio processor pre-decode whatever next_song would pick
+        self.queued_song_index = self.peek_next_index()
+        file_path = None
+        if self.repeat_btn.isChecked() and self.current_song_index >= 0:
+            # By path: a search may hide the playing song, and its index is kept
+            file_path = self.audio_processor.current_file
+        elif self.queued_song_index is not None:
+            file_path = self.playlist_widget.file_path_at(self.queued_song_index)
+        self.audio_processor.queue_next(file_path)
+    
+    def on_songs_reordered(self):
+        # Rows moved (sort, reload): follow the playing song to its new row
+        if self.shuffle_btn.isChecked():
+            self.merge_shuffle_order()
+        if self.current_song_id is None:
+            return
+        self.follow_current_song()
+        self.queue_next_song()
+    
+    def on_songs_filtered(self):
+        # A search only hides songs; the shuffle order (song ids) stays as it is
+        if self.current_song_id is None:
+            return
+        self.follow_current_song()
+        self.queue_next_song()
+    
+    def follow_current_song(self):
+        # A playing song hidden by the search keeps its old index, so playback
+        # continues from about the same place instead of jumping to row 0
+        row = self.playlist_widget.row_of_song(self.current_song_id)
+        if row >= 0:
+            self.current_song_index = row
+    
+    def on_gapless_transition(self, file_path):
+        print(f"Gapless transition to index {self.queued_song_index}")
+        self.audio_processor.release_retired_decoders()
+        if not self.repeat_btn.isChecked():
+            self.advance_song_index()
+        self.show_song_info(self.audio_processor.current_file)
+        self.queue_next_song()
+    
+    def show_cover(self, file_path):
+        # Shared thumbnail cache; shows the placeholder until the worker pool has it
+        self.cover_path = file_path
+        size = self.cover_label.width()
+        pixmap = self.cover_cache.get(file_path, size)
+        # The placeholder is scaled once by the cache, not on every track change
+        self.cover_label.setPixmap(pixmap if pixmap is not None else self.cover_cache.placeholder(size))
+    
+    def show_waveform(self, file_path):
+        # Peak files are found by content hash, so they are opened on the loader;
+        # a new token makes results for the previous song stale
+        self.waveform_path = file_path
+        self.track_token += 1
+        self.progress_slider.set_peaks(None)
+    
+    def on_peaks_loaded(self, token, peaks):
+        if token != self.track_token:
+            return
+        self.progress_slider.set_peaks(peaks)
+        if peaks is None and self.waveform_path != self.generated_peaks_path:
+            # Songs imported before peak files existed get them the first time they play
+            self.peak_generator.request([self.waveform_path])
+    
+    def on_lyrics_loaded(self, token, lyrics):
+        if token == self.track_token and lyrics is not None:
+            self.lyrics_widget.set_lyrics(lyrics)
+    
+    def on_peaks_ready(self, file_path):
+        if file_path == self.waveform_path:
+            # Asked for once per song, even if the new file can't be opened either
+            self.generated_peaks_path = file_path
+            self.track_loader.request(self.track_token, file_path)
+    
+    def on_cover_ready(self, file_path, size):
+        if file_path == self.cover_path and size == self.cover_label.width():
+            self.show_cover(file_path)
     
     def update_shuffle_state(self):
         state = self.shuffle_btn.isChecked()
         if state:
-            # Inisialisasi daftar indeks untuk shuffle
-            total_songs = self.playlist_widget.playlist_list.count()
-            self.shuffle_indices = list(range(total_songs))
-            random.shuffle(self.shuffle_indices)
+            # Inisialisasi daftar lagu untuk shuffle
+            self.shuffle_order = self.new_shuffle_order()
             self.shuffle_played = []
-            print(f"Shuffle enabled, initialized {len(self.shuffle_indices)} indices")
+            print(f"Shuffle enabled, initialized {len(self.shuffle_order)} songs")
         else:
-            self.shuffle_indices = []
+            self.shuffle_order = []
             self.shuffle_played = []
             print("Shuffle disabled")
+        if self.current_song_index >= 0:
+            self.queue_next_song()
+    
+    def new_shuffle_order(self):
+        song_ids = self.playlist_widget.song_ids()
+        random.shuffle(song_ids)
+        return song_ids
+    
+    def merge_shuffle_order(self):
+        # The order and history are song ids, so a sort or reload keeps them: songs
+        # no longer in the list are dropped and new ones are shuffled in at the end
+        song_ids = self.playlist_widget.song_ids()
+        present = set(song_ids)
+        self.shuffle_order = [song_id for song_id in self.shuffle_order if song_id in present]
+        self.shuffle_played = [song_id for song_id in self.shuffle_played if song_id in present]
+        known = set(self.shuffle_order).union(self.shuffle_played)
+        added = [song_id for song_id in song_ids if song_id not in known]
+        random.shuffle(added)
+        self.shuffle_order.extend(added)
+    
+    def next_shuffle_row(self, take=False):
+        # Row of the first song in the shuffle order that the search shows; songs
+        # it hides stay in the order for when the search is cleared
+        for position, song_id in enumerate(self.shuffle_order):
+            row = self.playlist_widget.row_of_song(song_id)
+            if row >= 0:
+                if take:
+                    del self.shuffle_order[position]
+                return row
+        return None
+    
+    def peek_next_index(self):
+        total_songs = self.playlist_widget.song_count()
+        if total_songs == 0:
+            return None
+        if self.repeat_btn.isChecked() and self.current_song_index >= 0:
+            return self.current_song_index
+        if self.shuffle_btn.isChecked():
+            return self.next_shuffle_row()
+        if self.current_song_index < 0:
+            return 0
+        return (self.current_song_index + 1) % total_songs
+    
+    def advance_song_index(self):
+        total_songs = self.playlist_widget.song_count()
+        if self.shuffle_btn.isChecked():
+            # Ambil lagu berikutnya dari daftar shuffle
+            row = self.next_shuffle_row(take=True)
+            if row is None:
+                # Jika semua lagu sudah diputar, buat ulang daftar lagu
+                self.shuffle_order = self.new_shuffle_order()
+                self.shuffle_played = []
+                print("All songs played, reshuffling")
+                row = self.next_shuffle_row(take=True)
+            if row is None:
+                return
+            self.current_song_index = row
+            self.shuffle_played.append(self.playlist_widget.song_id_at(row))
+            print(f"Shuffle: Selected index {self.current_song_index}, remaining {len(self.shuffle_order)} songs")
+        else:
+            # Mode normal, pilih lagu berikutnya secara berurutan
+            if self.current_song_index < 0:
+                self.current_song_index = 0
+            else:
+                self.current_song_index = (self.current_song_index + 1) % total_songs
     
     def next_song(self, auto_next=False):
-        playlist_list = self.playlist_widget.playlist_list
-        total_songs = playlist_list.count()
+        total_songs = self.playlist_widget.song_count()
         if total_songs == 0:
             print("No songs in playlist")
             return
@@ -616,53 +785,35 @@ class MusicPlayer(QMainWindow):
             self.audio_processor.start_playback()
             return
         
-        if self.shuffle_btn.isChecked():
-            # Jika semua lagu sudah diputar, buat ulang daftar indeks
-            if not self.shuffle_indices:
-                self.shuffle_indices = list(range(total_songs))
-                random.shuffle(self.shuffle_indices)
-                self.shuffle_played = []
-                print("All songs played, reshuffling indices")
-            
-            # Ambil indeks berikutnya dari daftar shuffle
-            self.current_song_index = self.shuffle_indices.pop(0)
-            self.shuffle_played.append(self.current_song_index)
-            print(f"Shuffle: Selected index {self.current_song_index}, remaining {len(self.shuffle_indices)} songs")
-        else:
-            # Mode normal, pilih lagu berikutnya secara berurutan
-            if self.current_song_index < 0:
-                self.current_song_index = 0
-            else:
-                self.current_song_index = (self.current_song_index + 1) % total_songs
+        self.advance_song_index()
         
-        item = playlist_list.item(self.current_song_index)
-        if item:
-            file_path = item.data(Qt.UserRole)
+        file_path = self.playlist_widget.file_path_at(self.current_song_index)
+        if file_path:
             print(f"Next song: {file_path}, index: {self.current_song_index}")
             self.play_song(file_path, self.current_song_index)
         else:
             print(f"No item at index {self.current_song_index}")
 
     def previous_song(self):
-        playlist_list = self.playlist_widget.playlist_list
-        total_songs = playlist_list.count()
+        total_songs = self.playlist_widget.song_count()
         if total_songs == 0:
             print("No songs in playlist")
             return
         
         if self.shuffle_btn.isChecked():
             # Jika ada lagu yang sudah diputar, ambil lagu sebelumnya dari daftar yang sudah diputar
+            previous_row = -1
             if len(self.shuffle_played) > 1:
-                self.shuffle_indices.insert(0, self.current_song_index)
-                self.shuffle_played.pop()  # Hapus lagu saat ini
-                self.current_song_index = self.shuffle_played[-1]  # Ambil lagu sebelumnya
+                previous_row = self.playlist_widget.row_of_song(self.shuffle_played[-2])
+            if previous_row >= 0:
+                self.shuffle_order.insert(0, self.shuffle_played.pop())  # Hapus lagu saat ini
+                self.current_song_index = previous_row  # Ambil lagu sebelumnya
                 print(f"Shuffle: Reverting to previous index {self.current_song_index}")
             else:
-                # Jika tidak ada lagu sebelumnya, acak ulang
-                self.shuffle_indices = list(range(total_songs))
-                random.shuffle(self.shuffle_indices)
-                self.current_song_index = self.shuffle_indices.pop(0)
-                self.shuffle_played = [self.current_song_index]
+                # Jika tidak ada lagu sebelumnya (atau tersembunyi oleh pencarian), acak ulang
+                self.shuffle_order = self.new_shuffle_order()
+                self.current_song_index = self.next_shuffle_row(take=True)
+                self.shuffle_played = [self.playlist_widget.song_id_at(self.current_song_index)]
                 print(f"Shuffle: No previous song, selected new index {self.current_song_index}")
         else:
             # Mode normal, pilih lagu sebelumnya secara berurutan
@@ -671,9 +822,8 @@ class MusicPlayer(QMainWindow):
             else:
                 self.current_song_index = (self.current_song_index - 1) % total_songs
         
-        item = playlist_list.item(self.current_song_index)
-        if item:
-            file_path = item.data(Qt.UserRole)
+        file_path = self.playlist_widget.file_path_at(self.current_song_index)
+        if file_path:
             print(f"Previous song: {file_path}, index: {self.current_song_index}")
             self.play_song(file_path, self.current_song_index)
         else:
@@ -691,23 +841,27 @@ class MusicPlayer(QMainWindow):
         self.lyrics_widget.update_lyrics_display(position)
         print(f"Seeking to: {position}")
     
-    def update_progress(self):
-        if self.is_playing and self.audio_processor.audio_data_buffer is not None:
-            self.current_position = int((self.audio_processor.position / self.audio_processor.sample_rate) * 1000)
-            self.progress_slider.setValue(self.current_position)
-            self.time_label.setText(self.format_time(self.current_position))
-            self.lyrics_widget.update_lyrics_display(self.current_position)
-            
-            if self.current_position >= self.total_duration - 100 and self.total_duration > 0:
-                print(f"Song ended at position {self.current_position}, duration {self.total_duration}")
-                if self.repeat_btn.isChecked():
-                    print("Repeating current song")
-                    self.seek_position(0)
-                    self.audio_processor.start_playback()
-                else:
-                    print("Moving to next song")
-                    self.next_song(auto_next=True)
-            self.time_info.setText(f"{self.format_time(self.current_position)} / {self.format_time(self.total_duration)}")
+    def update_progress(self, position):
+        self.current_position = position
+        self.progress_slider.setValue(self.current_position)
+        self.time_label.setText(self.format_time(self.current_position))
+        self.lyrics_widget.update_lyrics_display(self.current_position)
+        self.time_info.setText(f"{self.format_time(self.current_position)} / {self.format_time(self.total_duration)}")
+        self.time_info.setToolTip(f"Audio xruns: {self.audio_processor.xrun_count}")
+    
+    def on_track_finished(self, file_path):
+        # Sent once by the audio callback when the last frame has played. A gapless
+        # splice never gets here; a stale event for a track already replaced is ignored.
+        if file_path != self.audio_processor.current_file or not self.is_playing:
+            return
+        print(f"Song ended: {file_path}")
+        if self.repeat_btn.isChecked():
+            print("Repeating current song")
+            self.seek_position(0)
+            self.audio_processor.start_playback()
+        else:
+            print("Moving to next song")
+            self.next_song(auto_next=True)
     
     def format_time(self, milliseconds):
         seconds = milliseconds // 1000
@@ -725,6 +879,19 @@ class MusicPlayer(QMainWindow):
         import_action.triggered.connect(self.playlist_widget.add_songs)
         file_menu.addAction(import_action)
         
+        add_folder_action = QAction('Add Music Folder', self)
+        add_folder_action.triggered.connect(self.playlist_widget.add_folder)
+        file_menu.addAction(add_folder_action)
+        
+        add_lyrics_folder_action = QAction('Add Lyrics Folder', self)
+        add_lyrics_folder_action.triggered.connect(self.playlist_widget.add_lyrics_folder)
+        file_menu.addAction(add_lyrics_folder_action)
+        
+        rescan_action = QAction('Rescan Library', self)
+        rescan_action.setShortcut('F5')
+        rescan_action.triggered.connect(self.playlist_widget.rescan_library)
+        file_menu.addAction(rescan_action)
+        
         file_menu.addSeparator()
         
         export_csv_action = QAction('Export Playlist to CSV', self)
@@ -773,6 +940,15 @@ class MusicPlayer(QMainWindow):
         repeat_action.triggered.connect(self.repeat_btn.click)
         playback_menu.addAction(repeat_action)
         
+        gapless_action = QAction('Gapless Playback', self)
+        gapless_action.setCheckable(True)
+        gapless_action.setChecked(True)
+        gapless_action.triggered.connect(self.toggle_gapless)
+        playback_menu.addAction(gapless_action)
+        self.add_option_menu(playback_menu, 'Resampling Quality',
+                             [('Quick', 'QQ'), ('Low', 'LQ'), ('Medium', 'MQ'), ('High', 'HQ'), ('Very High', 'VHQ')],
+                             DEFAULT_RESAMPLE_QUALITY, lambda quality: self.audio_processor.set_resample_quality(quality))
+
         view_menu = menubar.addMenu('View')
         
         show_eq_action = QAction('Show/Hide Equalizer', self)
@@ -780,6 +956,8 @@ class MusicPlayer(QMainWindow):
         show_eq_action.setChecked(True)
         show_eq_action.triggered.connect(self.toggle_equalizer)
         view_menu.addAction(show_eq_action)
+        self.add_option_menu(view_menu, 'Equalizer Bands', [(f"{n} Bands", n) for n in (8, 10, 15, 31)],
+                             len(self.equalizer.frequencies), self.set_eq_band_count)
         
         show_lyrics_action = QAction('Show/Hide Lyrics', self)
         show_lyrics_action.setCheckable(True)
@@ -787,6 +965,37 @@ class MusicPlayer(QMainWindow):
         show_lyrics_action.triggered.connect(self.toggle_lyrics)
         view_menu.addAction(show_lyrics_action)
 
+        sort_menu = view_menu.addMenu('Sort By')
+        self.sort_descending_action = QAction('Descending', self)
+        self.sort_descending_action.setCheckable(True)
+        for label, column in (('Title', 'title'), ('Artist', 'artist'), ('Album', 'album'), ('Year', 'year'),
+                              ('Play Count', 'play_count'), ('Rating', 'rating'), ('Duration', 'duration')):
+            sort_action = QAction(label, self)
+            sort_action.triggered.connect(
+                lambda checked, column=column: self.playlist_widget.sort_songs(
+                    column, self.sort_descending_action.isChecked()))
+            sort_menu.addAction(sort_action)
+        sort_menu.addSeparator()
+        sort_menu.addAction(self.sort_descending_action)
+        reset_sort_action = QAction('Library Order', self)
+        reset_sort_action.triggered.connect(self.playlist_widget.reset_sort)
+        sort_menu.addAction(reset_sort_action)
+
+        visualizer_menu = view_menu.addMenu('Visualizer')
+        self.add_option_menu(visualizer_menu, 'Bars', [(str(n), n) for n in (32, 64, 128, 256)],
+                             self.visualizer.analyzer.bar_count, self.visualizer.set_bar_count)
+        self.add_option_menu(visualizer_menu, 'FFT Size', [(str(n), n) for n in (512, 1024, 2048, 4096)],
+                             self.visualizer.analyzer.fft_size, self.visualizer.set_fft_size)
+        self.add_option_menu(visualizer_menu, 'Overlap', [('0%', 0.0), ('50%', 0.5), ('75%', 0.75)],
+                             self.visualizer.overlap, self.visualizer.set_overlap)
+        self.add_option_menu(visualizer_menu, 'Frame Rate', [(f"{n} FPS", n) for n in (15, 20, 30, 60)],
+                             self.visualizer.fps, self.visualizer.set_fps)
+        opengl_action = QAction('OpenGL Rendering', self)
+        opengl_action.setCheckable(True)
+        opengl_action.setChecked(self.visualizer.use_opengl)
+        opengl_action.triggered.connect(self.visualizer.set_opengl)
+        visualizer_menu.addAction(opengl_action)
+
         toggle_theme_action = QAction('Toggle Theme', self)
         toggle_theme_action.triggered.connect(self.toggle_theme)
         view_menu.addAction(toggle_theme_action)
@@ -797,6 +1006,19 @@ class MusicPlayer(QMainWindow):
         about_action.triggered.connect(self.show_about)
         help_menu.addAction(about_action)
 
+    def add_option_menu(self, parent_menu, title, options, current, handler):
+        # Submenu of mutually exclusive choices, each calling handler(value)
+        menu = parent_menu.addMenu(title)
+        group = QActionGroup(self)
+        for label, value in options:
+            action = QAction(label, self)
+            action.setCheckable(True)
+            action.setChecked(value == current)
+            action.triggered.connect(lambda checked, value=value: handler(value))
+            group.addAction(action)
+            menu.addAction(action)
+        return menu
+
     def create_status_bar(self):
         status_bar = self.statusBar()
         
@@ -814,6 +1036,17 @@ class MusicPlayer(QMainWindow):
         self.time_info.setStyleSheet("font-size: 11px;")
         status_bar.addPermanentWidget(self.time_info)
 
+    def toggle_gapless(self, checked):
+        self.audio_processor.gapless = checked
+        if self.current_song_index >= 0:
+            self.queue_next_song()
+        print(f"Gapless playback {'enabled' if checked else 'disabled'}")
+
+    def set_eq_band_count(self, band_count):
+        # Processor first, so the gains the widget re-emits land on the new bands
+        self.audio_processor.set_eq_band_count(band_count)
+        self.equalizer.set_band_count(band_count)
+
     def toggle_equalizer(self):
         for child in self.findChildren(QGroupBox):
             if child.title() == "Equalizer":
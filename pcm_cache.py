@@ -0,0 +1,103 @@
+import os
+import hashlib
+import itertools
+import numpy as np
+
+
+class PCMCacheWriter:
+    # Collects decoded blocks while a track plays for the first time
+    def __init__(self, cache, key, part_path):
+        self.cache = cache
+        self.key = key
+        self.part_path = part_path
+        self.file = open(part_path, 'wb')
+
+    def write(self, block):
+        self.file.write(np.ascontiguousarray(block, dtype=np.float32).tobytes())
+
+    def finish(self):
+        self.file.close()
+        os.replace(self.part_path, self.cache.path_for(self.key))
+        self.cache.evict()
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.part_path)
+        except OSError:
+            pass
+
+
+class PCMCache:
+    # Decoded interleaved float32 PCM on disk, keyed by path + mtime + size of
+    # the source plus the rate, channel count and soxr quality it was decoded with.
+    # Hits are memory-mapped; file mtimes double as the LRU order.
+    def __init__(self, cache_dir='pcm_cache', max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.part_counter = itertools.count()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, file_path, sample_rate, channels, quality):
+        stat = os.stat(file_path)
+        ident = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}|{sample_rate}|{channels}|{quality}"
+        return hashlib.sha1(ident.encode('utf-8')).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key + '.f32')
+
+    def open(self, file_path, sample_rate, channels=1, quality='HQ'):
+        # Returns the decoded track as a (frames, channels) memmap, or None
+        try:
+            path = self.path_for(self.key(file_path, sample_rate, channels, quality))
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                return None
+            os.utime(path)
+            return np.memmap(path, dtype=np.float32, mode='r').reshape(-1, channels)
+        except OSError as e:
+            print(f"Error opening PCM cache: {e}")
+            return None
+
+    def writer(self, file_path, sample_rate, channels=1, quality='HQ'):
+        try:
+            key = self.key(file_path, sample_rate, channels, quality)
+            part_path = os.path.join(self.cache_dir, f"{key}.{os.getpid()}-{next(self.part_counter)}.part")
+            return PCMCacheWriter(self, key, part_path)
+        except OSError as e:
+            print(f"Error creating PCM cache entry: {e}")
+            return None
+
+    def store(self, file_path, sample_rate, channels, data, quality='HQ'):
+        writer = self.writer(file_path, sample_rate, channels, quality)
+        if writer is not None:
+            writer.write(data)
+            writer.finish()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.f32'):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                # Still mapped by a playing track on some platforms
+                pass
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
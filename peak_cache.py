@@ -0,0 +1,215 @@
+import os
+import multiprocessing
+import numpy as np
+import soundfile as sf
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from PyQt5.QtCore import QObject, QCoreApplication, pyqtSignal
+from database_manager import quick_hash
+
+PEAK_MAGIC = b'SYMPEAK1'
+# Samples per min/max pair, finest first; each level is 4x coarser than the one before
+PEAK_LEVELS = (256, 1024, 4096, 16384, 65536)
+HEADER_VALUES = 3 + 2 * len(PEAK_LEVELS)
+
+
+def block_peaks(block, samples_per_peak):
+    # (frames, channels) -> min and max of every samples_per_peak frames; a short
+    # last block is padded with its edge value
+    low = block.min(axis=1)
+    high = block.max(axis=1)
+    count = -(-len(low) // samples_per_peak)
+    pad = count * samples_per_peak - len(low)
+    if pad:
+        low = np.pad(low, (0, pad), mode='edge')
+        high = np.pad(high, (0, pad), mode='edge')
+    return low.reshape(count, samples_per_peak).min(axis=1), high.reshape(count, samples_per_peak).max(axis=1)
+
+
+def read_peaks(file_path, samples_per_peak):
+    # Finest level straight from the decoder; each block is reduced to its
+    # min/max pairs before the next is read, so memory doesn't grow with the track
+    mins = []
+    maxs = []
+    try:
+        with sf.SoundFile(file_path) as f:
+            sample_rate = f.samplerate
+            total_frames = f.frames
+            for block in f.blocks(blocksize=samples_per_peak * 256, dtype='float32', always_2d=True):
+                low, high = block_peaks(block, samples_per_peak)
+                mins.append(low)
+                maxs.append(high)
+    except Exception:
+        # Formats libsndfile can't open go through audioread (what librosa.load
+        # falls back to), streamed buffer by buffer instead of loaded whole
+        import audioread
+        mins = []
+        maxs = []
+        with audioread.audio_open(file_path) as f:
+            sample_rate = f.samplerate
+            channels = f.channels
+            total_frames = 0
+            pending = np.zeros((0, channels), dtype=np.float32)
+            for buf in f:
+                samples = np.frombuffer(buf, dtype='<i2').astype(np.float32) / 32768.0
+                samples = samples.reshape(-1, channels)
+                total_frames += len(samples)
+                pending = np.concatenate([pending, samples]) if len(pending) else samples
+                whole = len(pending) // samples_per_peak * samples_per_peak
+                if whole >= samples_per_peak * 256:
+                    low, high = block_peaks(pending[:whole], samples_per_peak)
+                    mins.append(low)
+                    maxs.append(high)
+                    pending = pending[whole:]
+            if len(pending):
+                low, high = block_peaks(pending, samples_per_peak)
+                mins.append(low)
+                maxs.append(high)
+
+    mins = np.concatenate(mins) if mins else np.zeros(0, dtype=np.float32)
+    maxs = np.concatenate(maxs) if maxs else np.zeros(0, dtype=np.float32)
+    return sample_rate, total_frames, mins, maxs
+
+
+def quantize(values, rounding):
+    return np.clip(rounding(values * 127.0), -127, 127).astype(np.int8)
+
+
+def generate_peaks(file_path, cache_dir):
+    # Module level so it can run in a process pool
+    key = quick_hash(file_path)
+    path = os.path.join(cache_dir, key + '.peaks')
+    if os.path.exists(path):
+        return path
+    sample_rate, total_frames, mins, maxs = read_peaks(file_path, PEAK_LEVELS[0])
+
+    levels = []
+    for i, samples_per_peak in enumerate(PEAK_LEVELS):
+        if i > 0:
+            factor = samples_per_peak // PEAK_LEVELS[i - 1]
+            count = -(-len(mins) // factor)
+            pad = count * factor - len(mins)
+            if pad:
+                mins = np.concatenate([mins, np.repeat(mins[-1:], pad)])
+                maxs = np.concatenate([maxs, np.repeat(maxs[-1:], pad)])
+            mins = mins.reshape(count, factor).min(axis=1)
+            maxs = maxs.reshape(count, factor).max(axis=1)
+        levels.append(np.stack([quantize(mins, np.floor), quantize(maxs, np.ceil)], axis=1))
+
+    header = np.array([sample_rate, total_frames, len(levels)]
+                      + list(PEAK_LEVELS) + [len(level) for level in levels], dtype=np.int64)
+    part_path = f"{path}.{os.getpid()}.part"
+    with open(part_path, 'wb') as f:
+        f.write(PEAK_MAGIC)
+        f.write(header.tobytes())
+        for level in levels:
+            f.write(np.ascontiguousarray(level).tobytes())
+    os.replace(part_path, path)
+    return path
+
+
+class PeakFile:
+    # Memory-mapped view of a .peaks file: one (count, 2) int8 min/max array per level
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            if f.read(len(PEAK_MAGIC)) != PEAK_MAGIC:
+                raise ValueError(f"Not a peak file: {path}")
+            header = np.frombuffer(f.read(HEADER_VALUES * 8), dtype=np.int64)
+        self.sample_rate = int(header[0])
+        self.total_frames = int(header[1])
+        level_count = int(header[2])
+        self.samples_per_peak = [int(value) for value in header[3:3 + level_count]]
+        counts = [int(value) for value in header[3 + level_count:3 + 2 * level_count]]
+
+        data = np.memmap(path, dtype=np.int8, mode='r', offset=len(PEAK_MAGIC) + HEADER_VALUES * 8)
+        self.levels = []
+        offset = 0
+        for count in counts:
+            self.levels.append(data[offset:offset + count * 2].reshape(count, 2))
+            offset += count * 2
+
+    def overview(self, width):
+        # (mins, maxs) in -1..1 for `width` columns, from the coarsest level that still
+        # has at least one peak per column
+        level = self.levels[0]
+        for candidate in self.levels:
+            if len(candidate) >= width:
+                level = candidate
+        if width <= 0 or len(level) == 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+        edges = np.linspace(0, len(level), width + 1).astype(np.int64)[:-1]
+        edges = np.minimum(edges, len(level) - 1)
+        mins = np.minimum.reduceat(level[:, 0], edges).astype(np.float32) / 127.0
+        maxs = np.maximum.reduceat(level[:, 1], edges).astype(np.float32) / 127.0
+        return mins, maxs
+
+
+class PeakCache:
+    # Waveform overviews on disk, named by the quick content hash of the song,
+    # so renamed or touched files keep their peaks
+    def __init__(self, cache_dir='peaks'):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, file_path):
+        return os.path.join(self.cache_dir, quick_hash(file_path) + '.peaks')
+
+    def open(self, file_path):
+        try:
+            path = self.path_for(file_path)
+            if not os.path.exists(path):
+                return None
+            return PeakFile(path)
+        except (OSError, ValueError) as e:
+            print(f"Error opening peak file: {e}")
+            return None
+
+
+class PeakGenerator(QObject):
+    # Builds missing peak files in a background process pool
+    peaks_ready = pyqtSignal(str)
+    job_finished = pyqtSignal(str, bool)
+
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.pool = None
+        self.pending = set()
+        self.job_finished.connect(self.on_job_finished)
+        if QCoreApplication.instance() is not None:
+            QCoreApplication.instance().aboutToQuit.connect(self.shutdown)
+
+    def create_pool(self):
+        workers = max(1, (os.cpu_count() or 2) - 1)
+        try:
+            # spawn, not fork: the GUI process has Qt and audio threads running
+            return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        except (OSError, NotImplementedError) as e:
+            print(f"Process pool unavailable, using threads: {e}")
+            return ThreadPoolExecutor(max_workers=workers)
+
+    def request(self, file_paths):
+        for file_path in file_paths:
+            # generate_peaks skips files that already have peaks, so the hashing
+            # for that check also happens off the GUI thread
+            if file_path in self.pending:
+                continue
+            if self.pool is None:
+                self.pool = self.create_pool()
+            self.pending.add(file_path)
+            future = self.pool.submit(generate_peaks, file_path, self.cache.cache_dir)
+            # Done callbacks run on a pool thread; the signal hops back to the GUI thread
+            future.add_done_callback(
+                lambda future, file_path=file_path: self.job_finished.emit(
+                    file_path, not future.cancelled() and future.exception() is None))
+
+    def on_job_finished(self, file_path, ok):
+        self.pending.discard(file_path)
+        if ok:
+            self.peaks_ready.emit(file_path)
+        else:
+            print(f"Error generating peaks for {file_path}")
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
@@ -1,98 +1,49 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QComboBox, QListWidget, QPushButton, QFileDialog, QInputDialog, QMenu, QMessageBox, QLabel, QListWidgetItem, QAction, QAbstractItemView
-from PyQt5.QtCore import Qt, pyqtSignal
-from mutagen import File
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QComboBox, QLineEdit, QListView, QPushButton, QFileDialog, QInputDialog, QMenu, QMessageBox, QAction, QAbstractItemView, QProgressDialog
+from PyQt5.QtCore import Qt, pyqtSignal, QFileSystemWatcher, QTimer
 import os
-from PyQt5.QtGui import QPixmap
-
-class SongItemWidget(QWidget):
-    def __init__(self, file_path, parent=None):
-        super().__init__(parent)
-        self.file_path = file_path
-        self.init_ui()
-    
-    def init_ui(self):
-        layout = QHBoxLayout(self)
-        layout.setContentsMargins(5, 5, 5, 5)
-        layout.setSpacing(10)
-        
-        self.cover_label = QLabel()
-        self.cover_label.setFixedSize(50, 50)
-        self.cover_label.setStyleSheet("border: 1px solid #555555;")
-        self.load_cover()
-        layout.addWidget(self.cover_label)
-        
-        info_layout = QVBoxLayout()
-        self.title_label = QLabel("Unknown Title")
-        self.title_label.setStyleSheet("font-size: 14px; font-weight: bold;background: transparent;")
-        info_layout.addWidget(self.title_label)
-        
-        self.artist_label = QLabel("Unknown Artist")
-        self.artist_label.setStyleSheet("font-size: 12px; background: transparent;")
-        info_layout.addWidget(self.artist_label)
-        
-        layout.addLayout(info_layout)
-        layout.addStretch()
-        
-        self.load_metadata()
-    
-    def load_cover(self):
-        try:
-            audio_file = File(self.file_path)
-            cover_data = None
-            if audio_file:
-                for tag in audio_file.tags.values():
-                    if hasattr(tag, 'data') and tag.mime.startswith('image/'):
-                        cover_data = tag.data
-                        break
-            
-            if cover_data:
-                pixmap = QPixmap()
-                pixmap.loadFromData(cover_data)
-                if not pixmap.isNull():
-                    scaled_pixmap = pixmap.scaled(
-                        self.cover_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    self.cover_label.setPixmap(scaled_pixmap)
-                    return
-            self.load_default_cover()
-        except Exception as e:
-            print(f"Error loading cover: {e}")
-            self.load_default_cover()
-    
-    def load_default_cover(self):
-        default_path = "asset/song_cover.png"
-        if os.path.exists(default_path):
-            default_pixmap = QPixmap(default_path)
-            scaled_pixmap = default_pixmap.scaled(
-                self.cover_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.cover_label.setPixmap(scaled_pixmap)
-        else:
-            self.cover_label.clear()
-    
-    def load_metadata(self):
-        try:
-            audio_file = File(self.file_path)
-            if audio_file:
-                title = str(audio_file.get('TIT2', [os.path.basename(self.file_path)])[0])
-                artist = str(audio_file.get('TPE1', ['Unknown Artist'])[0])
-                self.title_label.setText(title)
-                self.artist_label.setText(artist)
-        except Exception as e:
-            print(f"Error loading metadata: {e}")
-            self.title_label.setText(os.path.basename(self.file_path))
-            self.artist_label.setText("Unknown Artist")
-    
-    def get_title(self):
-        return self.title_label.text()
+from library_importer import LibraryImporter, LibraryScanner, LyricsIndexer
+from cover_cache import CoverCache
+from song_model import SongListModel, SongItemDelegate, FilePathRole, SongIdRole
 
 class PlaylistWidget(QWidget):
     song_selected = pyqtSignal(str, int)
+    library_status = pyqtSignal(str)
+    songs_reordered = pyqtSignal()
+    # Search changed which songs are visible, their order stayed the same
+    songs_filtered = pyqtSignal()
+    songs_imported = pyqtSignal(list)
     
-    def __init__(self, db_manager, lyrics_widget=None):
+    def __init__(self, db_manager, lyrics_widget=None, cover_cache=None):
         super().__init__()
         self.db_manager = db_manager
         self.lyrics_widget = lyrics_widget
+        self.cover_cache = cover_cache or CoverCache(
+            os.path.join(os.path.dirname(os.path.abspath(db_manager.db_path)), 'covers'), parent=self)
         self.current_playlist_id = None
-        self.songs_data = []
+        self.sort_keys = []
+        self.song_model = SongListModel(self, cover_cache=self.cover_cache)
+        self.importer = None
+        self.scanner = None
+        self.rescan_pending = False
+        self.lyrics_indexer = None
+        self.lyrics_index_pending = False
+        self.folder_watcher = QFileSystemWatcher(self)
+        self.folder_watcher.directoryChanged.connect(self.schedule_rescan)
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.setSingleShot(True)
+        self.rescan_timer.setInterval(2000)
+        self.rescan_timer.timeout.connect(self.rescan_library)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(80)
+        self.search_timer.timeout.connect(self.apply_search)
+        # While typing only the first search_limit matches are shown; the rest
+        # are filled in once the text has stopped changing for a moment
+        self.search_limit = 2000
+        self.full_search_timer = QTimer(self)
+        self.full_search_timer.setSingleShot(True)
+        self.full_search_timer.setInterval(300)
+        self.full_search_timer.timeout.connect(self.apply_full_search)
         self.init_ui()
     
     def init_ui(self):
@@ -118,16 +69,32 @@ class PlaylistWidget(QWidget):
         self.playlist_combo.currentIndexChanged.connect(self.load_songs)
         layout.addWidget(self.playlist_combo)
 
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search title, artist, album, lyrics...")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.setStyleSheet("""
+            QLineEdit {
+                border: 1px solid #555555;
+                padding: 5px;
+            }
+        """)
+        # Tunggu sebentar setelah ketikan terakhir supaya list tidak di-reset tiap huruf
+        self.search_box.textChanged.connect(self.on_search_edited)
+        layout.addWidget(self.search_box)
+
         # Modifikasi untuk scrolling yang lebih halus
-        self.playlist_list = QListWidget()
+        self.playlist_list = QListView()
+        self.playlist_list.setModel(self.song_model)
+        self.playlist_list.setItemDelegate(SongItemDelegate(self.playlist_list, self.cover_cache))
+        self.playlist_list.setUniformItemSizes(True)  # Semua baris sama tinggi, tidak perlu mengukur tiap lagu
         self.playlist_list.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)  # Aktifkan scrolling per piksel
         self.playlist_list.verticalScrollBar().setSingleStep(10)  # Kecepatan scroll per langkah
         self.playlist_list.setFocusPolicy(Qt.StrongFocus)  # Pastikan menerima fokus untuk mouse wheel
-        self.playlist_list.setStyleSheet("QListWidget::item { padding: 5px; }")
-        self.playlist_list.setSelectionMode(QListWidget.SingleSelection)
-        self.playlist_list.itemDoubleClicked.connect(self.play_selected)
+        self.playlist_list.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.playlist_list.doubleClicked.connect(self.play_selected)
         self.playlist_list.setContextMenuPolicy(Qt.CustomContextMenu)
         self.playlist_list.customContextMenuRequested.connect(self.show_context_menu)
+        self.cover_cache.cover_ready.connect(self.on_cover_ready)
         layout.addWidget(self.playlist_list)
 
         button_layout = QVBoxLayout()
@@ -233,103 +200,200 @@ class PlaylistWidget(QWidget):
         layout.addLayout(button_layout)
         
         self.load_songs()
+        if self.db_manager.get_library_folders():
+            # The rescan indexes lyrics when it is done
+            self.schedule_rescan()
+        else:
+            self.index_lyrics()
     
     def load_songs(self):
-        self.playlist_list.clear()
-        self.songs_data.clear()
         current_index = self.playlist_combo.currentIndex()
         
-        if current_index == 0:
+        if current_index <= 0:
             self.current_playlist_id = None
-            songs = self.db_manager.get_all_songs()
+            songs = self.db_manager.get_all_songs(self.sort_keys)
         else:
             self.current_playlist_id = self.playlist_combo.itemData(current_index)
-            songs = self.db_manager.get_songs_in_playlist(self.current_playlist_id)
+            songs = self.db_manager.get_songs_in_playlist(self.current_playlist_id, self.sort_keys)
         
         print(f"Loading songs: {len(songs)} items found")
-        for song in songs:
-            print(f"Song data: {song}")
-            song_id, title, artist, album, duration, file_path, genre, year, play_count, rating, lyrics_path = song
-            
-            item_widget = SongItemWidget(file_path)
-            
-            item = QListWidgetItem(self.playlist_list)
-            item.setData(Qt.UserRole, file_path)
-            item.setData(Qt.UserRole + 1, song_id)
-            item.setSizeHint(item_widget.sizeHint())
-            
-            self.playlist_list.setItemWidget(item, item_widget)
-            
-            self.songs_data.append({
-                'item': item,
-                'widget': item_widget,
-                'file_path': file_path,
-                'song_id': song_id,
-                'title': title
-            })
-
-        current_index = self.playlist_combo.currentIndex()
+        self.song_model.filter_ids = self.db_manager.search_song_ids(self.search_box.text())
+        self.song_model.set_songs(songs)
         self.delete_playlist_btn.setEnabled(current_index > 0)
+        self.songs_reordered.emit()
+    
+    def on_search_edited(self, text):
+        self.full_search_timer.stop()
+        self.search_timer.start()
+    
+    def apply_search(self):
+        song_ids = self.db_manager.search_song_ids(self.search_box.text(), self.search_limit)
+        self.song_model.set_filter(song_ids)
+        self.songs_filtered.emit()
+        if song_ids is not None and len(song_ids) >= self.search_limit:
+            self.full_search_timer.start()
+    
+    def apply_full_search(self):
+        self.song_model.set_filter(self.db_manager.search_song_ids(self.search_box.text()))
+        self.songs_filtered.emit()
+    
+    def on_cover_ready(self, file_path, size):
+        if size == self.song_model.cover_size:
+            self.playlist_list.viewport().update()
+    
+    def song_count(self):
+        return self.song_model.song_count()
+    
+    def file_path_at(self, row):
+        return self.song_model.song_value(row, 'file_path')
+    
+    def song_id_at(self, row):
+        return self.song_model.song_value(row, 'id')
+    
+    def song_value_at(self, row, column):
+        return self.song_model.song_value(row, column)
+    
+    def row_of_song(self, song_id):
+        return self.song_model.row_of(song_id)
+    
+    def song_ids(self):
+        return self.song_model.song_ids()
+    
+    def sort_songs(self, column, descending=False):
+        # The chosen column becomes the primary key; earlier choices stay as tie-breakers
+        self.sort_keys = [(column, descending)] + [key for key in self.sort_keys if key[0] != column]
+        self.sort_keys = self.sort_keys[:3]
+        if not self.song_model.song_count():
+            print("No songs to sort")
+            return
+        self.song_model.sort_songs(self.sort_keys)
+        self.songs_reordered.emit()
+        print(f"Sorted {self.song_model.song_count()} songs by {self.sort_keys}")
+    
+    def reset_sort(self):
+        self.sort_keys = []
+        self.load_songs()
     
     def sort_by_title(self):
-        try:
-            print("Starting sort by title...")
-            if not self.songs_data:
-                print("No songs to sort")
-                return
-            
-            self.songs_data.sort(key=lambda x: x['title'].lower() if x['title'] else "")
-            print(f"Sorted {len(self.songs_data)} songs")
-
-            temp_songs_data = self.songs_data.copy()
-            self.playlist_list.clear()
-            self.songs_data.clear()
-            print("Playlist cleared")
-
-            for i, song_data in enumerate(temp_songs_data):
-                file_path = song_data['file_path']
-                song_id = song_data['song_id']
-                title = song_data['title']
-                
-                new_item_widget = SongItemWidget(file_path)
-                
-                new_item = QListWidgetItem(self.playlist_list)
-                new_item.setData(Qt.UserRole, file_path)
-                new_item.setData(Qt.UserRole + 1, song_id)
-                new_item.setSizeHint(new_item_widget.sizeHint())
-                
-                self.playlist_list.setItemWidget(new_item, new_item_widget)
-                
-                self.songs_data.append({
-                    'item': new_item,
-                    'widget': new_item_widget,
-                    'file_path': file_path,
-                    'song_id': song_id,
-                    'title': title
-                })
-                print(f"Added item at index {i}: {file_path}, title: {title}")
-            
-            print("Sorting completed successfully")
-        except Exception as e:
-            print(f"Error during sorting: {e}")
-            raise
+        self.sort_songs('title')
     
     def add_songs(self):
-        files, _ = QFileDialog.getOpenFileNames(self, "Select Songs", "", "Audio Files (*.mp3 *.wav)")
+        if self.importer is not None:
+            QMessageBox.information(self, "Import Running", "Please wait for the current import to finish.")
+            return
+        
+        files, _ = QFileDialog.getOpenFileNames(self, "Select Songs", "", "Audio Files (*.mp3 *.wav *.flac *.ogg *.m4a)")
         if files:
-            for file_path in files:
-                print(f"Adding song: {file_path}")
-                self.db_manager.add_song(file_path)
+            self.import_files(files)
+    
+    def import_files(self, files):
+        # Tags are parsed in a worker pool and written in batches, off the GUI thread
+        self.import_progress = QProgressDialog("Importing songs...", "Cancel", 0, len(files), self)
+        self.import_progress.setWindowTitle("Import Songs")
+        self.import_progress.setMinimumDuration(500)
+        
+        self.importer = LibraryImporter(files, db_path=self.db_manager.db_path)
+        self.importer.progress.connect(self.on_import_progress)
+        self.importer.import_finished.connect(self.on_import_finished)
+        self.import_progress.canceled.connect(self.importer.cancel)
+        self.importer.start()
+    
+    def on_import_progress(self, done, total):
+        self.import_progress.setValue(done)
+        self.import_progress.setLabelText(f"Importing songs... {done}/{total}")
+    
+    def on_import_finished(self, imported, cancelled):
+        self.importer.wait()
+        self.songs_imported.emit(self.importer.file_paths)
+        self.importer = None
+        self.import_progress.reset()
+        self.load_songs()
+        self.index_lyrics()
+        if self.rescan_pending:
+            self.rescan_pending = False
+            self.schedule_rescan()
+    
+    def add_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Music Folder")
+        if folder:
+            self.db_manager.add_library_folder(folder)
+            self.rescan_library()
+    
+    def schedule_rescan(self, path=None):
+        # Folder changes arrive in bursts while files are copied; wait for them to settle
+        self.rescan_timer.start()
+    
+    def rescan_library(self):
+        if self.scanner is not None or self.importer is not None:
+            self.rescan_pending = True
+            return
+        folders = self.db_manager.get_library_folders()
+        if not folders:
+            self.library_status.emit("No music folders added yet")
+            return
+        
+        self.library_status.emit("Scanning library...")
+        self.scanner = LibraryScanner(folders, db_path=self.db_manager.db_path)
+        self.scanner.progress.connect(
+            lambda done, total: self.library_status.emit(f"Scanning library... {done}/{total} changed files read"))
+        self.scanner.scan_finished.connect(self.on_scan_finished)
+        self.scanner.start()
+    
+    def on_scan_finished(self, summary):
+        self.scanner.wait()
+        watched = set(self.folder_watcher.directories())
+        new_dirs = [path for path in self.scanner.watch_dirs if path not in watched]
+        if new_dirs:
+            self.folder_watcher.addPaths(new_dirs)
+        if self.scanner.file_paths:
+            self.songs_imported.emit(self.scanner.file_paths)
+        self.scanner = None
+        
+        if summary['parsed'] or summary['moved'] or summary['removed']:
             self.load_songs()
+        self.library_status.emit(
+            f"Library up to date: {summary['parsed']} updated, {summary['moved']} moved, "
+            f"{summary['removed']} removed, {summary['unchanged'] + summary['touched']} unchanged")
+        self.index_lyrics()
+        if self.rescan_pending:
+            self.rescan_pending = False
+            self.schedule_rescan()
+    
+    def add_lyrics_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Lyrics Folder")
+        if folder:
+            self.db_manager.add_lyrics_folder(folder)
+            self.index_lyrics()
+    
+    def index_lyrics(self):
+        # Runs after every import and rescan. A request while it runs cancels that
+        # pass, and a fresh one starts as soon as it has stopped
+        if self.lyrics_indexer is not None:
+            self.lyrics_indexer.cancel()
+            self.lyrics_index_pending = True
+            return
+        folders = self.db_manager.get_lyrics_folders() + self.db_manager.get_library_folders()
+        self.lyrics_indexer = LyricsIndexer(folders, db_path=self.db_manager.db_path)
+        self.lyrics_indexer.index_finished.connect(self.on_lyrics_indexed)
+        self.lyrics_indexer.start()
+    
+    def on_lyrics_indexed(self, assigned, found):
+        self.lyrics_indexer.wait()
+        self.lyrics_indexer = None
+        if assigned:
+            self.library_status.emit(f"Lyrics found for {assigned} songs ({found} lyrics files)")
+        if self.lyrics_index_pending:
+            self.lyrics_index_pending = False
+            self.index_lyrics()
     
     def add_lyrics(self):
-        item = self.playlist_list.currentItem()
-        if not item:
+        index = self.playlist_list.currentIndex()
+        if not index.isValid():
             QMessageBox.warning(self, "No Selection", "Please select a song to add lyrics.")
             return
         
-        song_id = item.data(Qt.UserRole + 1)
-        file_path = item.data(Qt.UserRole)
+        song_id = index.data(SongIdRole)
+        file_path = index.data(FilePathRole)
         if not song_id:
             print("No song ID found for the selected item")
             return
@@ -355,16 +419,16 @@ class PlaylistWidget(QWidget):
             else:
                 QMessageBox.critical(self, "Error", "Failed to create playlist.")
     
-    def play_selected(self, item):
-        file_path = item.data(Qt.UserRole)
+    def play_selected(self, model_index):
+        file_path = model_index.data(FilePathRole)
         if file_path:
-            index = self.playlist_list.row(item)
+            index = model_index.row()
             print(f"Emitting song_selected: file_path={file_path}, index={index}")
             self.song_selected.emit(file_path, index)
     
     def show_context_menu(self, position):
-        item = self.playlist_list.itemAt(position)
-        if not item:
+        item = self.playlist_list.indexAt(position)
+        if not item.isValid():
             return
         
         menu = QMenu()
@@ -383,7 +447,7 @@ class PlaylistWidget(QWidget):
         menu.exec_(self.playlist_list.mapToGlobal(position))
     
     def add_to_playlist(self, item):
-        song_id = item.data(Qt.UserRole + 1)
+        song_id = item.data(SongIdRole)
         if not song_id:
             return
         
@@ -398,7 +462,7 @@ class PlaylistWidget(QWidget):
         
         if ok and name:
             playlist_id = playlist_id_map[name]
-            position = len(self.db_manager.get_songs_in_playlist(playlist_id)) if playlist_id else 0
+            position = self.db_manager.next_playlist_position(playlist_id) if playlist_id else 0
             self.db_manager.add_song_to_playlist(playlist_id, song_id, position)
             
             if self.current_playlist_id == playlist_id:
@@ -406,12 +470,12 @@ class PlaylistWidget(QWidget):
     
     def remove_song(self, item=None):
         if not item:
-            item = self.playlist_list.currentItem()
-            if not item:
+            item = self.playlist_list.currentIndex()
+            if not item.isValid():
                 QMessageBox.warning(self, "No Selection", "Please select a song to remove.")
                 return
         
-        song_id = item.data(Qt.UserRole + 1)
+        song_id = item.data(SongIdRole)
         if not song_id:
             print("No song ID found for the selected item")
             return
@@ -458,41 +522,4 @@ class PlaylistWidget(QWidget):
                 QMessageBox.critical(self, "Error", "Failed to delete playlist.")
 
     def sort_by_artist(self):
-        try:
-            print("Starting sort by artist...")
-            if not self.songs_data:
-                print("No songs to sort")
-                return
-        
-            self.songs_data.sort(key=lambda x: x['widget'].artist_label.text().lower())
-            print(f"Sorted {len(self.songs_data)} songs by artist")
-
-            temp_songs_data = self.songs_data.copy()
-            self.playlist_list.clear()
-            self.songs_data.clear()
-
-            for song_data in temp_songs_data:
-                file_path = song_data['file_path']
-                song_id = song_data['song_id']
-                title = song_data['title']
-            
-                new_item_widget = SongItemWidget(file_path)
-            
-                new_item = QListWidgetItem(self.playlist_list)
-                new_item.setData(Qt.UserRole, file_path)
-                new_item.setData(Qt.UserRole + 1, song_id)
-                new_item.setSizeHint(new_item_widget.sizeHint())
-            
-                self.playlist_list.setItemWidget(new_item, new_item_widget)
-            
-                self.songs_data.append({
-                    'item': new_item,
-                    'widget': new_item_widget,
-                    'file_path': file_path,
-                    'song_id': song_id,
-                    'title': title
-                })
-        
-            print("Sorting by artist completed successfully")
-        except Exception as e:
-            print(f"Error during sorting by artist: {e}")
\ No newline at end of file
+        self.sort_songs('artist')
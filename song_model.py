@@ -0,0 +1,203 @@
+import os
+import numpy as np
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyle, QApplication
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QRect
+from PyQt5.QtGui import QPixmap, QFont, QColor, QPalette
+from database_manager import SONG_COLUMNS, SORT_COLUMNS
+
+COLUMN_INDEX = {name: i for i, name in enumerate(SONG_COLUMNS)}
+# SQLite's NOCASE only folds A-Z; str.lower() would also fold accented letters
+# and put them somewhere else than ORDER BY does
+NOCASE = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+# Ties after the chosen sort keys, as in DatabaseManager.get_all_songs
+TIE_BREAK_COLUMNS = ('artist', 'album', 'title', 'id')
+
+FilePathRole = Qt.UserRole
+SongIdRole = Qt.UserRole + 1
+ArtistRole = Qt.UserRole + 2
+CoverRole = Qt.UserRole + 3
+
+class SongListModel(QAbstractListModel):
+    # Holds the rows from the database as plain tuples. Rows are exposed to the
+    # view in batches through fetchMore, so only what gets scrolled to is laid out.
+    def __init__(self, parent=None, batch_size=200, cover_cache=None, cover_size=50):
+        super().__init__(parent)
+        self.cover_cache = cover_cache
+        self.cover_size = cover_size
+        self.all_songs = []
+        self.all_ids = np.zeros(0, dtype=np.int64)
+        self.songs = []
+        self.filter_ids = None
+        # song id -> row of self.songs, built on first use after each change
+        self.rows_by_id = None
+        self.loaded_count = 0
+        self.batch_size = batch_size
+
+    def set_songs(self, songs):
+        self.all_songs = list(songs)
+        self.update_ids()
+        self.apply_filter()
+
+    def update_ids(self):
+        id_column = COLUMN_INDEX['id']
+        self.all_ids = np.fromiter((song[id_column] for song in self.all_songs),
+                                   dtype=np.int64, count=len(self.all_songs))
+
+    def set_filter(self, song_ids):
+        # song_ids: ids from the search index, or None to show every song
+        self.filter_ids = song_ids
+        self.apply_filter()
+
+    def apply_filter(self):
+        self.beginResetModel()
+        if self.filter_ids is None:
+            self.songs = list(self.all_songs)
+        else:
+            keep = np.flatnonzero(np.isin(self.all_ids, self.filter_ids))
+            self.songs = [self.all_songs[i] for i in keep]
+        self.rows_by_id = None
+        self.loaded_count = min(self.batch_size, len(self.songs))
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded_count
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self.loaded_count < len(self.songs)
+
+    def fetchMore(self, parent):
+        if parent.isValid():
+            return
+        count = min(self.batch_size, len(self.songs) - self.loaded_count)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded_count, self.loaded_count + count - 1)
+        self.loaded_count += count
+        self.endInsertRows()
+
+    def ensure_loaded(self, row):
+        while row >= self.loaded_count and self.canFetchMore(QModelIndex()):
+            self.fetchMore(QModelIndex())
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.songs):
+            return None
+        song = self.songs[index.row()]
+        if role == Qt.DisplayRole:
+            return song[COLUMN_INDEX['title']] or os.path.basename(song[COLUMN_INDEX['file_path']])
+        if role == ArtistRole:
+            return song[COLUMN_INDEX['artist']] or "Unknown Artist"
+        if role == FilePathRole:
+            return song[COLUMN_INDEX['file_path']]
+        if role == SongIdRole:
+            return song[COLUMN_INDEX['id']]
+        if role == Qt.ToolTipRole:
+            return song[COLUMN_INDEX['file_path']]
+        if role == CoverRole and self.cover_cache is not None:
+            return self.cover_cache.get(song[COLUMN_INDEX['file_path']], self.cover_size)
+        return None
+
+    def song_count(self):
+        return len(self.songs)
+
+    def song_value(self, row, column):
+        if 0 <= row < len(self.songs):
+            return self.songs[row][COLUMN_INDEX[column]]
+        return None
+
+    def row_of(self, song_id):
+        if self.rows_by_id is None:
+            id_column = COLUMN_INDEX['id']
+            self.rows_by_id = {song[id_column]: row for row, song in enumerate(self.songs)}
+        return self.rows_by_id.get(song_id, -1)
+
+    def song_ids(self):
+        # Every song in the list, including those the search hides
+        return self.all_ids.tolist()
+
+    def sort_key(self, column):
+        index = COLUMN_INDEX[column]
+        if SORT_COLUMNS[column] == 'TEXT':
+            # None sorts first, as NULL does in ORDER BY; COLLATE NOCASE folds A-Z only
+            return lambda song: (song[index] is not None, (song[index] or '').translate(NOCASE))
+        return lambda song: (song[index] is not None, song[index] or 0)
+
+    def tie_break_key(self):
+        # ORDER BY artist, album, title, id: binary comparison, NULL first
+        indexes = [COLUMN_INDEX[column] for column in TIE_BREAK_COLUMNS]
+        return lambda song: tuple((song[i] is not None, song[i] or '') for i in indexes)
+
+    def sort_songs(self, sort_keys):
+        # sort_keys: [(column, descending), ...], most significant first. Python's
+        # sort is stable, so sorting by the tie-breakers and then by each key from
+        # least to most significant gives the same order as the SQL ORDER BY.
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        old_ids = [self.songs[index.row()][COLUMN_INDEX['id']] for index in persistent]
+
+        key = self.tie_break_key()
+        self.all_songs.sort(key=key)
+        self.songs.sort(key=key)
+        for column, descending in reversed(sort_keys):
+            key = self.sort_key(column)
+            self.all_songs.sort(key=key, reverse=descending)
+            self.songs.sort(key=key, reverse=descending)
+        self.update_ids()
+        self.rows_by_id = None
+
+        if persistent:
+            rows = {song[COLUMN_INDEX['id']]: row for row, song in enumerate(self.songs)}
+            new_indexes = []
+            for song_id in old_ids:
+                row = rows.get(song_id, -1)
+                new_indexes.append(self.index(row) if 0 <= row < self.loaded_count else QModelIndex())
+            self.changePersistentIndexList(persistent, new_indexes)
+        self.layoutChanged.emit()
+
+class SongItemDelegate(QStyledItemDelegate):
+    # Paints a row (cover, title, artist) directly instead of keeping a widget per song
+    row_height = 60
+    cover_size = 50
+
+    def __init__(self, parent=None, cover_cache=None):
+        super().__init__(parent)
+        self.placeholder = cover_cache.placeholder(self.cover_size) if cover_cache is not None else QPixmap()
+        self.title_font = QFont()
+        self.title_font.setPixelSize(14)
+        self.title_font.setBold(True)
+        self.artist_font = QFont()
+        self.artist_font.setPixelSize(12)
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.row_height)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PE_PanelItemViewItem, option, painter, option.widget)
+
+        rect = option.rect.adjusted(5, 5, -5, -5)
+        cover_rect = QRect(rect.left(), rect.top(), self.cover_size, self.cover_size)
+        # The cover cache answers None until the thumbnail has been decoded
+        cover = index.data(CoverRole)
+        pixmap = cover if cover is not None and not cover.isNull() else self.placeholder
+        if not pixmap.isNull():
+            x = cover_rect.left() + (self.cover_size - pixmap.width()) // 2
+            y = cover_rect.top() + (self.cover_size - pixmap.height()) // 2
+            painter.drawPixmap(x, y, pixmap)
+        painter.setPen(QColor("#555555"))
+        painter.drawRect(cover_rect.adjusted(0, 0, -1, -1))
+
+        selected = option.state & QStyle.State_Selected
+        painter.setPen(option.palette.color(QPalette.HighlightedText if selected else QPalette.Text))
+        text_rect = QRect(cover_rect.right() + 10, rect.top(), rect.width() - self.cover_size - 10, rect.height())
+        title_rect = QRect(text_rect.left(), text_rect.top() + 4, text_rect.width(), 22)
+        artist_rect = QRect(text_rect.left(), title_rect.bottom() + 2, text_rect.width(), 18)
+
+        painter.setFont(self.title_font)
+        title = painter.fontMetrics().elidedText(index.data(Qt.DisplayRole), Qt.ElideRight, title_rect.width())
+        painter.drawText(title_rect, Qt.AlignLeft | Qt.AlignVCenter, title)
+        painter.setFont(self.artist_font)
+        artist = painter.fontMetrics().elidedText(index.data(ArtistRole), Qt.ElideRight, artist_rect.width())
+        painter.drawText(artist_rect, Qt.AlignLeft | Qt.AlignVCenter, artist)
+        painter.restore()
@@ -0,0 +1,60 @@
+import queue
+from PyQt5.QtCore import QThread, QCoreApplication, pyqtSignal
+from database_manager import DatabaseManager
+from lyrics import LyricsCache
+
+class TrackLoader(QThread):
+    # Reads what a starting track needs from disk, its lyrics and waveform peaks,
+    # away from the GUI thread. Requests carry the player's token; when several
+    # are queued only those of the newest token are served.
+    lyrics_loaded = pyqtSignal(int, object)
+    peaks_loaded = pyqtSignal(int, object)
+
+    def __init__(self, peak_cache, db_path='music_library.db'):
+        super().__init__()
+        self.peak_cache = peak_cache
+        self.db_path = db_path
+        self.requests = queue.Queue()
+        if QCoreApplication.instance() is not None:
+            QCoreApplication.instance().aboutToQuit.connect(self.stop)
+
+    def request(self, token, file_path, song_id=None):
+        # Lyrics are only looked up when song_id is given
+        self.requests.put((token, file_path, song_id))
+        if not self.isRunning():
+            self.start()
+
+    def stop(self):
+        if self.isRunning():
+            self.requests.put(None)
+            self.wait()
+
+    def run(self):
+        # sqlite connections are per thread, so the loader opens its own
+        db_manager = DatabaseManager(self.db_path)
+        lyrics_cache = LyricsCache(db_manager)
+        try:
+            while True:
+                items = [self.requests.get()]
+                while not self.requests.empty():
+                    items.append(self.requests.get_nowait())
+                if None in items:
+                    break
+                newest = items[-1][0]
+                for token, file_path, song_id in items:
+                    if token == newest:
+                        self.load(db_manager, lyrics_cache, token, file_path, song_id)
+        finally:
+            db_manager.conn.close()
+
+    def load(self, db_manager, lyrics_cache, token, file_path, song_id):
+        if song_id is not None:
+            lyrics = None
+            lyrics_path = db_manager.get_lyrics_path(song_id)
+            if lyrics_path:
+                try:
+                    lyrics = lyrics_cache.load(lyrics_path)
+                except Exception as e:
+                    print(f"Error loading lyrics: {e}")
+            self.lyrics_loaded.emit(token, lyrics)
+        self.peaks_loaded.emit(token, self.peak_cache.open(file_path))
@@ -1,31 +1,134 @@
 import numpy as np
-from scipy.fft import fft
-from PyQt5.QtWidgets import QWidget
-from PyQt5.QtGui import QPainter, QColor, QLinearGradient
-from PyQt5.QtCore import QTimer
+from scipy.fft import rfft
+from PyQt5.QtWidgets import QWidget, QVBoxLayout
+from PyQt5.QtGui import QPainter, QColor, QLinearGradient, QBrush
+from PyQt5.QtCore import Qt, QTimer, QEvent, QRect
+try:
+    from PyQt5.QtWidgets import QOpenGLWidget
+except ImportError:
+    QOpenGLWidget = None
+
+class SpectrumAnalyzer:
+    # Log-frequency bar levels (0..1) from the latest block of samples. Window,
+    # band edges and bin counts are precomputed, so a frame is a handful of
+    # whole-array operations whatever the bar count.
+    def __init__(self, bar_count=32, fft_size=1024, sample_rate=44100):
+        self.bar_count = bar_count
+        self.fft_size = fft_size
+        self.sample_rate = sample_rate
+        self.smoothing = 0.8
+        self.peak_hold_frames = 10
+        self.peak_fall = 0.02
+        self.db_range = 60.0
+        self.min_freq = 40.0
+        self.max_freq = 16000.0
+        self.configure(bar_count, fft_size, sample_rate)
+
+    def configure(self, bar_count=None, fft_size=None, sample_rate=None):
+        if bar_count is not None:
+            self.bar_count = max(8, min(256, int(bar_count)))
+        if fft_size is not None:
+            self.fft_size = int(fft_size)
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+
+        self.window = np.hanning(self.fft_size).astype(np.float32)
+        # Scales a full-scale sine to magnitude 1
+        self.window_gain = 2.0 / self.window.sum()
+        bin_count = self.fft_size // 2 + 1
+        bin_freqs = np.arange(bin_count) * self.sample_rate / self.fft_size
+        max_freq = min(self.max_freq, self.sample_rate / 2)
+        edge_freqs = np.geomspace(self.min_freq, max_freq, self.bar_count + 1)
+        edges = np.searchsorted(bin_freqs, edge_freqs)
+        # Low bars are narrower than one FFT bin; give each bar at least one bin
+        edges = np.maximum(edges, np.arange(self.bar_count + 1) + edges[0])
+        self.bin_starts = np.minimum(edges[:-1], bin_count - 1)
+        self.bin_ends = np.clip(edges[1:], self.bin_starts + 1, bin_count)
+        self.bin_counts = (self.bin_ends - self.bin_starts).astype(np.float32)
+        self.reset()
+
+    def reset(self):
+        self.bars = np.zeros(self.bar_count, dtype=np.float32)
+        self.peak_hold = np.zeros(self.bar_count, dtype=np.float32)
+        self.peak_age = np.zeros(self.bar_count, dtype=np.int32)
+
+    def process(self, samples):
+        spectrum = np.abs(rfft(samples[-self.fft_size:] * self.window)) * self.window_gain
+        # Mean magnitude per band from a running sum over the bins
+        cumulative = np.concatenate(([0.0], np.cumsum(spectrum)))
+        levels = (cumulative[self.bin_ends] - cumulative[self.bin_starts]) / self.bin_counts
+        db = 20.0 * np.log10(np.maximum(levels, 1e-9))
+        new_bars = np.clip((db + self.db_range) / self.db_range, 0.0, 1.0)
+
+        self.bars *= self.smoothing
+        self.bars += new_bars * (1 - self.smoothing)
+        rising = new_bars > self.peak_hold
+        self.peak_hold = np.where(rising, new_bars, self.peak_hold)
+        self.peak_age = np.where(rising, 0, self.peak_age + 1)
+        falling = self.peak_age > self.peak_hold_frames
+        self.peak_hold = np.where(falling, np.maximum(self.peak_hold - self.peak_fall, 0.0), self.peak_hold)
+
+class BarCanvas(QWidget):
+    # Software (raster) drawing surface for the visualizer bars
+    def __init__(self, visualizer):
+        super().__init__(visualizer)
+        self.visualizer = visualizer
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        self.visualizer.paint_bars(painter, self.width(), self.height())
+
+if QOpenGLWidget is not None:
+    class GLBarCanvas(QOpenGLWidget):
+        # Same drawing through Qt's OpenGL paint engine, for high bar counts at high FPS
+        def __init__(self, visualizer):
+            super().__init__(visualizer)
+            self.visualizer = visualizer
+
+        def paintGL(self):
+            painter = QPainter(self)
+            # A GL surface has no auto-filled background
+            painter.fillRect(self.rect(), self.visualizer.palette().window())
+            self.visualizer.paint_bars(painter, self.width(), self.height())
+else:
+    GLBarCanvas = None
 
 class AudioVisualizer(QWidget):
-    def __init__(self):
+    # Analysis runs on the display timer: each tick pulls the newest fft_size
+    # samples from the audio tap, so the FFT rate follows the frame rate rather
+    # than the audio block rate, and stops while paused or the window can't be seen.
+    def __init__(self, bar_count=32, fft_size=1024, overlap=0.5, fps=20):
         super().__init__()
         self.setFixedSize(400, 100)
-        self.bars = [0] * 32
         self.processor = None
+        self.playing = False
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_display)
-        self.timer.start(50)
-        self.bar_smoothing = 0.8
-        self.peak_hold = [0] * 32
-        self.peak_decay = [0] * 32
+        self.analyzer = SpectrumAnalyzer(bar_count, fft_size)
+        self.tap_buffer = np.zeros(fft_size, dtype=np.float32)
+        self.overlap = overlap
+        self.hop_size = fft_size
+        self.watched_window = None
+        self.brushes = None
+        self.brushes_height = 0
+        self.set_overlap(overlap)
+        self.set_fps(fps)
         
         # Theme-aware colors
         self.is_dark_theme = True  # Default to dark theme
         self.update_colors()
+        
+        self.canvas_layout = QVBoxLayout(self)
+        self.canvas_layout.setContentsMargins(0, 0, 0, 0)
+        self.canvas = None
+        self.use_opengl = False
+        self.set_opengl(False)
     
     def set_theme(self, is_dark):
         """Set theme untuk visualizer"""
         self.is_dark_theme = is_dark
         self.update_colors()
-        self.update()
+        self.canvas.update()
     
     def update_colors(self):
         """Update colors berdasarkan theme"""
@@ -41,81 +144,151 @@ class AudioVisualizer(QWidget):
             self.mid_color = QColor(80, 180, 80)         # Darker green
             self.treble_color = QColor(80, 120, 220)     # Darker blue
             self.peak_color = QColor(60, 60, 60)         # Dark gray
+        self.brushes = None
+    
+    def set_opengl(self, enabled):
+        if enabled and GLBarCanvas is None:
+            print("OpenGL visualizer not available, using software rendering")
+            enabled = False
+        if self.canvas is not None and enabled == self.use_opengl:
+            return
+        if self.canvas is not None:
+            self.canvas_layout.removeWidget(self.canvas)
+            self.canvas.deleteLater()
+        self.use_opengl = enabled
+        self.canvas = GLBarCanvas(self) if enabled else BarCanvas(self)
+        self.canvas_layout.addWidget(self.canvas)
+        if enabled:
+            # Context creation only fails once the widget is shown
+            QTimer.singleShot(500, self.check_opengl)
+    
+    def check_opengl(self):
+        if self.use_opengl and self.isVisible() and not self.canvas.isValid():
+            print("OpenGL context unavailable, falling back to software rendering")
+            self.set_opengl(False)
+    
+    def band_brushes(self, height):
+        # One vertical gradient per colour band, spanning the whole canvas, so every
+        # bar of a band shares a brush; rebuilt only on theme change or resize
+        if self.brushes is None or self.brushes_height != height:
+            self.brushes = []
+            for color in (self.bass_color, self.mid_color, self.treble_color):
+                gradient = QLinearGradient(0, 0, 0, height)
+                gradient.setColorAt(0, color.lighter(120))
+                gradient.setColorAt(1, color.darker(120))
+                self.brushes.append(QBrush(gradient))
+            self.peak_brush = QBrush(self.peak_color)
+            self.brushes_height = height
+        return self.brushes
     
     def set_audio_processor(self, processor):
         self.processor = processor
-        if processor:
-            processor.audio_data.connect(self.process_audio_data)
+        self.update_sample_rate()
+        processor.playback_state_changed.connect(self.set_playing)
+        processor.track_changed.connect(self.update_sample_rate)
+    
+    def update_sample_rate(self):
+        # Tracks play at their own rate, so the bands can move between tracks. A
+        # newly loaded track or a gapless change doesn't change the playback state,
+        # so the player calls this after installing a track as well.
+        if self.processor is not None and self.processor.sample_rate != self.analyzer.sample_rate:
+            self.analyzer.configure(sample_rate=self.processor.sample_rate)
+    
+    def set_playing(self, playing):
+        # Nothing new reaches the tap while paused, so the timer can rest
+        self.playing = playing
+        if playing:
+            self.update_sample_rate()
+        self.update_timer_state()
+    
+    def set_bar_count(self, bar_count):
+        self.analyzer.configure(bar_count=bar_count)
+        self.canvas.update()
+    
+    def set_fft_size(self, fft_size):
+        self.analyzer.configure(fft_size=fft_size)
+        self.tap_buffer = np.zeros(self.analyzer.fft_size, dtype=np.float32)
+        self.set_overlap(self.overlap)
+        self.canvas.update()
+    
+    def set_overlap(self, overlap):
+        # Fraction of the previous window a new analysis may reuse; a frame tick
+        # without at least hop_size fresh samples skips the FFT
+        self.overlap = max(0.0, min(0.9, overlap))
+        self.hop_size = max(1, int(self.analyzer.fft_size * (1.0 - self.overlap)))
+    
+    def set_fps(self, fps):
+        self.fps = max(1, min(120, int(fps)))
+        self.timer.setInterval(1000 // self.fps)
+        self.update_timer_state()
+    
+    def update_timer_state(self):
+        window = self.window()
+        active = self.playing and self.isVisible() and not window.isMinimized()
+        if active and not self.timer.isActive():
+            self.timer.start()
+        elif not active and self.timer.isActive():
+            self.timer.stop()
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        # Minimizing only changes the top-level window's state, so watch that too
+        if self.watched_window is not self.window():
+            self.watched_window = self.window()
+            self.watched_window.installEventFilter(self)
+        self.update_timer_state()
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.update_timer_state()
+    
+    def eventFilter(self, obj, event):
+        if obj is self.watched_window and event.type() in (QEvent.WindowStateChange, QEvent.Show, QEvent.Hide):
+            self.update_timer_state()
+        return False
     
     def process_audio_data(self, audio_chunk):
         try:
-            fft_data = np.abs(fft(audio_chunk))
-            fft_data = fft_data[:len(fft_data)//2]
-            bar_count = len(self.bars)
-            chunk_size = max(1, len(fft_data) // bar_count)
-            new_bars = []
-            for i in range(bar_count):
-                start_idx = i * chunk_size
-                end_idx = min(start_idx + chunk_size, len(fft_data))
-                if start_idx < len(fft_data):
-                    magnitude = np.mean(fft_data[start_idx:end_idx])
-                    height = min(int(magnitude * 1000), self.height() - 10)
-                    new_bars.append(height)
-                else:
-                    new_bars.append(0)
-            for i in range(len(self.bars)):
-                self.bars[i] = int(self.bars[i] * self.bar_smoothing + 
-                                new_bars[i] * (1 - self.bar_smoothing))
-                if new_bars[i] > self.peak_hold[i]:
-                    self.peak_hold[i] = new_bars[i]
-                    self.peak_decay[i] = 0
-                else:
-                    self.peak_decay[i] += 1
-                    if self.peak_decay[i] > 10:
-                        self.peak_hold[i] = max(0, self.peak_hold[i] - 2)
+            self.analyzer.process(audio_chunk)
         except Exception as e:
             print(f"Error processing audio data: {e}")
     
     def reset_visualization(self):
-        self.bars = [0] * 32
-        self.peak_hold = [0] * 32
-        self.update()
+        self.analyzer.reset()
+        self.canvas.update()
     
     def update_display(self):
-        self.update()
+        # Pull the newest samples from the audio tap instead of being pushed
+        # a signal from the audio thread for every block
+        if self.processor and self.processor.read_visualization(self.tap_buffer, self.hop_size):
+            self.process_audio_data(self.tap_buffer)
+            self.canvas.update()
     
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        bar_width = self.width() // len(self.bars)
+    def paint_bars(self, painter, width, height):
+        # Bars are axis-aligned rectangles: no antialiasing, one drawRects call per band
+        brushes = self.band_brushes(height)
+        bar_count = self.analyzer.bar_count
+        scale = height - 10
+        # Bars may be narrower than the 2 px gap at high bar counts
+        edges = np.arange(bar_count + 1) * width // bar_count
+        gaps = np.where(np.diff(edges) > 3, 1, 0)
+        xs = (edges[:-1] + gaps).tolist()
+        widths = np.maximum(np.diff(edges) - 2 * gaps, 1).tolist()
+        heights = (self.analyzer.bars * scale).astype(np.int32).tolist()
+        peaks = (self.analyzer.peak_hold * scale).astype(np.int32).tolist()
+        
+        painter.setPen(Qt.NoPen)
+        band_ends = (bar_count // 3, 2 * bar_count // 3, bar_count)
+        start = 0
+        for brush, end in zip(brushes, band_ends):
+            rects = [QRect(xs[i], height - heights[i], widths[i], heights[i])
+                     for i in range(start, end) if heights[i] > 0]
+            if rects:
+                painter.setBrush(brush)
+                painter.drawRects(rects)
+            start = end
         
-        for i, height in enumerate(self.bars):
-            if height <= 0:
-                continue
-                
-            x = i * bar_width
-            y = self.height() - height
-            
-            # Determine color based on frequency range
-            if i < len(self.bars) // 3:
-                # Bass frequencies
-                color = self.bass_color
-            elif i < 2 * len(self.bars) // 3:
-                # Mid frequencies  
-                color = self.mid_color
-            else:
-                # Treble frequencies
-                color = self.treble_color
-            
-            # Create gradient effect for bars
-            gradient = QLinearGradient(0, y, 0, self.height())
-            gradient.setColorAt(0, color.lighter(120))
-            gradient.setColorAt(1, color.darker(120))
-            
-            # Draw bar with gradient
-            painter.fillRect(x + 1, y, bar_width - 2, height, gradient)
-            
-            # Draw peak indicator
-            peak_y = self.height() - self.peak_hold[i]
-            if self.peak_hold[i] > 5:
-                painter.fillRect(x + 1, peak_y - 2, bar_width - 2, 2, self.peak_color)
\ No newline at end of file
+        peak_rects = [QRect(xs[i], height - peaks[i] - 2, widths[i], 2) for i in range(bar_count) if peaks[i] > 5]
+        if peak_rects:
+            painter.setBrush(self.peak_brush)
+            painter.drawRects(peak_rects)
@@ -0,0 +1,86 @@
+import numpy as np
+from PyQt5.QtWidgets import QSlider, QStyle
+from PyQt5.QtGui import QPainter, QColor, QPen
+from PyQt5.QtCore import Qt, QLineF
+
+class WaveformSlider(QSlider):
+    # Seek bar that draws the track's waveform from a precomputed peak file.
+    # Without peaks it behaves like the plain QSlider it replaces.
+    def __init__(self, orientation=Qt.Horizontal, parent=None):
+        super().__init__(orientation, parent)
+        self.peaks = None
+        self.lines = None
+        self.lines_size = None
+        self.played_color = QColor(100, 150, 255)
+        self.remaining_color = QColor(120, 120, 120)
+        self.playhead_color = QColor(255, 255, 255)
+
+    def set_peaks(self, peaks):
+        self.peaks = peaks
+        self.lines = None
+        self.setMinimumHeight(48 if peaks is not None else 0)
+        self.updateGeometry()
+        self.update()
+
+    def set_theme(self, is_dark):
+        self.playhead_color = QColor(255, 255, 255) if is_dark else QColor(40, 40, 40)
+        self.update()
+
+    def waveform_lines(self):
+        # One vertical min/max line per pixel column, rebuilt only on resize or a new track
+        size = (self.width(), self.height())
+        if self.lines is None or self.lines_size != size:
+            mins, maxs = self.peaks.overview(self.width())
+            middle = self.height() / 2
+            scale = self.height() / 2 - 1
+            x = np.arange(len(mins), dtype=np.float64) + 0.5
+            top = middle - maxs * scale
+            bottom = middle - mins * scale
+            self.lines = [QLineF(x[i], top[i], x[i], bottom[i]) for i in range(len(mins))]
+            self.lines_size = size
+        return self.lines
+
+    def paintEvent(self, event):
+        if self.peaks is None:
+            super().paintEvent(event)
+            return
+        lines = self.waveform_lines()
+        if not lines:
+            super().paintEvent(event)
+            return
+
+        painter = QPainter(self)
+        span = self.maximum() - self.minimum()
+        played = int(self.width() * (self.sliderPosition() - self.minimum()) / span) if span > 0 else 0
+        painter.setPen(QPen(self.played_color, 1))
+        painter.drawLines(lines[:played])
+        painter.setPen(QPen(self.remaining_color, 1))
+        painter.drawLines(lines[played:])
+        painter.setPen(QPen(self.playhead_color, 2))
+        painter.drawLine(played, 0, played, self.height())
+
+    def value_at(self, x):
+        return QStyle.sliderValueFromPosition(self.minimum(), self.maximum(), int(x), max(1, self.width()))
+
+    def mousePressEvent(self, event):
+        if self.peaks is None or event.button() != Qt.LeftButton:
+            super().mousePressEvent(event)
+            return
+        # Jump straight to the clicked spot instead of paging like a QSlider groove
+        self.setSliderDown(True)
+        self.setSliderPosition(self.value_at(event.x()))
+        event.accept()
+
+    def mouseMoveEvent(self, event):
+        if self.peaks is None or not self.isSliderDown():
+            super().mouseMoveEvent(event)
+            return
+        self.setSliderPosition(self.value_at(event.x()))
+        event.accept()
+
+    def mouseReleaseEvent(self, event):
+        if self.peaks is None or not self.isSliderDown():
+            super().mouseReleaseEvent(event)
+            return
+        self.setSliderDown(False)
+        event.accept()